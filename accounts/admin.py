@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, BlogPost, Appointment
+from .models import CustomUser, BlogPost, Appointment, CalendarSyncJob
 
 
 class CustomUserAdmin(UserAdmin):
@@ -9,7 +9,7 @@ class CustomUserAdmin(UserAdmin):
     list_filter = ['user_type', 'is_staff']
     fieldsets = (
         (None, {'fields': ('username', 'password')}),
-        ('Personal Info', {'fields': ('first_name', 'last_name', 'email', 'user_type', 'profile_picture', 'address_line1', 'city', 'state', 'pincode')}),
+        ('Personal Info', {'fields': ('first_name', 'last_name', 'email', 'user_type', 'speciality', 'profile_picture', 'address_line1', 'city', 'state', 'pincode')}),
         ('Permissions', {'fields': ('is_active', 'is_staff', 'is_superuser', 'groups', 'user_permissions')}),
         ('Important dates', {'fields': ('last_login', 'date_joined')}),
     )
@@ -36,4 +36,10 @@ admin.site.register(BlogPost, BlogPostAdmin)
 class AppointmentAdmin(admin.ModelAdmin):
     list_display = ('doctor', 'patient', 'speciality', 'date', 'start_time', 'end_time', 'created_at')
     list_filter = ('date', 'doctor', 'speciality')
-    search_fields = ('doctor__username', 'patient__username', 'speciality')
\ No newline at end of file
+    search_fields = ('doctor__username', 'patient__username', 'speciality')
+
+@admin.register(CalendarSyncJob)
+class CalendarSyncJobAdmin(admin.ModelAdmin):
+    list_display = ('appointment', 'status', 'attempts', 'next_attempt_at', 'updated_at')
+    list_filter = ('status',)
+    readonly_fields = ('created_at', 'updated_at')
\ No newline at end of file
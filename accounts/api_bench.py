@@ -0,0 +1,358 @@
+"""Request scenarios for every URL in ``accounts.urls``, used by ``benchmark_api``.
+
+Each scenario says how to call one URL name: method, who is calling and
+how to build the arguments and body of the i-th request. Requests are built
+up front, outside the timed section, so that writes can target a fresh
+slot, username or post every time and logouts get a session or token of
+their own.
+
+``run_client`` drives them through Django's test client on worker
+threads; ``run_server`` serves the project on a local port and drives
+them over HTTP with ``loadtest``. Both return the same report, plus the
+mean number of database queries per request taken from the
+``api_db_queries`` histogram.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, time as dtime, timedelta
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.urls import get_resolver, reverse
+from prometheus_client import REGISTRY
+
+from . import loadtest
+from .authentication import ClaimsRefreshToken
+from .models import APPOINTMENT_DURATION, Appointment, BlogPost, CustomUser
+
+PASSWORD = 'bench-password'
+# Bookings made by the scenarios start here, after anything seed_appointments creates.
+BOOKING_START = date(2100, 1, 1)
+# Rows per file in the import scenario.
+IMPORT_ROWS = 50
+# Back-to-back slots from 09:00, so that no two bookings overlap.
+BOOKING_TIMES = [(datetime.combine(BOOKING_START, dtime(9)) + APPOINTMENT_DURATION * n).time() for n in range(12)]
+
+# ``auth`` is one of None, 'patient', 'doctor', 'admin' (JWT), 'patient_session',
+# 'doctor_session' (cookie), or 'fresh_token' and 'fresh_session' for a patient
+# credential that is only used once. ``args`` and ``data`` take the fixtures and
+# the request's index; ``encoding`` is 'json', 'form' or 'multipart'. Scenarios that write
+# run on a single worker: SQLite has one writer.
+Scenario = namedtuple('Scenario', 'method auth args data query encoding writes',
+                      defaults=(None, None, None, 'json', False))
+
+
+def fixture(*attrs):
+    return lambda fixtures, i: [getattr(fixtures, attr) for attr in attrs]
+
+
+def signup_form(fixtures, i):
+    username = fixtures.unique('signup')
+    return {
+        'first_name': 'Bench', 'last_name': 'Signup', 'username': username,
+        'email': f'{username}@bench.invalid', 'password': PASSWORD, 'confirm_password': PASSWORD,
+        'address_line1': '1 Bench Road', 'city': 'Pune', 'state': 'Maharashtra', 'pincode': '411001',
+        'user_type': 'patient',
+    }
+
+
+def credentials(fixtures, i):
+    return {'username': fixtures.patient.username, 'password': PASSWORD}
+
+
+def post_form(fixtures, i):
+    return {
+        'title': f'Benchmark post {i}', 'category': 'covid19', 'summary': 'Benchmark summary',
+        'content': 'Benchmark content', 'is_draft': 'true',
+    }
+
+
+def revision(fixtures, i):
+    # Keeps the fixture post published for the detail scenarios.
+    return {**post_form(fixtures, i), 'summary': f'Revised summary {i}', 'is_draft': 'false'}
+
+
+def booking(fixtures, i):
+    day, start = fixtures.next_slot()
+    return {'speciality': 'General', 'date': day.isoformat(), 'start_time': start.strftime('%H:%M')}
+
+
+def import_file(fixtures, i):
+    lines = ['patient,doctor,speciality,date,start_time']
+    for _ in range(IMPORT_ROWS):
+        day, start = fixtures.next_slot()
+        lines.append(f'{fixtures.patient.username},{fixtures.other_doctor.username},General,{day},{start:%H:%M}')
+    return {'file': SimpleUploadedFile(f'import{i}.csv', '\n'.join(lines).encode(), 'text/csv')}
+
+
+def fresh_post(fixtures, i):
+    post = BlogPost.objects.create(author_id=fixtures.doctor.id, title=f'Doomed {i}', category='covid19',
+                                   summary='To be deleted', content='To be deleted', is_draft=True)
+    return [post.id]
+
+
+SCENARIOS = {
+    # HTML views
+    'home': Scenario('GET', None),
+    'signup': Scenario('POST', None, data=signup_form, encoding='form', writes=True),
+    'login': Scenario('POST', None, data=credentials, encoding='form', writes=True),
+    'logout': Scenario('GET', 'fresh_session', writes=True),
+    'patient_dashboard': Scenario('GET', 'patient_session'),
+    'doctor_dashboard': Scenario('GET', 'doctor_session'),
+    'doctor_blog_list': Scenario('GET', 'doctor_session'),
+    'doctor_blog_create': Scenario('POST', 'doctor_session', data=post_form, encoding='form', writes=True),
+    'patient_blog_list': Scenario('GET', 'patient_session'),
+    'patient_blog_detail': Scenario('GET', 'patient_session', fixture('post_id')),
+    'doctor_list': Scenario('GET', 'patient_session'),
+    'book_appointment': Scenario('POST', 'patient_session', fixture('other_doctor_id'), booking,
+                                 encoding='form', writes=True),
+    'appointment_confirmed': Scenario('GET', 'patient_session', fixture('appointment_id')),
+    # API views
+    'api_signup': Scenario('POST', None, data=signup_form, encoding='form', writes=True),
+    'api_login': Scenario('POST', None, data=credentials, writes=True),
+    'api_patient_appointments': Scenario('GET', 'patient'),
+    'api_doctor_appointments': Scenario('GET', 'doctor'),
+    'api_doctor_blog_list': Scenario('GET', 'doctor'),
+    'api_doctor_blog_create': Scenario('POST', 'doctor', data=post_form, encoding='form', writes=True),
+    'api_doctor_blog_update': Scenario('PATCH', 'doctor', fixture('post_id'),
+                                       revision,
+                                       encoding='form', writes=True),
+    'api_doctor_blog_delete': Scenario('DELETE', 'doctor', fresh_post, writes=True),
+    'api_patient_blog_list': Scenario('GET', 'patient'),
+    'api_patient_blog_detail': Scenario('GET', 'patient', fixture('post_id')),
+    'api_patient_blog_category': Scenario('GET', 'patient', lambda fixtures, i: ['covid19']),
+    'api_blog_search': Scenario('GET', 'patient', query={'q': 'vaccine'}),
+    'api_doctor_list': Scenario('GET', 'patient', query={'city': 'Pune'}),
+    'api_doctor_detail': Scenario('GET', 'patient', fixture('other_doctor_id')),
+    'api_doctor_slots': Scenario('GET', 'patient', fixture('other_doctor_id')),
+    'api_appointment_confirmed': Scenario('GET', 'patient', fixture('appointment_id')),
+    'api_book_appointment': Scenario('POST', 'patient', fixture('other_doctor_id'), booking, writes=True),
+    'api_logout': Scenario('POST', 'fresh_token', writes=True),
+    'api_cache_stats': Scenario('GET', 'admin'),
+    'api_appointment_import': Scenario('POST', 'admin', data=import_file, encoding='multipart', writes=True),
+    'api_appointment_export': Scenario('GET', 'admin', query={'file_format': 'jsonl'}),
+}
+# The async twins take the same requests.
+SCENARIOS.update({
+    f'async_{name}': SCENARIOS[name] for name in (
+        'api_patient_appointments', 'api_doctor_appointments', 'api_patient_blog_list', 'api_patient_blog_detail',
+        'api_patient_blog_category', 'api_doctor_list', 'api_doctor_detail', 'api_doctor_slots',
+        'api_appointment_confirmed', 'api_book_appointment',
+    )
+})
+
+
+def url_names(urlconf='accounts.urls'):
+    return [pattern.name for pattern in get_resolver(urlconf).url_patterns if pattern.name]
+
+
+def uncovered():
+    """URL names in ``accounts.urls`` that have no scenario."""
+    return [name for name in url_names() if name not in SCENARIOS]
+
+
+class Fixtures:
+    """The users and rows the scenarios act on, picked from the seeded data.
+
+    The first seeded patient and doctor get a real password, the second
+    patient becomes staff. Passwords are set with ``update()`` so that
+    their tokens are not revoked by the ``post_save`` signal.
+    """
+
+    def __init__(self):
+        patient_ids = CustomUser.objects.filter(user_type='patient').order_by('id').values_list('id', flat=True)[:2]
+        doctor_ids = CustomUser.objects.filter(user_type='doctor').order_by('id').values_list('id', flat=True)[:2]
+        patient_id, admin_id = patient_ids
+        doctor_id, other_doctor_id = doctor_ids
+        CustomUser.objects.filter(id__in=[patient_id, doctor_id]).update(password=make_password(PASSWORD))
+        CustomUser.objects.filter(id=admin_id).update(is_staff=True)
+        self.patient, self.doctor, self.other_doctor, self.admin = (
+            CustomUser.objects.get(id=pk) for pk in (patient_id, doctor_id, other_doctor_id, admin_id))
+        self.other_doctor_id = other_doctor_id
+        self.post_id = BlogPost.objects.create(
+            author=self.doctor, title='Benchmark fixture', category='covid19',
+            summary='Benchmark summary', content='Benchmark content', is_draft=False,
+        ).id
+        self.appointment_id = Appointment.objects.create(
+            patient=self.patient, doctor=self.doctor, speciality='General',
+            date=BOOKING_START - timedelta(days=1), start_time=BOOKING_TIMES[0], end_time=BOOKING_TIMES[1],
+        ).id
+        self.tokens = {
+            'patient': self.token(self.patient),
+            'doctor': self.token(self.doctor),
+            'admin': self.token(self.admin),
+        }
+        self.sessions = {
+            'patient_session': self.session(self.patient),
+            'doctor_session': self.session(self.doctor),
+        }
+        self.counters = Counter()
+
+    @staticmethod
+    def token(user):
+        return f'Bearer {ClaimsRefreshToken.for_user(user).access_token}'
+
+    @staticmethod
+    def session(user):
+        client = Client()
+        client.force_login(user)
+        return f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+    def unique(self, prefix):
+        self.counters[prefix] += 1
+        return f'bench_{prefix}_{self.counters[prefix]}'
+
+    def next_slot(self):
+        """A slot with the other doctor that no earlier request has booked."""
+        index = self.counters['slot']
+        self.counters['slot'] += 1
+        return BOOKING_START + timedelta(days=index // len(BOOKING_TIMES)), BOOKING_TIMES[index % len(BOOKING_TIMES)]
+
+    def headers(self, auth):
+        if auth is None:
+            return {}
+        if auth == 'fresh_token':
+            return {'Authorization': self.token(self.patient)}
+        if auth == 'fresh_session':
+            return {'Cookie': self.session(self.patient)}
+        if auth in self.sessions:
+            return {'Cookie': self.sessions[auth]}
+        return {'Authorization': self.tokens[auth]}
+
+
+def build_requests(name, fixtures, count):
+    """``count`` ``(method, path, body, headers)`` tuples for URL ``name``."""
+    scenario = SCENARIOS[name]
+    requests = []
+    for i in range(count):
+        path = reverse(name, args=scenario.args(fixtures, i) if scenario.args else None)
+        if scenario.query:
+            path += '?' + urlencode(scenario.query)
+        data = scenario.data(fixtures, i) if scenario.data else None
+        headers = fixtures.headers(scenario.auth)
+        body = b''
+        if data is not None:
+            if scenario.encoding == 'multipart':
+                body = encode_multipart(BOUNDARY, data)
+                headers['Content-Type'] = MULTIPART_CONTENT
+            elif scenario.encoding == 'form':
+                body = urlencode(data).encode()
+                headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            else:
+                body = json.dumps(data).encode()
+                headers['Content-Type'] = 'application/json'
+        requests.append((scenario.method, path, body, headers))
+    return requests
+
+
+def query_totals(name):
+    labels = {'view': name}
+    return (REGISTRY.get_sample_value('api_db_queries_sum', labels) or 0.0,
+            REGISTRY.get_sample_value('api_db_queries_count', labels) or 0.0)
+
+
+def measure(name, run):
+    """``run()``'s report plus the mean queries per request it caused for URL ``name``."""
+    queries, count = query_totals(name)
+    report = run()
+    queries_after, count_after = query_totals(name)
+    requests = count_after - count
+    report['queries'] = round((queries_after - queries) / requests, 2) if requests else None
+    return report
+
+
+def run_client(requests, workers):
+    """Send ``requests`` through the test client from ``workers`` threads, or this one."""
+    local = threading.local()
+    lock = threading.Lock()
+    latencies = []
+    statuses = Counter()
+
+    def send(request):
+        method, path, body, headers = request
+        if not hasattr(local, 'client'):
+            local.client = Client()
+        headers = dict(headers)
+        content_type = headers.pop('Content-Type', 'application/octet-stream')
+        before = time.perf_counter()
+        response = local.client.generic(method, path, body, content_type=content_type, headers=headers)
+        if response.streaming:
+            # The test client leaves the body to the caller; a server would send it.
+            for _ in response.streaming_content:
+                pass
+            response.close()
+        elapsed = time.perf_counter() - before
+        with lock:
+            latencies.append(elapsed)
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    if workers == 1:
+        # On this thread, so the requests share its connection and transaction.
+        for request in requests:
+            send(request)
+    else:
+        with ThreadPoolExecutor(workers) as executor:
+            list(executor.map(send, requests))
+    return loadtest.report(latencies, statuses, {}, time.perf_counter() - started)
+
+
+class BenchmarkHandler(WSGIHandler):
+    """The project's WSGI application without CSRF checks, as under the test client."""
+
+    def get_response(self, request):
+        request._dont_enforce_csrf_checks = True
+        return super().get_response(request)
+
+
+class BenchmarkRequestHandler(WSGIRequestHandler):
+    # The headers and the body are written separately; without this each
+    # response waits for the client's delayed ACK.
+    disable_nagle_algorithm = True
+
+
+@contextmanager
+def local_server():
+    """Serve the project on a free local port for the duration of the block; yields the base URL."""
+    server = ThreadedWSGIServer(('127.0.0.1', 0), BenchmarkRequestHandler, allow_reuse_address=False)
+    server.set_app(BenchmarkHandler())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_address[1]}'
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def run_server(base_url, requests, workers):
+    """Send ``requests`` over HTTP on ``workers`` keep-alive connections."""
+    return asyncio.run(loadtest.run_once(base_url, requests, workers))
+
+
+def regressions(baseline, current, tolerance):
+    """Endpoints of ``current`` that got slower than ``baseline`` by more than ``tolerance``, or query more."""
+    found = []
+    for name, before in sorted(baseline['endpoints'].items()):
+        after = current['endpoints'].get(name)
+        if after is None or not before['latency'] or not after['latency']:
+            continue
+        if after['latency']['p95_ms'] > before['latency']['p95_ms'] * (1 + tolerance):
+            found.append(f"{name}: p95 {before['latency']['p95_ms']} -> {after['latency']['p95_ms']} ms")
+        if after['requests_per_second'] * (1 + tolerance) < before['requests_per_second']:
+            found.append(f"{name}: {before['requests_per_second']} -> {after['requests_per_second']} requests/s")
+        if (after['queries'] or 0) > (before['queries'] or 0):
+            found.append(f"{name}: {before['queries']} -> {after['queries']} queries per request")
+    return found
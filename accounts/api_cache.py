@@ -0,0 +1,188 @@
+"""Read-through caching for read-mostly API responses.
+
+Entries live in the Django cache named by ``API_CACHE_ALIAS``, so the
+backend is chosen in settings: the shared LRU file cache works across
+gunicorn workers, the local-memory cache is faster within one process.
+
+Every entry belongs to a scope such as ``doctor_list`` or
+``blog_detail:42``. Each scope has a version token stored next to the
+entries; invalidating a scope replaces the token, which orphans every
+cached variant (filters, pages, sparse fieldsets) of that scope at once
+and leaves them to expire or be evicted.
+"""
+import hashlib
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from rest_framework.response import Response
+
+from .models import Appointment, BlogPost, CustomUser
+
+KEY_PREFIX = 'api'
+
+
+def get_cache():
+    return caches[getattr(settings, 'API_CACHE_ALIAS', 'default')]
+
+
+class CacheStats:
+    """Per-process hit, miss, 304 and invalidation counters by namespace."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: {'hits': 0, 'misses': 0, 'not_modified': 0, 'invalidations': 0})
+
+    def record(self, namespace, outcome):
+        with self._lock:
+            self._counts[namespace][outcome] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {namespace: dict(counts) for namespace, counts in self._counts.items()}
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+stats = CacheStats()
+
+
+def namespace_of(scope):
+    return scope.split(':', 1)[0]
+
+
+def version_key(scope):
+    return f'{KEY_PREFIX}:{scope}:version'
+
+
+def scope_version(scope):
+    cache = get_cache()
+    version = cache.get(version_key(scope))
+    if version is None:
+        cache.add(version_key(scope), time.time_ns(), timeout=None)
+        version = cache.get(version_key(scope))
+    return version
+
+
+def request_key(scope, request, *parts):
+    """Cache key for ``request`` within ``scope``.
+
+    The host (absolute media URLs) and the query string (filters, cursor,
+    ``fields``) are part of the key, hashed to stay within backend limits.
+    """
+    params = sorted((key, value) for key in request.query_params for value in request.query_params.getlist(key))
+    digest = hashlib.sha1(repr((request.get_host(), params, parts)).encode()).hexdigest()
+    return f'{KEY_PREFIX}:{scope}:{scope_version(scope)}:{digest}'
+
+
+def _conditional(scope, request, parts):
+    """``(key, etag, response)``; ``response`` is a 304 when ``If-None-Match`` matches."""
+    key = request_key(scope, request, *parts)
+    renderer = getattr(request, 'accepted_renderer', None)
+    etag = '"%s"' % hashlib.sha1(f'{key}:{getattr(renderer, "format", "")}'.encode()).hexdigest()
+    return key, etag, get_conditional_response(request, etag=etag)
+
+
+def _lookup(namespace, key):
+    value = get_cache().get(key)
+    stats.record(namespace, 'misses' if value is None else 'hits')
+    return value
+
+
+def _store(key, value, timeout):
+    get_cache().set(key, value, getattr(settings, 'API_CACHE_TIMEOUT', 300) if timeout is None else timeout)
+
+
+def _finish(response, etag):
+    response['ETag'] = etag
+    # Authenticated data: browsers may keep it but must revalidate each use.
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def cached_response(scope, request, build, *parts, timeout=None):
+    """Respond with ``build()`` for ``request``, served from cache and conditional GET.
+
+    ``build`` must return serializable data; raising (for example Http404)
+    skips the cache. ``parts`` are extra values the response depends on.
+
+    The ETag is derived from the cache key, which already carries the
+    scope's version token, so a matching ``If-None-Match`` is answered with
+    304 after a single cache read: no query and no serialization.
+    """
+    namespace = namespace_of(scope)
+    key, etag, response = _conditional(scope, request, parts)
+    if response is not None:
+        stats.record(namespace, 'not_modified')
+    else:
+        value = _lookup(namespace, key)
+        if value is None:
+            value = build()
+            _store(key, value, timeout)
+        response = Response(value)
+    return _finish(response, etag)
+
+
+async def acached_response(scope, request, build, *parts, timeout=None):
+    """``cached_response()`` for async views, with ``build`` a coroutine function.
+
+    Entries and ETags are shared with the sync views. The cache is read
+    directly rather than through a thread: local memory and local files
+    answer faster than a hop would take. The body is rendered with
+    ``request.accepted_renderer``.
+    """
+    namespace = namespace_of(scope)
+    key, etag, response = _conditional(scope, request, parts)
+    if response is not None:
+        stats.record(namespace, 'not_modified')
+    else:
+        value = _lookup(namespace, key)
+        if value is None:
+            value = await build()
+            _store(key, value, timeout)
+        renderer = request.accepted_renderer
+        response = HttpResponse(renderer.render(value), content_type=renderer.media_type)
+    return _finish(response, etag)
+
+
+def invalidate(*scopes):
+    """Drop every cached entry of ``scopes``, now and again when the transaction commits.
+
+    The second pass discards anything another request cached from the
+    pre-commit rows in between.
+    """
+    def bump():
+        cache = get_cache()
+        cache.set_many({version_key(scope): time.time_ns() for scope in scopes}, timeout=None)
+
+    bump()
+    transaction.on_commit(bump)
+    for scope in scopes:
+        stats.record(namespace_of(scope), 'invalidations')
+
+
+def scopes_for(instance):
+    """Cache scopes whose responses include ``instance``."""
+    if isinstance(instance, BlogPost):
+        return ['blog_feed', f'blog_detail:{instance.pk}']
+    if isinstance(instance, Appointment):
+        return [f'doctor_slots:{instance.doctor_id}']
+    if isinstance(instance, CustomUser) and instance.user_type == 'doctor':
+        # Blog posts embed their author's name and picture.
+        post_ids = BlogPost.objects.filter(author_id=instance.pk).values_list('id', flat=True)
+        return ['doctor_list', f'doctor_detail:{instance.pk}', 'blog_feed',
+                *(f'blog_detail:{post_id}' for post_id in post_ids)]
+    return []
+
+
+def invalidate_instance(instance):
+    scopes = scopes_for(instance)
+    if scopes:
+        invalidate(*scopes)
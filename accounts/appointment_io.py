@@ -0,0 +1,328 @@
+"""Bulk appointment import and export as CSV or JSON Lines.
+
+Both directions stream. An import reads the file row by row and works in
+chunks of ``CHUNK_SIZE``: the chunk's usernames are resolved in one
+query, its doctors' existing bookings are fetched in one query and
+checked for overlaps together with the chunk's own rows, and the valid
+rows are inserted with ``bulk_create``. Invalid rows are reported by
+line number and skipped, so one bad row does not sink a migration. A file
+that cannot be read past some line (bad encoding, broken CSV quoting)
+stops the import there: the rows before it are still imported, and the
+report gives the line alongside what was created, so the rest can be
+fixed and imported on its own.
+
+Like ``book_slot``, each chunk locks its doctors' rows while it checks
+and inserts, so live bookings cannot slip in between. Imported
+appointments are not pushed to Google Calendar unless asked, since a
+clinic moving to us usually has them there already.
+
+An export reads keyset batches of ``EXPORT_CHUNK_SIZE`` rows, each a
+separate query starting after the last (date, start_time, id) of the one
+before, and yields one line per appointment in the format the import
+reads. Memory stays flat on MySQL as well, whose driver would buffer the
+whole result of a single query.
+"""
+import csv
+import json
+from collections import defaultdict
+from itertools import islice
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils.dateparse import parse_date, parse_time
+
+from . import api_cache
+from .booking import InvalidSlot, slot_end
+from .models import Appointment, CalendarSyncJob, CustomUser
+from .streaming import buffered
+
+FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+FIELDS = ('patient', 'doctor', 'speciality', 'date', 'start_time', 'end_time')
+EXPORT_FIELDS = ('id',) + FIELDS + ('created_at',)
+CHUNK_SIZE = 1000
+BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+
+def format_of(name, file_format=None):
+    """``file_format`` if given, else the extension of ``name``; either must be in ``FORMATS``."""
+    file_format = (file_format or name.rpartition('.')[2]).lower()
+    if file_format not in FORMATS:
+        raise ValueError(f'Unknown file format: {file_format}. Use one of {", ".join(FORMATS)}.')
+    return file_format
+
+
+class UnreadableFile(ValueError):
+    """The file cannot be read past ``line - 1``; no row from ``line`` on was imported."""
+
+    def __init__(self, line, error):
+        super().__init__(f'Unreadable file at line {line}: {error}')
+        self.line = line
+
+
+def read_csv(stream):
+    reader = csv.DictReader(stream)
+    line = 0
+    try:
+        for row in reader:
+            yield reader.line_num, row
+            line = reader.line_num
+    except (csv.Error, UnicodeDecodeError) as e:
+        # The failing record starts after the last complete one, or after
+        # the header if no row was read.
+        raise UnreadableFile((line or reader.line_num) + 1, e)
+
+
+def read_jsonl(stream):
+    number = 0
+    try:
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield number, row if isinstance(row, dict) else None
+    except UnicodeDecodeError as e:
+        raise UnreadableFile(number + 1, e)
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl}
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.rejected = 0
+        self.errors = []
+        self.unreadable = None
+
+    def reject(self, line, errors):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'errors_truncated': self.rejected > len(self.errors),
+            'unreadable': self.unreadable and {'line': self.unreadable.line, 'error': str(self.unreadable)},
+        }
+
+
+def import_appointments(stream, file_format, dry_run=False, sync_calendar=False, chunk_size=CHUNK_SIZE):
+    """Import the appointments in the text ``stream`` and return an ``ImportReport``.
+
+    With ``dry_run`` nothing is written; rows are only checked against the
+    database and the other rows of their chunk. If the file turns out to
+    be unreadable, the rows before that point are imported and the error
+    is left in ``report.unreadable``.
+    """
+    report = ImportReport()
+    rows = READERS[file_format](stream)
+    while True:
+        chunk = []
+        try:
+            chunk.extend(islice(rows, chunk_size))
+        except UnreadableFile as e:
+            report.unreadable = e
+        if chunk:
+            report.rows += len(chunk)
+            import_chunk(chunk, report, dry_run, sync_calendar)
+        if report.unreadable or len(chunk) < chunk_size:
+            return report
+
+
+def import_chunk(chunk, report, dry_run, sync_calendar):
+    users = resolve_users(chunk)
+    appointments = []
+    for line, row in chunk:
+        appointment, errors = clean_row(row, users)
+        if errors:
+            report.reject(line, errors)
+        else:
+            appointments.append((line, appointment))
+    if not appointments:
+        return
+    doctor_ids = {appointment.doctor_id for _, appointment in appointments}
+    try:
+        with transaction.atomic():
+            if not dry_run:
+                list(CustomUser.objects.select_for_update().filter(id__in=doctor_ids).values_list('id'))
+            accepted = []
+            for line, appointment, error in check_overlaps(appointments):
+                if error:
+                    report.reject(line, {'start_time': [error]})
+                else:
+                    accepted.append((line, appointment))
+            if accepted and not dry_run:
+                created = Appointment.objects.bulk_create([appointment for _, appointment in accepted],
+                                                          batch_size=BATCH_SIZE)
+                if sync_calendar:
+                    CalendarSyncJob.objects.bulk_create(
+                        [CalendarSyncJob(appointment_id=pk) for pk in inserted_ids(created)], batch_size=BATCH_SIZE)
+                # bulk_create sends no post_save, so invalidate the doctors' slots here.
+                api_cache.invalidate(*(f'doctor_slots:{doctor_id}' for doctor_id in sorted(doctor_ids)))
+    except IntegrityError:
+        # A booking made without the lock, e.g. on a database where
+        # select_for_update is a no-op, took one of the slots.
+        for line, _ in accepted:
+            report.reject(line, {'start_time': ['A slot in this chunk was booked during the import; retry it.']})
+        return
+    if not dry_run:
+        report.created += len(accepted)
+
+
+def resolve_users(chunk):
+    """``{username: (id, user_type)}`` for every username in ``chunk``, in one query."""
+    names = {
+        row.get(role) for _, row in chunk if row is not None for role in ('patient', 'doctor')
+        if isinstance(row.get(role), str)
+    }
+    return {
+        username: (pk, user_type)
+        for username, pk, user_type in CustomUser.objects.filter(username__in=names)
+        .values_list('username', 'id', 'user_type')
+    }
+
+
+def clean_row(row, users):
+    """``(Appointment, None)`` for a valid row, else ``(None, {field: [message]})``."""
+    if row is None:
+        return None, {'row': ['Not a JSON object.']}
+    errors = {}
+    values = {}
+    for role in ('patient', 'doctor'):
+        username = row.get(role)
+        user = users.get(username) if isinstance(username, str) else None
+        if user is None or user[1] != role:
+            errors[role] = [f'No {role} named {username!r}.']
+        else:
+            values[f'{role}_id'] = user[0]
+    speciality = str(row.get('speciality') or '').strip()
+    if not speciality:
+        errors['speciality'] = ['This field is required.']
+    elif len(speciality) > Appointment._meta.get_field('speciality').max_length:
+        errors['speciality'] = ['Too long.']
+    values['speciality'] = speciality
+    for field, parse in (('date', parse_date), ('start_time', parse_time), ('end_time', parse_time)):
+        raw = str(row.get(field) or '').strip()
+        if not raw:
+            if field != 'end_time':
+                errors[field] = ['This field is required.']
+            values[field] = None
+            continue
+        try:
+            values[field] = parse(raw)
+        except ValueError:
+            values[field] = None
+        if values[field] is None:
+            errors[field] = [f'Invalid {field.replace("_", " ")}: {raw}']
+    if errors:
+        return None, errors
+    if values['end_time'] is None:
+        try:
+            values['end_time'] = slot_end(values['date'], values['start_time'])
+        except InvalidSlot as e:
+            return None, {'start_time': [str(e)]}
+    elif values['end_time'] <= values['start_time']:
+        return None, {'end_time': ['Appointment must end after it starts.']}
+    return Appointment(**values), None
+
+
+def check_overlaps(appointments):
+    """Yield ``(line, appointment, error)``, rejecting rows that overlap a booking or an earlier row.
+
+    Existing bookings on the chunk's (doctor, date) pairs come from one
+    query, grouped by doctor.
+    """
+    dates = defaultdict(set)
+    for _, appointment in appointments:
+        dates[appointment.doctor_id].add(appointment.date)
+    lookup = Q()
+    for doctor_id, days in dates.items():
+        lookup |= Q(doctor_id=doctor_id, date__in=days)
+    booked = defaultdict(list)
+    for doctor_id, day, start, end in Appointment.objects.filter(lookup).values_list(
+            'doctor_id', 'date', 'start_time', 'end_time'):
+        booked[doctor_id, day].append((start, end))
+
+    for line, appointment in appointments:
+        intervals = booked[appointment.doctor_id, appointment.date]
+        if any(start < appointment.end_time and appointment.start_time < end for start, end in intervals):
+            yield line, appointment, 'This slot is already booked.'
+            continue
+        intervals.append((appointment.start_time, appointment.end_time))
+        yield line, appointment, None
+
+
+def inserted_ids(appointments):
+    if connection.features.can_return_rows_from_bulk_insert:
+        return [appointment.pk for appointment in appointments]
+    # MySQL does not report the ids; find the rows by their unique slot.
+    ids = []
+    for start in range(0, len(appointments), BATCH_SIZE):
+        lookup = Q()
+        for appointment in appointments[start:start + BATCH_SIZE]:
+            lookup |= Q(doctor_id=appointment.doctor_id, date=appointment.date, start_time=appointment.start_time)
+        ids += Appointment.objects.filter(lookup).values_list('id', flat=True)
+    return ids
+
+
+def export_rows(appointments):
+    """``EXPORT_FIELDS`` dicts for ``appointments``, read in keyset batches of ``EXPORT_CHUNK_SIZE``."""
+    rows = appointments.order_by('date', 'start_time', 'id').values_list(
+        'id', 'patient__username', 'doctor__username', 'speciality', 'date', 'start_time', 'end_time', 'created_at',
+    )
+    batch = list(rows[:EXPORT_CHUNK_SIZE])
+    while batch:
+        for pk, patient, doctor, speciality, day, start, end, created_at in batch:
+            yield {
+                'id': pk,
+                'patient': patient,
+                'doctor': doctor,
+                'speciality': speciality,
+                'date': day.isoformat(),
+                'start_time': start.strftime('%H:%M'),
+                'end_time': end.strftime('%H:%M'),
+                'created_at': created_at.isoformat(),
+            }
+        if len(batch) < EXPORT_CHUNK_SIZE:
+            break
+        pk, day, start = batch[-1][0], batch[-1][4], batch[-1][5]
+        after = Q(date__gt=day) | Q(date=day, start_time__gt=start) | Q(date=day, start_time=start, id__gt=pk)
+        batch = list(rows.filter(after)[:EXPORT_CHUNK_SIZE])
+
+
+class Echo:
+    """File-like object whose ``write`` returns the text instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(appointments):
+    writer = csv.DictWriter(Echo(), fieldnames=EXPORT_FIELDS)
+    yield writer.writeheader()
+    for row in export_rows(appointments):
+        yield writer.writerow(row)
+
+
+def export_jsonl(appointments):
+    for row in export_rows(appointments):
+        yield json.dumps(row) + '\n'
+
+
+EXPORTERS = {'csv': export_csv, 'jsonl': export_jsonl}
+
+
+def export_appointments(appointments, file_format, buffer_size=EXPORT_BUFFER_SIZE):
+    """Generator of ``appointments`` in ``file_format``, in pieces of about ``buffer_size`` characters."""
+    return buffered(EXPORTERS[file_format](appointments), buffer_size)
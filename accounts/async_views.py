@@ -0,0 +1,240 @@
+"""Async versions of the appointment, blog and doctor APIs.
+
+They are routed under ``api/async/`` and return the same payloads as
+their DRF counterparts in ``views``, sharing the same cache entries and
+ETags. Under ASGI a request is handled on the event loop: the user comes
+from the token's claims, and cache hits and 304s never touch the
+database or a worker thread.
+
+Queries go through the async ORM. Django still runs each one on its
+sync thread because the database drivers block, so the views issue no
+more queries than their sync versions. Booking needs a transaction,
+which the async ORM cannot open, so it makes exactly one hop into
+``book_slot``. The calendar sync is queued by ``book_slot`` and
+performed later by ``sync_calendar``, so no request waits on Google.
+"""
+import logging
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.request import Request
+
+from . import api_cache, blog_feed, streaming
+from .authentication import ClaimsJWTAuthentication
+from .booking import InvalidSlot, SlotUnavailable, afree_slots, book_slot
+from .directory import DOCTOR_PAGINATOR, filter_doctors
+from .models import Appointment, BlogPost, CustomUser
+from .renderers import json_parser, json_renderer
+from .serializers import (
+    AppointmentSerializer, BlogPostListSerializer, BlogPostSerializer, CustomUserSerializer,
+    DoctorListSerializer, requested_fields,
+)
+from .row_serializers import RowSerializer
+from .views import APPOINTMENT_PAGINATOR, appointment_window, slot_range
+
+logger = logging.getLogger(__name__)
+
+authentication = ClaimsJWTAuthentication()
+renderer = json_renderer()
+
+
+def json_response(data, status=status.HTTP_200_OK, headers=None):
+    return HttpResponse(renderer.render(data), content_type=renderer.media_type, status=status, headers=headers)
+
+
+def api(methods, user_type):
+    """Wrap an async view the way ``@api_view`` and ``IsAuthenticated`` wrap the sync ones.
+
+    The view receives a DRF ``Request`` authenticated by JWT, so the
+    helpers shared with the sync views (query params, sparse fieldsets,
+    pagination, the response cache) work unchanged.
+    """
+    def decorator(view):
+        @csrf_exempt
+        @require_http_methods(methods)
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            request = Request(request, parsers=[json_parser(), FormParser(), MultiPartParser()])
+            request.accepted_renderer = renderer
+            try:
+                auth = await authentication.aauthenticate(request)
+                if auth is None:
+                    return json_response({'detail': 'Authentication credentials were not provided.'},
+                                         status.HTTP_401_UNAUTHORIZED,
+                                         {'WWW-Authenticate': authentication.authenticate_header(request)})
+                request.user, request.auth = auth
+                if request.user.user_type != user_type:
+                    return json_response({'error': 'Unauthorized'}, status.HTTP_403_FORBIDDEN)
+                return await view(request, *args, **kwargs)
+            except Http404 as e:
+                return json_response({'detail': str(e) or 'Not found.'}, status.HTTP_404_NOT_FOUND)
+            except APIException as e:
+                headers = None
+                if e.status_code == status.HTTP_401_UNAUTHORIZED:
+                    headers = {'WWW-Authenticate': authentication.authenticate_header(request)}
+                data = e.detail if isinstance(e.detail, (list, dict)) else {'detail': e.detail}
+                return json_response(data, e.status_code, headers)
+        return wrapper
+    return decorator
+
+
+async def appointment_page(request, appointments):
+    try:
+        appointments, fields = appointment_window(request, appointments)
+        serializer = RowSerializer(AppointmentSerializer, fields)
+        appointments = serializer.values(appointments, extra=APPOINTMENT_PAGINATOR.columns)
+        if streaming.requested(request):
+            appointments = APPOINTMENT_PAGINATOR.remaining(appointments, request)
+            return streaming.astream_list(request, 'appointments', appointments, serializer, APPOINTMENT_PAGINATOR,
+                                          {'next_cursor': None})
+        rows, next_cursor = await APPOINTMENT_PAGINATOR.apaginate(appointments, request)
+    except ValueError as e:
+        return json_response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+    return json_response({'appointments': serializer.many(rows), 'next_cursor': next_cursor})
+
+
+@api(['GET'], 'patient')
+async def patient_appointments(request):
+    return await appointment_page(request, Appointment.objects.filter(patient=request.user).with_users())
+
+
+@api(['GET'], 'doctor')
+async def doctor_appointments(request):
+    return await appointment_page(request, Appointment.objects.filter(doctor=request.user).with_users())
+
+
+@api(['GET'], 'patient')
+async def appointment_confirmed(request, appointment_id):
+    fields = requested_fields(request)
+    appointments = AppointmentSerializer.optimize(Appointment.objects.all(), fields)
+    appointment = await aget_object_or_404(appointments, id=appointment_id, patient=request.user)
+    return json_response(AppointmentSerializer(appointment, fields=fields).data)
+
+
+@api(['POST'], 'patient')
+async def book_appointment(request, doctor_id):
+    doctor = await aget_object_or_404(CustomUser.objects.only('id'), id=doctor_id, user_type='doctor')
+    serializer = AppointmentSerializer(data=request.data)
+    if not serializer.is_valid():
+        return json_response(serializer.errors, status.HTTP_400_BAD_REQUEST)
+    try:
+        appointment = await sync_to_async(book_slot)(request.user, doctor, **serializer.validated_data)
+    except InvalidSlot as e:
+        return json_response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+    except SlotUnavailable as e:
+        return json_response({'error': str(e)}, status.HTTP_409_CONFLICT)
+    logger.info('Appointment %s booked with doctor %s', appointment.id, doctor.id)
+    return json_response({'message': 'Appointment booked', 'id': appointment.id}, status.HTTP_201_CREATED)
+
+
+@api(['GET'], 'patient')
+async def patient_blog_list(request):
+    try:
+        limit = blog_feed.per_category_limit(request)
+    except ValueError as e:
+        return json_response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+    return await blog_feed.afeed_response(request, limit)
+
+
+@api(['GET'], 'patient')
+async def patient_blog_category(request, category):
+    labels = dict(BlogPost.CATEGORY_CHOICES)
+    if category not in labels:
+        return json_response({'error': 'Unknown category'}, status.HTTP_404_NOT_FOUND)
+    fields = requested_fields(request)
+
+    async def build():
+        serializer = RowSerializer(BlogPostListSerializer, fields, request)
+        blogs = serializer.values(blog_feed.published_posts().filter(category=category),
+                                  extra=blog_feed.CATEGORY_PAGINATOR.columns)
+        blogs, next_cursor = await blog_feed.CATEGORY_PAGINATOR.apaginate(blogs, request)
+        return {
+            'category': category,
+            'label': labels[category],
+            'blogs': serializer.many(blogs),
+            'next_cursor': next_cursor,
+        }
+
+    try:
+        return await api_cache.acached_response('blog_feed', request, build, category)
+    except ValueError as e:
+        return json_response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+
+
+@api(['GET'], 'patient')
+async def patient_blog_detail(request, blog_id):
+    fields = requested_fields(request)
+
+    async def build():
+        blogs = BlogPostSerializer.optimize(BlogPost.objects.all(), fields)
+        blog = await aget_object_or_404(blogs, id=blog_id, is_draft=False)
+        return BlogPostSerializer(blog, fields=fields).data
+
+    return await api_cache.acached_response(f'blog_detail:{blog_id}', request, build)
+
+
+@api(['GET'], 'patient')
+async def doctor_list(request):
+    fields = requested_fields(request)
+    if streaming.requested(request):
+        doctors = DoctorListSerializer.optimize(filter_doctors(request.query_params), fields,
+                                                extra=DOCTOR_PAGINATOR.ordering)
+        try:
+            doctors = DOCTOR_PAGINATOR.remaining(doctors, request)
+        except ValueError as e:
+            return json_response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+        return streaming.astream_list(request, 'doctors', doctors, DoctorListSerializer(fields=fields),
+                                      DOCTOR_PAGINATOR, {'next_cursor': None})
+
+    async def build():
+        doctors = DoctorListSerializer.optimize(filter_doctors(request.query_params), fields,
+                                                extra=DOCTOR_PAGINATOR.ordering)
+        doctors, next_cursor = await DOCTOR_PAGINATOR.apaginate(doctors, request)
+        serializer = DoctorListSerializer(doctors, many=True, fields=fields)
+        return {'doctors': serializer.data, 'next_cursor': next_cursor}
+
+    try:
+        return await api_cache.acached_response('doctor_list', request, build)
+    except ValueError as e:
+        return json_response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+
+
+@api(['GET'], 'patient')
+async def doctor_detail(request, doctor_id):
+    fields = requested_fields(request)
+
+    async def build():
+        doctors = CustomUserSerializer.optimize(CustomUser.objects.all(), fields)
+        doctor = await doctors.aget(id=doctor_id, user_type='doctor')
+        return CustomUserSerializer(doctor, fields=fields).data
+
+    try:
+        return await api_cache.acached_response(f'doctor_detail:{doctor_id}', request, build)
+    except CustomUser.DoesNotExist:
+        return json_response({'error': 'Doctor not found'}, status.HTTP_404_NOT_FOUND)
+
+
+@api(['GET'], 'patient')
+async def doctor_slots(request, doctor_id):
+    try:
+        date_from, date_to = slot_range(request)
+    except ValueError as e:
+        return json_response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+
+    async def build():
+        if not await CustomUser.objects.filter(id=doctor_id, user_type='doctor').aexists():
+            raise Http404('No CustomUser matches the given query.')
+        slots = await afree_slots(doctor_id, date_from, date_to)
+        return {
+            'doctor': doctor_id,
+            'slots': {day.isoformat(): [start.strftime('%H:%M') for start in starts] for day, starts in slots.items()},
+        }
+
+    return await api_cache.acached_response(f'doctor_slots:{doctor_id}', request, build, date_from, date_to)
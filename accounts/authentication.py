@@ -0,0 +1,148 @@
+"""JWT authentication that trusts the token's claims instead of loading the user.
+
+Tokens carry the user's id, username, user_type and is_staff. The
+authenticated user is a ``CustomUser`` built from those claims with every
+other field deferred, so views can check ``request.user.user_type`` or
+filter on ``request.user`` without a query; reading any other field loads
+the row on demand. Setting ``JWT_USER_CACHE_TIMEOUT`` resolves the full
+user from the cache instead.
+
+Revocation is checked against a denylist in the cache named by
+``JWT_REVOCATION_CACHE_ALIAS``, which must be shared by the workers and
+must never evict live entries, so it is kept apart from the response
+cache. A single token is denied by its ``jti`` on logout, and every
+token of a user is denied when their password, active flag or one of the
+claims changes. Entries expire with the longest-lived token they can
+affect, so the list stays small. ``iat`` has one-second resolution:
+tokens issued in the second of a revocation stay valid, so that logging
+in again right after a password change works.
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import router
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import CustomUser
+
+CLAIM_FIELDS = ('username', 'user_type', 'is_staff')
+# Changing any of these invalidates every token the user holds.
+REVOKE_FIELDS = CLAIM_FIELDS + ('password', 'is_active')
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """Refresh token whose access tokens carry ``CLAIM_FIELDS``."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for field in CLAIM_FIELDS:
+            token[field] = getattr(user, field)
+        return token
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = ClaimsRefreshToken
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        check_not_revoked(self.token_class(attrs['refresh']))
+        return super().validate(attrs)
+
+
+def token_key(jti):
+    return f'jwt:deny:{jti}'
+
+
+def user_key(user_id):
+    return f'jwt:deny:user:{user_id}'
+
+
+def full_user_key(user_id):
+    return f'jwt:user:{user_id}'
+
+
+def revocations():
+    return caches[getattr(settings, 'JWT_REVOCATION_CACHE_ALIAS', 'revocations')]
+
+
+def revoke_token(token):
+    """Deny ``token`` until it would have expired anyway."""
+    remaining = int(token['exp'] - time.time())
+    if remaining > 0:
+        revocations().set(token_key(token[api_settings.JTI_CLAIM]), 1, remaining)
+
+
+def revoke_user(user_id):
+    """Deny every token issued to the user before the current second."""
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+    revocations().set(user_key(user_id), int(time.time()), int(lifetime.total_seconds()))
+    forget_user(user_id)
+
+
+def forget_user(user_id):
+    cache.delete(full_user_key(user_id))
+
+
+def check_not_revoked(token):
+    user_id = token.get(api_settings.USER_ID_CLAIM)
+    denied = revocations().get_many([token_key(token.get(api_settings.JTI_CLAIM)), user_key(user_id)])
+    if token_key(token.get(api_settings.JTI_CLAIM)) in denied:
+        raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+    revoked_before = denied.get(user_key(user_id))
+    if revoked_before is not None and token.get('iat', 0) < revoked_before:
+        raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+
+
+def claims_user(token):
+    """A ``CustomUser`` holding only the token's claims; other fields load on access."""
+    values = {'id': token[api_settings.USER_ID_CLAIM], 'is_active': True}
+    values.update((field, token[field]) for field in CLAIM_FIELDS)
+    attnames = [field.attname for field in CustomUser._meta.concrete_fields if field.attname in values]
+    return CustomUser.from_db(router.db_for_read(CustomUser), attnames, [values[name] for name in attnames])
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('Token contained no recognizable user identification')
+        check_not_revoked(validated_token)
+        timeout = getattr(settings, 'JWT_USER_CACHE_TIMEOUT', 0)
+        if timeout:
+            key = full_user_key(validated_token[api_settings.USER_ID_CLAIM])
+            user = cache.get(key)
+            if user is None:
+                user = super().get_user(validated_token)
+                cache.set(key, user, timeout)
+            return user
+        if any(field not in validated_token for field in CLAIM_FIELDS):
+            # Issued before the claims were added; load the user instead.
+            return super().get_user(validated_token)
+        return claims_user(validated_token)
+
+    def needs_database(self, validated_token):
+        return bool(getattr(settings, 'JWT_USER_CACHE_TIMEOUT', 0)) or any(
+            field not in validated_token for field in CLAIM_FIELDS)
+
+    async def aauthenticate(self, request):
+        """``authenticate()`` for async views.
+
+        Tokens with claims are resolved on the event loop; only the
+        fallbacks that may load the user run in a thread.
+        """
+        header = self.get_header(request)
+        raw_token = self.get_raw_token(header) if header is not None else None
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        if self.needs_database(validated_token):
+            return await sync_to_async(self.get_user)(validated_token), validated_token
+        return self.get_user(validated_token), validated_token
@@ -0,0 +1,199 @@
+"""Helpers shared by the benchmark management commands.
+
+Seeding bypasses password hashing and model ``save()`` so that millions of
+rows can be generated in a reasonable time; the data is only meant for
+throwaway benchmark databases. The seeders take a ``model`` so that a
+database migrated back to an older schema can be seeded through the
+historical models of that migration state.
+"""
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from itertools import accumulate
+from datetime import date, datetime, time as dtime, timedelta
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+
+from .models import CustomUser, BlogPost, Appointment
+
+CITIES = [
+    ('Pune', 'Maharashtra', '411'),
+    ('Mumbai', 'Maharashtra', '400'),
+    ('Bengaluru', 'Karnataka', '560'),
+    ('Chennai', 'Tamil Nadu', '600'),
+    ('Delhi', 'Delhi', '110'),
+    ('Jaipur', 'Rajasthan', '302'),
+]
+SPECIALITIES = ['General', 'Cardiology', 'Psychiatry', 'Paediatrics', 'Dermatology', 'Orthopaedics']
+MEDICAL_TERMS = ['health', 'heart', 'vaccine', 'immunity', 'sleep', 'stress', 'diet', 'exercise',
+                 'covid', 'symptom', 'doctor', 'patient', 'therapy', 'anxiety', 'pressure', 'blood']
+SLOT_TIMES = [dtime(hour, minute) for hour in range(9, 18) for minute in (0, 45) if (hour, minute) != (17, 45)]
+
+
+def seed_users(user_type, count, prefix=None, batch_size=5000, rng=random, model=CustomUser):
+    prefix = prefix or user_type
+    start = model.objects.count()
+    users = []
+    for i in range(start, start + count):
+        city, state, pin = rng.choice(CITIES)
+        users.append(model(
+            username=f'{prefix}{i}',
+            email=f'{prefix}{i}@bench.invalid',
+            password='!',
+            user_type=user_type,
+            first_name=f'{prefix.title()}{i}',
+            last_name='Bench',
+            address_line1=f'{i} Bench Road',
+            city=city,
+            state=state,
+            pincode=f'{pin}{rng.randrange(1000):03d}',
+        ))
+    model.objects.bulk_create(users, batch_size=batch_size)
+    return list(model.objects.filter(user_type=user_type).values_list('id', flat=True))
+
+
+def seed_appointments(count, doctor_ids, patient_ids, start=date(2020, 1, 1), days=365 * 5,
+                      batch_size=5000, rng=random, model=Appointment):
+    """Create ``count`` appointments spread over ``days`` days, 45 minutes each.
+
+    A doctor's slots are never booked twice, so ``count`` must stay well
+    below ``len(doctor_ids) * days * len(SLOT_TIMES)``.
+    """
+    if count > len(doctor_ids) * days * len(SLOT_TIMES) // 2:
+        raise ValueError('Too many appointments for the doctors and days given.')
+    taken = set()
+    batch = []
+    while len(taken) < count:
+        slot = rng.choice(SLOT_TIMES)
+        doctor_id = rng.choice(doctor_ids)
+        day = start + timedelta(days=rng.randrange(days))
+        if (doctor_id, day, slot) in taken:
+            continue
+        taken.add((doctor_id, day, slot))
+        end = (datetime.combine(start, slot) + timedelta(minutes=45)).time()
+        batch.append(model(
+            patient_id=rng.choice(patient_ids),
+            doctor_id=doctor_id,
+            speciality=rng.choice(SPECIALITIES),
+            date=day,
+            start_time=slot,
+            end_time=end,
+        ))
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
+
+
+def seed_posts(count, author_ids, draft_ratio=0.1, words=200, term_ratio=0.02, batch_size=2000, rng=random,
+               model=BlogPost):
+    """Create ``count`` posts whose bodies are Zipf-distributed filler words.
+
+    Each medical term appears in roughly ``term_ratio`` of the bodies, so
+    searches for them are selective the way real queries are.
+    """
+    filler = [f'word{i}' for i in range(5000)]
+    cum_weights = list(accumulate(1 / rank for rank in range(1, len(filler) + 1)))
+    categories = [choice for choice, _ in model._meta.get_field('category').choices]
+    batch = []
+    for i in range(count):
+        body = rng.choices(filler, cum_weights=cum_weights, k=words)
+        body += [term for term in MEDICAL_TERMS if rng.random() < term_ratio]
+        rng.shuffle(body)
+        batch.append(model(
+            author_id=rng.choice(author_ids),
+            title=' '.join(body[:5]).title(),
+            category=rng.choice(categories),
+            summary=' '.join(body[:20]),
+            content=' '.join(body),
+            is_draft=rng.random() < draft_ratio,
+        ))
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
+
+
+def analyze():
+    """Refresh planner statistics after bulk loads."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('ANALYZE')
+        elif connection.vendor == 'mysql':
+            for model in (CustomUser, BlogPost, Appointment):
+                cursor.execute(f'ANALYZE TABLE {model._meta.db_table}')
+        elif connection.vendor == 'postgresql':
+            cursor.execute('ANALYZE')
+
+
+def time_call(func, repeat=20):
+    """Run ``func`` ``repeat`` times and return latency stats in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples)
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered), 3),
+        'p50_ms': round(percentile(ordered, 50), 3),
+        'p95_ms': round(percentile(ordered, 95), 3),
+        'p99_ms': round(percentile(ordered, 99), 3),
+        'max_ms': round(ordered[-1], 3),
+    }
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    index = (len(ordered) - 1) * pct / 100
+    lower = int(index)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (index - lower)
+
+
+@contextmanager
+def benchmark_database(verbosity=0):
+    """Create a throwaway test database for the duration of the block.
+
+    Benchmarks seed millions of rows, so they never touch the configured
+    database itself.
+    """
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+
+
+@contextmanager
+def sqlite_database(alias=DEFAULT_DB_ALIAS):
+    """Point ``alias`` at SQLite for the duration of the block, whatever it is configured as.
+
+    Combine with ``benchmark_database`` for results that do not depend on
+    the local database server.
+    """
+    settings_dict = connections.settings[alias]
+    saved = dict(settings_dict)
+    connections[alias].close()
+    del connections[alias]
+    settings_dict.update(
+        ENGINE='django.db.backends.sqlite3', NAME=':memory:', OPTIONS={},
+        USER='', PASSWORD='', HOST='', PORT='', TEST={**saved['TEST'], 'NAME': None},
+    )
+    try:
+        yield connections[alias]
+    finally:
+        connections[alias].close()
+        del connections[alias]
+        settings_dict.clear()
+        settings_dict.update(saved)
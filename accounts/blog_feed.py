@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from . import api_cache
+from .models import BlogPost
+from .pagination import KeysetPaginator
+from .row_serializers import RowSerializer
+from .serializers import BlogPostListSerializer
+
+CATEGORY_PAGINATOR = KeysetPaginator(ordering=('-created_at', '-id'), page_size=12, max_page_size=50)
+
+
+def per_category_limit(request=None):
+    default = getattr(settings, 'BLOG_FEED_PER_CATEGORY', 6)
+    if request is None or 'per_category' not in request.query_params:
+        return default
+    try:
+        limit = int(request.query_params['per_category'])
+    except ValueError:
+        raise ValueError('per_category must be an integer')
+    if limit < 1:
+        raise ValueError('per_category must be positive')
+    return min(limit, CATEGORY_PAGINATOR.max_page_size)
+
+
+def published_posts(fields=None):
+    """Published posts with their author joined, loading only the list columns."""
+    published = BlogPost.objects.filter(is_draft=False)
+    return BlogPostListSerializer.optimize(published, fields, extra=('category', 'created_at'))
+
+
+def top_posts_per_category(limit):
+    """Newest ``limit`` published posts of every category in one query."""
+    rank = Window(
+        RowNumber(),
+        partition_by=F('category'),
+        order_by=[F('created_at').desc(), F('id').desc()],
+    )
+    return published_posts().annotate(category_rank=rank).filter(category_rank__lte=limit).order_by('-created_at', '-id')
+
+
+def group_by_category(items, category_of):
+    """Group items by category label, ordered by each category's newest post."""
+    labels = dict(BlogPost.CATEGORY_CHOICES)
+    grouped = {}
+    for item in items:
+        category = category_of(item)
+        grouped.setdefault(labels.get(category, category), []).append(item)
+    return grouped
+
+
+def feed_payload(request, limit):
+    """Serialized ``{category label: [posts]}`` feed."""
+    serializer = RowSerializer(BlogPostListSerializer, request=request)
+    rows = serializer.many(serializer.values(top_posts_per_category(limit)))
+    return group_by_category(rows, lambda row: row['category'])
+
+
+def feed_response(request, limit):
+    """The feed, served from cache when fresh and answering conditional GETs."""
+    return api_cache.cached_response('blog_feed', request, lambda: feed_payload(request, limit), limit,
+                                     timeout=getattr(settings, 'BLOG_FEED_CACHE_TIMEOUT', 300))
+
+
+async def afeed_payload(request, limit):
+    serializer = RowSerializer(BlogPostListSerializer, request=request)
+    rows = serializer.many([row async for row in serializer.values(top_posts_per_category(limit))])
+    return group_by_category(rows, lambda row: row['category'])
+
+
+async def afeed_response(request, limit):
+    return await api_cache.acached_response('blog_feed', request, lambda: afeed_payload(request, limit), limit,
+                                            timeout=getattr(settings, 'BLOG_FEED_CACHE_TIMEOUT', 300))
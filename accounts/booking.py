@@ -0,0 +1,143 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from . import google_calendar
+from .models import CustomUser, Appointment, APPOINTMENT_DURATION
+
+
+class SlotUnavailable(Exception):
+    """Raised when a requested slot overlaps an existing booking."""
+
+
+class InvalidSlot(ValueError):
+    """Raised when a requested slot is not one a patient can book at all."""
+
+
+def working_hours():
+    start, end = getattr(settings, 'APPOINTMENT_WORKING_HOURS', ('09:00', '18:00'))
+    return (datetime.strptime(start, '%H:%M').time(), datetime.strptime(end, '%H:%M').time())
+
+
+def slot_end(day, start_time, duration=APPOINTMENT_DURATION):
+    end = datetime.combine(day, start_time) + duration
+    if end.date() != day:
+        raise InvalidSlot('Appointments must end on the day they start.')
+    return end.time()
+
+
+def check_slot(day, start_time, end_time=None):
+    """Return the end of the appointment starting at ``start_time``.
+
+    The end is always ``start_time + APPOINTMENT_DURATION``; a client-supplied
+    ``end_time`` must agree with it, and the whole slot must fall within
+    ``APPOINTMENT_WORKING_HOURS``.
+    """
+    expected = slot_end(day, start_time)
+    if end_time is not None and end_time != expected:
+        raise InvalidSlot(f'An appointment starting at {start_time:%H:%M} ends at {expected:%H:%M}.')
+    opening, closing = working_hours()
+    if start_time < opening or expected > closing:
+        raise InvalidSlot(f'Appointments must be between {opening:%H:%M} and {closing:%H:%M}.')
+    return expected
+
+
+def overlapping(doctor_id, day, start_time, end_time):
+    # Served by the appt_unique_doctor_slot index: equality on (doctor, date),
+    # range on start_time.
+    return Appointment.objects.filter(
+        doctor_id=doctor_id,
+        date=day,
+        start_time__lt=end_time,
+        end_time__gt=start_time,
+    )
+
+
+def book_slot(patient, doctor, date, start_time, speciality, end_time=None):
+    """Create an appointment if the doctor is free for the whole interval.
+
+    The doctor's row is locked for the duration of the check-and-insert, so
+    concurrent bookings for the same doctor are serialized across workers
+    while bookings for different doctors proceed in parallel. The unique
+    (doctor, date, start_time) constraint backs this up on databases where
+    ``select_for_update`` is a no-op. The Google Calendar sync is queued in
+    the same transaction and performed later by ``sync_calendar``.
+
+    Raises ``InvalidSlot`` for a slot ``check_slot`` rejects and
+    ``SlotUnavailable`` when the doctor is already booked.
+    """
+    end_time = check_slot(date, start_time, end_time)
+    try:
+        with transaction.atomic():
+            CustomUser.objects.select_for_update().only('id').get(pk=doctor.pk)
+            if overlapping(doctor.pk, date, start_time, end_time).exists():
+                raise SlotUnavailable('This slot is already booked.')
+            appointment = Appointment.objects.create(
+                patient=patient,
+                doctor=doctor,
+                speciality=speciality,
+                date=date,
+                start_time=start_time,
+                end_time=end_time,
+            )
+            google_calendar.enqueue(appointment)
+            return appointment
+    except IntegrityError:
+        raise SlotUnavailable('This slot is already booked.')
+
+
+def busy_intervals(doctor_id, date_from, date_to):
+    return (
+        Appointment.objects
+        .filter(doctor_id=doctor_id, date__gte=date_from, date__lte=date_to)
+        .order_by('date', 'start_time')
+        .values_list('date', 'start_time', 'end_time')
+    )
+
+
+def free_slots(doctor_id, date_from, date_to, duration=APPOINTMENT_DURATION):
+    """Return ``{date: [start_time, ...]}`` of bookable slots in the range.
+
+    All of the doctor's bookings in the range are read in one indexed query
+    and swept against the slot grid, so the cost is proportional to the
+    number of days plus the number of bookings.
+    """
+    return sweep_slots(busy_intervals(doctor_id, date_from, date_to), date_from, date_to, duration)
+
+
+async def afree_slots(doctor_id, date_from, date_to, duration=APPOINTMENT_DURATION):
+    rows = [row async for row in busy_intervals(doctor_id, date_from, date_to)]
+    return sweep_slots(rows, date_from, date_to, duration)
+
+
+def sweep_slots(rows, date_from, date_to, duration):
+    """Free slots per day given ``(date, start, end)`` bookings sorted by date and start."""
+    day_start, day_end = working_hours()
+    busy = {}
+    for day, start, end in rows:
+        busy.setdefault(day, []).append((start, end))
+
+    slots = {}
+    day = date_from
+    while day <= date_to:
+        booked = busy.get(day, [])
+        index = 0
+        free = []
+        cursor = datetime.combine(day, day_start)
+        closing = datetime.combine(day, day_end)
+        while cursor + duration <= closing:
+            start, end = cursor.time(), (cursor + duration).time()
+            # Skip bookings that finish before this slot begins.
+            while index < len(booked) and booked[index][1] <= start:
+                index += 1
+            if index >= len(booked) or booked[index][0] >= end:
+                free.append(start)
+                cursor += duration
+            else:
+                # Jump to the end of the clashing booking rather than probing
+                # every grid step inside it.
+                cursor = datetime.combine(day, booked[index][1])
+        slots[day] = free
+        day += timedelta(days=1)
+    return slots
@@ -0,0 +1,61 @@
+import os
+
+from django.core.cache.backends.filebased import FileBasedCache
+
+_missing = object()
+
+
+class LRUFileBasedCache(FileBasedCache):
+    """File cache shared by every worker on the host, culled least-recently-used first.
+
+    Django's file cache culls a random sample once ``MAX_ENTRIES`` is
+    reached. Here a hit bumps the entry's mtime and culling removes the
+    entries with the oldest mtimes, so hot keys survive.
+    """
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version)
+        if value is _missing:
+            return default
+        try:
+            os.utime(self._key_to_file(key, version))
+        except OSError:
+            pass
+        return value
+
+    def _cull(self):
+        filelist = self._list_cache_files()
+        num_entries = len(filelist)
+        if num_entries < self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            return self.clear()
+        by_age = []
+        for fname in filelist:
+            try:
+                by_age.append((os.path.getmtime(fname), fname))
+            except OSError:
+                pass
+        by_age.sort()
+        for _, fname in by_age[:int(num_entries / self._cull_frequency)]:
+            self._delete(fname)
+
+
+class PersistentFileBasedCache(FileBasedCache):
+    """File cache that never evicts an entry before its timeout.
+
+    Once ``MAX_ENTRIES`` is reached, culling only removes expired entries;
+    live ones stay however many there are. For state that must not be
+    lost to cache pressure, such as the JWT denylist.
+    """
+
+    def _cull(self):
+        filelist = self._list_cache_files()
+        if len(filelist) < self._max_entries:
+            return
+        for fname in filelist:
+            try:
+                with open(fname, 'rb') as f:
+                    self._is_expired(f)
+            except FileNotFoundError:
+                pass
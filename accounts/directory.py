@@ -0,0 +1,22 @@
+from .models import CustomUser
+from .pagination import KeysetPaginator
+
+DOCTOR_PAGINATOR = KeysetPaginator(ordering=('first_name', 'last_name', 'id'), page_size=24, max_page_size=100)
+
+# Query parameter -> lookup; each is backed by a (user_type, column) index.
+DIRECTORY_FILTERS = {
+    'city': 'city__iexact',
+    'state': 'state__iexact',
+    'speciality': 'speciality__iexact',
+    'pincode': 'pincode__startswith',
+}
+
+
+def filter_doctors(params):
+    """Doctors matching the directory filters present in ``params``."""
+    doctors = CustomUser.objects.filter(user_type='doctor')
+    for param, lookup in DIRECTORY_FILTERS.items():
+        value = params.get(param, '').strip()
+        if value:
+            doctors = doctors.filter(**{lookup: value})
+    return doctors
@@ -0,0 +1,202 @@
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import CalendarSyncJob
+
+logger = logging.getLogger(__name__)
+
+CALENDAR_ID = 'primary'
+CALENDAR_TIME_ZONE = 'Asia/Kolkata'
+SCOPES = ['https://www.googleapis.com/auth/calendar']
+
+
+# Calendar recommends at most 50 calls per batch request.
+BATCH_LIMIT = 50
+
+_discovery_document = None
+_discovery_lock = threading.Lock()
+_client = None
+_client_lock = threading.Lock()
+
+
+def discovery_document():
+    """Parse the bundled Calendar v3 discovery document once per process."""
+    global _discovery_document
+    if _discovery_document is None:
+        with _discovery_lock:
+            if _discovery_document is None:
+                from googleapiclient.discovery_cache import get_static_doc
+                _discovery_document = json.loads(get_static_doc('calendar', 'v3'))
+    return _discovery_document
+
+
+class GoogleCalendarClient:
+    """Calendar v3 client that reuses credentials and service objects.
+
+    Credentials are loaded once and refreshed only when they have expired.
+    ``httplib2`` connections are not thread-safe, so each thread gets its
+    own service object built from the shared, pre-parsed discovery document.
+    """
+
+    def __init__(self, credentials_path=None, calendar_id=CALENDAR_ID, credentials=None, root_url=None):
+        self.credentials_path = credentials_path or settings.GOOGLE_CALENDAR_CREDENTIALS_PATH
+        self.calendar_id = calendar_id
+        self.root_url = root_url
+        self._credentials = credentials
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def get_credentials(self):
+        with self._lock:
+            if self._credentials is None:
+                from google.oauth2 import service_account
+
+                if not os.path.exists(self.credentials_path):
+                    raise FileNotFoundError(f"Credentials file not found at {self.credentials_path}")
+                self._credentials = service_account.Credentials.from_service_account_file(
+                    self.credentials_path, scopes=SCOPES)
+            if not self._credentials.valid:
+                from google.auth.transport.requests import Request
+                self._credentials.refresh(Request())
+            return self._credentials
+
+    @property
+    def service(self):
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            import httplib2
+            from google_auth_httplib2 import AuthorizedHttp
+            from googleapiclient.discovery import build_from_document
+
+            document = discovery_document()
+            if self.root_url:
+                document = dict(document, rootUrl=self.root_url)
+            http = AuthorizedHttp(self.get_credentials(), http=httplib2.Http(timeout=30))
+            service = build_from_document(document, http=http)
+            self._local.service = service
+        return service
+
+    def insert_event(self, event):
+        return self.insert_events([event])[0]
+
+    def insert_events(self, events):
+        """Insert ``events`` using batch requests of up to ``BATCH_LIMIT`` calls.
+
+        Returns one entry per event, in order: the created event id, or the
+        exception raised for that event.
+        """
+        results = [None] * len(events)
+
+        def callback(request_id, response, exception):
+            results[int(request_id)] = exception if exception is not None else response.get('id', '')
+
+        for offset in range(0, len(events), BATCH_LIMIT):
+            chunk = range(offset, min(offset + BATCH_LIMIT, len(events)))
+            try:
+                # Touch credentials first so an expired token is refreshed
+                # once, under the lock, rather than by every thread.
+                self.get_credentials()
+                batch = self.service.new_batch_http_request(callback=callback)
+                for index in chunk:
+                    request = self.service.events().insert(calendarId=self.calendar_id, body=events[index])
+                    batch.add(request, request_id=str(index))
+                batch.execute()
+            except Exception as e:
+                for index in chunk:
+                    if results[index] is None:
+                        results[index] = e
+        return results
+
+
+def get_client():
+    """Return the process-wide calendar client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = GoogleCalendarClient()
+    return _client
+
+
+def build_event(appointment):
+    start_datetime = datetime.combine(appointment.date, appointment.start_time)
+    end_datetime = datetime.combine(appointment.date, appointment.end_time)
+    return {
+        'summary': f'Appointment with {appointment.patient.first_name} {appointment.patient.last_name}',
+        'description': f'Medical appointment for {appointment.speciality}',
+        'start': {
+            'dateTime': start_datetime.isoformat(),
+            'timeZone': CALENDAR_TIME_ZONE,
+        },
+        'end': {
+            'dateTime': end_datetime.isoformat(),
+            'timeZone': CALENDAR_TIME_ZONE,
+        },
+    }
+
+
+def enqueue(appointment):
+    """Queue ``appointment`` for syncing; call inside the booking transaction."""
+    return CalendarSyncJob.objects.create(appointment=appointment)
+
+
+def retry_delay(attempts):
+    base = getattr(settings, 'CALENDAR_SYNC_RETRY_BASE_SECONDS', 30)
+    cap = getattr(settings, 'CALENDAR_SYNC_RETRY_MAX_SECONDS', 3600)
+    return timedelta(seconds=min(cap, base * 2 ** (attempts - 1)))
+
+
+def claim_due_jobs(limit, now=None):
+    """Lease up to ``limit`` due jobs to the calling worker.
+
+    The claim is a short transaction that pushes ``next_attempt_at`` out by
+    the lease period, so other workers skip these rows while the slow API
+    calls happen outside any transaction. A worker that dies mid-batch
+    simply lets the lease expire and the jobs become due again.
+    """
+    now = now or timezone.now()
+    lease = timedelta(seconds=getattr(settings, 'CALENDAR_SYNC_LEASE_SECONDS', 300))
+    with transaction.atomic():
+        due = CalendarSyncJob.objects.filter(status='pending', next_attempt_at__lte=now).order_by('next_attempt_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list('id', flat=True)[:limit])
+        CalendarSyncJob.objects.filter(id__in=ids).update(next_attempt_at=now + lease)
+    return list(CalendarSyncJob.objects.filter(id__in=ids).select_related('appointment__patient').order_by('id'))
+
+
+def process_due_jobs(client, limit=100, now=None):
+    """Push due jobs through ``client`` in one batch; returns ``(synced, failed)``."""
+    max_attempts = getattr(settings, 'CALENDAR_SYNC_MAX_ATTEMPTS', 8)
+    synced = failed = 0
+    jobs = claim_due_jobs(limit, now)
+    if not jobs:
+        return synced, failed
+    results = client.insert_events([build_event(job.appointment) for job in jobs])
+    for job, result in zip(jobs, results):
+        job.attempts += 1
+        if isinstance(result, Exception):
+            failed += 1
+            job.last_error = str(result)
+            if job.attempts >= max_attempts:
+                job.status = 'failed'
+                logger.error('Calendar sync for appointment %s gave up after %s attempts: %s',
+                             job.appointment_id, job.attempts, result)
+            else:
+                job.next_attempt_at = (now or timezone.now()) + retry_delay(job.attempts)
+                logger.warning('Calendar sync for appointment %s failed (attempt %s): %s',
+                               job.appointment_id, job.attempts, result)
+        else:
+            synced += 1
+            job.status = 'done'
+            job.event_id = result or ''
+            job.last_error = ''
+        job.save(update_fields=['status', 'attempts', 'next_attempt_at', 'last_error', 'event_id', 'updated_at'])
+    return synced, failed
@@ -0,0 +1,250 @@
+"""Fixed-size WebP derivatives of uploaded images.
+
+Lists and dashboards show avatars and blog cards at a few hundred pixels,
+so each upload is rendered once into the sizes the pages actually use
+and the serializers and templates link to those instead of the original.
+Rendering happens on a worker pool after the upload has been saved, so
+request latency does not depend on the size of the image.
+
+The same job first strips EXIF (GPS position, camera serials), XMP and
+comments from the original: it is stored again without them, every row
+using it is pointed at the copy, and the uploaded file is deleted.
+"""
+import logging
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import ExifTags, Image, ImageOps
+
+from .api_cache import invalidate_instance
+from .models import BlogPost, CustomUser
+
+logger = logging.getLogger(__name__)
+
+# ``crop`` fills the box exactly (avatars, cards); otherwise the image is
+# scaled down to fit inside it and never enlarged.
+Derivative = namedtuple('Derivative', ['field', 'size', 'crop'])
+
+DERIVATIVES = {
+    CustomUser: {
+        # 120px avatar on the dashboards, rendered for 2x screens.
+        'profile_picture': [Derivative('profile_thumbnail', (240, 240), True)],
+    },
+    BlogPost: {
+        # 200px-tall blog cards, and the 300px-tall detail header.
+        'image': [
+            Derivative('image_thumbnail', (800, 400), True),
+            Derivative('image_webp', (1600, 1600), False),
+        ],
+    },
+}
+
+WEBP_QUALITY = 80
+# Formats whose originals are re-encoded without metadata, and the
+# quality used when the pixels have to be rotated first.
+STRIPPED_FORMATS = ('JPEG', 'PNG', 'WEBP')
+STRIPPED_QUALITY = 95
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def render(source, size, crop=False):
+    """Render the image in file object ``source`` as WebP bytes no larger than ``size``."""
+    with Image.open(source) as image:
+        # Let JPEG decode at a reduced scale; a 4000px photo bound for a
+        # 240px thumbnail never needs to be decoded at full size.
+        image.draft('RGB', (max(size), max(size)))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            has_alpha = image.mode in ('LA', 'PA') or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+        if crop:
+            image = ImageOps.fit(image, size, Image.Resampling.LANCZOS)
+        else:
+            image.thumbnail(size, Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        # exif_transpose() already applied the orientation; EXIF (GPS,
+        # camera serials) is not copied into the derivative.
+        image.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def strip_metadata(source):
+    """The image in file object ``source`` re-encoded without metadata, or None if it has none.
+
+    The EXIF orientation is applied to the pixels so the image still shows
+    the right way up; otherwise JPEGs keep their quantization tables.
+    Animations and formats Pillow cannot write are left as they are.
+    """
+    with Image.open(source) as image:
+        if (image.format not in STRIPPED_FORMATS or getattr(image, 'n_frames', 1) > 1
+                or not (image.getexif() or any(key in image.info for key in METADATA_KEYS))):
+            return None
+        image_format = image.format
+        options = {}
+        if 'icc_profile' in image.info:
+            options['icc_profile'] = image.info['icc_profile']
+        if image_format == 'JPEG':
+            options['comment'] = b''
+        if image.getexif().get(ExifTags.Base.Orientation, 1) == 1:
+            if image_format == 'JPEG':
+                options.update(quality='keep', subsampling='keep')
+        else:
+            image = ImageOps.exif_transpose(image)
+            if image_format != 'PNG':
+                options['quality'] = STRIPPED_QUALITY
+        buffer = BytesIO()
+        image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def strip_original(instance, source_field):
+    """Store the ``source_field`` image again without metadata and move every row using it to the copy.
+
+    Returns the rows that were moved, ``instance`` among them, so that
+    their cached responses can be dropped; the field on ``instance`` is
+    updated in place. The old file is deleted once the move commits.
+    """
+    original = getattr(instance, source_field)
+    name = original.name
+    original.open('rb')
+    try:
+        content = strip_metadata(original)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning('Could not strip %s of %s %s: %s', source_field, type(instance).__name__, instance.pk, e)
+        return []
+    finally:
+        original.close()
+    if content is None:
+        return []
+    original.save(os.path.basename(name), ContentFile(content), save=False)
+    if original.name == name:
+        return []
+    model = type(instance)
+    with transaction.atomic():
+        # Identical uploads share one stored file, so they move together.
+        rows = list(model.objects.select_for_update().filter(**{source_field: name}))
+        model.objects.filter(pk__in=[row.pk for row in rows]).update(**{source_field: original.name})
+        transaction.on_commit(partial(original.storage.delete, name))
+    return rows
+
+
+def derivative_name(source_name):
+    return os.path.splitext(os.path.basename(source_name))[0] + '.webp'
+
+
+def build_derivatives(instance, source_field):
+    """Render and store every derivative of the stored ``source_field`` image.
+
+    The derivative fields are set on the instance but not saved. Returns the
+    names of the fields that were set; an unreadable image is logged and its
+    derivatives are left empty so callers fall back to the original.
+    """
+    original = getattr(instance, source_field)
+    updated = []
+    original.open('rb')
+    try:
+        for derivative in DERIVATIVES[type(instance)][source_field]:
+            original.seek(0)
+            try:
+                content = render(original, derivative.size, derivative.crop)
+            except (OSError, ValueError, Image.DecompressionBombError) as e:
+                logger.warning('Could not render %s for %s %s: %s',
+                               derivative.field, type(instance).__name__, instance.pk, e)
+                continue
+            getattr(instance, derivative.field).save(derivative_name(original.name), ContentFile(content), save=False)
+            updated.append(derivative.field)
+    finally:
+        original.close()
+    return updated
+
+
+def changed_sources(instance):
+    """Source fields of ``instance`` with a new or cleared upload; call before saving.
+
+    Derivatives of a changed source are reset so the original is served
+    until the worker has rendered the new ones.
+    """
+    changed = []
+    for source_field, derivatives in DERIVATIVES[type(instance)].items():
+        original = getattr(instance, source_field)
+        if not original or not original._committed:
+            for derivative in derivatives:
+                setattr(instance, derivative.field, None)
+            if original:
+                changed.append(source_field)
+    return changed
+
+
+def get_executor():
+    """Return the process-wide image worker pool, creating it on first use.
+
+    Threads are enough here: Pillow releases the GIL while decoding,
+    resampling and encoding.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=getattr(settings, 'IMAGE_WORKERS', 2), thread_name_prefix='image-worker')
+    return _executor
+
+
+def schedule(instance, source_fields):
+    """Render derivatives for ``source_fields`` once the saving transaction commits."""
+    if not source_fields:
+        return
+    sources = {field: getattr(instance, field).name for field in source_fields}
+    job = partial(process, type(instance), instance.pk, sources)
+    if getattr(settings, 'IMAGE_WORKERS', 2) > 0:
+        transaction.on_commit(lambda: get_executor().submit(run_in_worker, job))
+    else:
+        transaction.on_commit(job)
+
+
+def run_in_worker(job):
+    try:
+        job()
+    finally:
+        # Each worker thread holds its own database connection.
+        connections.close_all()
+
+
+def process(model, pk, sources):
+    """Worker job: strip and render derivatives of the stored originals named in ``sources``.
+
+    Rows whose original was replaced in the meantime are left for the job
+    scheduled by that newer upload. Anything lost to a crash is picked up
+    by the ``generate_image_derivatives`` command.
+    """
+    try:
+        fields = [derivative.field for source_field in sources for derivative in DERIVATIVES[model][source_field]]
+        instance = model.objects.only('pk', *sources, *fields).filter(pk=pk).first()
+        rendered = 0
+        moved = {}
+        for source_field, name in sources.items():
+            if instance is None or getattr(instance, source_field).name != name:
+                continue
+            rows = strip_original(instance, source_field)
+            moved.update((row.pk, row) for row in rows)
+            updated = build_derivatives(instance, source_field)
+            if updated:
+                # Rows moved along with this one share its derivatives too.
+                rendered += model.objects.filter(
+                    pk__in=[pk, *(row.pk for row in rows)], **{source_field: getattr(instance, source_field).name},
+                ).update(**{field: getattr(instance, field).name for field in updated})
+        if rendered and pk not in moved:
+            invalidate_instance(instance)
+        for row in moved.values():
+            invalidate_instance(row)
+    except Exception:
+        logger.exception('Rendering image derivatives for %s %s failed', model.__name__, pk)
@@ -0,0 +1,168 @@
+"""Closed-loop HTTP load generator for comparing deployments of the API.
+
+Each virtual user holds one connection and sends its next request as soon
+as the previous response has been read, so throughput and latency are
+measured together. The client is a minimal HTTP/1.1 implementation on
+asyncio streams: one process can keep hundreds of connections busy
+without threads, and it needs nothing outside the standard library.
+Connections are reused unless the server closes them, which gunicorn's
+sync workers do after every response.
+"""
+import asyncio
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from .bench import summarize
+
+
+class HttpError(Exception):
+    pass
+
+
+class Connection:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, headers, body=b''):
+        """Send one request and return ``(status, body)``."""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', f'Content-Length: {len(body)}']
+        if body and 'Content-Type' not in headers:
+            lines.append('Content-Type: application/json')
+        lines += [f'{name}: {value}' for name, value in headers.items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        try:
+            status, response_headers = await self._read_head()
+            content = await self._read_body(response_headers)
+        except Exception:
+            # The stream is in an unknown state; start over on a new one.
+            self.close()
+            raise
+        if response_headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, content
+
+    async def _read_head(self):
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        status_line, *header_lines = head.decode('latin-1').split('\r\n')
+        headers = {}
+        for line in header_lines:
+            if line:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+        try:
+            return int(status_line.split()[1]), headers
+        except (IndexError, ValueError):
+            raise HttpError(f'Malformed status line: {status_line!r}')
+
+    async def _read_body(self, headers):
+        if 'content-length' in headers:
+            return await self.reader.readexactly(int(headers['content-length']))
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    return b''.join(chunks)
+                chunks.append(chunk[:-2])
+        body = await self.reader.read()
+        self.close()
+        return body
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def run(base_url, requests, concurrency, duration, warmup=0.0, headers=None):
+    """Drive ``requests`` (``(method, path, body)`` tuples, taken in turn) against ``base_url``.
+
+    Returns throughput, latency in milliseconds and status counts for the
+    responses completed within the ``duration`` after ``warmup`` seconds.
+    """
+    url = urlsplit(base_url)
+    host, port = url.hostname, url.port or 80
+    headers = dict(headers or {})
+    latencies = []
+    statuses = Counter()
+    errors = Counter()
+    started = time.perf_counter()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+
+    async def user(offset):
+        connection = Connection(host, port)
+        index = offset
+        try:
+            while True:
+                before = time.perf_counter()
+                if before >= deadline:
+                    return
+                method, path, body = requests[index % len(requests)]
+                index += 1
+                try:
+                    status, _ = await connection.request(method, url.path.rstrip('/') + path, headers, body)
+                except (OSError, asyncio.IncompleteReadError, HttpError) as e:
+                    if before >= measure_from:
+                        errors[type(e).__name__] += 1
+                    await asyncio.sleep(0.01)
+                    continue
+                after = time.perf_counter()
+                if before >= measure_from and after <= deadline:
+                    latencies.append(after - before)
+                    statuses[status] += 1
+        finally:
+            connection.close()
+
+    await asyncio.gather(*(user(i) for i in range(concurrency)))
+    return report(latencies, statuses, errors, duration)
+
+
+async def run_once(base_url, requests, concurrency):
+    """Send each of ``requests`` (``(method, path, body, headers)`` tuples) once, in order.
+
+    ``concurrency`` connections take the next request as soon as they are
+    free. Returns the same report as ``run``, over the whole batch.
+    """
+    url = urlsplit(base_url)
+    host, port = url.hostname, url.port or 80
+    pending = iter(requests)
+    latencies = []
+    statuses = Counter()
+    errors = Counter()
+
+    async def user():
+        connection = Connection(host, port)
+        try:
+            for method, path, body, headers in pending:
+                before = time.perf_counter()
+                try:
+                    status, _ = await connection.request(method, url.path.rstrip('/') + path, headers, body)
+                except (OSError, asyncio.IncompleteReadError, HttpError) as e:
+                    errors[type(e).__name__] += 1
+                    continue
+                latencies.append(time.perf_counter() - before)
+                statuses[status] += 1
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return report(latencies, statuses, errors, elapsed)
+
+
+def report(latencies, statuses, errors, seconds):
+    """Throughput, latency in milliseconds and status counts of ``latencies`` (seconds) over ``seconds``."""
+    return {
+        'requests_per_second': round(len(latencies) / seconds, 1) if seconds else 0.0,
+        'latency': summarize([latency * 1000 for latency in latencies]) if latencies else None,
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        'errors': dict(sorted(errors.items())),
+    }
@@ -0,0 +1,224 @@
+"""Logging that costs the request thread next to nothing.
+
+``QueueHandler`` only puts the record on an in-memory queue; a listener
+thread formats it, redacts it and writes it out. When the queue is full
+records are dropped and counted rather than blocking the request.
+
+``LogContextMiddleware`` remembers the current request so that
+``RequestContextFilter`` can tag records with the URL name and apply
+per-endpoint sampling: ``LOG_SAMPLE_RATES`` maps URL names to the
+fraction of requests whose DEBUG and INFO records are kept (default
+``LOG_SAMPLE_DEFAULT``). The decision is made once per request, so a
+sampled request keeps all of its records. Warnings and errors are never
+sampled out.
+
+Example ``LOGGING`` wiring::
+
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'json', 'filters': ['redact']},
+        'queue': {'()': 'accounts.log.QueueHandler', 'handlers': ['console'], 'filters': ['request_context']},
+    }
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import threading
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+REDACTED = '[redacted]'
+SENSITIVE_KEYS = frozenset({
+    'password', 'confirm_password', 'new_password', 'old_password',
+    'access', 'refresh', 'token', 'authorization', 'secret',
+})
+# key=value and "key": "value" pairs that reached the message as text.
+SENSITIVE_PAIR = re.compile(
+    r'''(?P<key>['"]?(?:%s)['"]?\s*[:=]\s*)(?P<value>'[^']*'|"[^"]*"|[^\s,;&}]+)''' % '|'.join(SENSITIVE_KEYS),
+    re.IGNORECASE,
+)
+
+_context = contextvars.ContextVar('log_request_context', default=None)
+
+
+class RequestContext:
+    __slots__ = ('request', '_sampled')
+
+    def __init__(self, request):
+        self.request = request
+        self._sampled = None
+
+    @property
+    def endpoint(self):
+        match = getattr(self.request, 'resolver_match', None)
+        return match.url_name if match is not None else None
+
+    @property
+    def sampled(self):
+        if self._sampled is None:
+            rates = getattr(settings, 'LOG_SAMPLE_RATES', {})
+            rate = rates.get(self.endpoint, getattr(settings, 'LOG_SAMPLE_DEFAULT', 1.0))
+            self._sampled = rate >= 1 or random.random() < rate
+        return self._sampled
+
+
+class LogContextMiddleware:
+    """Expose the current request to ``RequestContextFilter``; works under WSGI and ASGI."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _context.set(RequestContext(request))
+        try:
+            return self.get_response(request)
+        finally:
+            _context.reset(token)
+
+    async def __acall__(self, request):
+        token = _context.set(RequestContext(request))
+        try:
+            return await self.get_response(request)
+        finally:
+            _context.reset(token)
+
+
+class RequestContextFilter(logging.Filter):
+    """Tag records with the request's URL name, method and path, and sample them per endpoint."""
+
+    def filter(self, record):
+        context = _context.get()
+        if context is None:
+            return True
+        record.endpoint = context.endpoint
+        record.method = context.request.method
+        record.path = context.request.path
+        return record.levelno >= logging.WARNING or context.sampled
+
+
+def redact(value):
+    """``value`` with the values of sensitive keys replaced, recursing into containers."""
+    if hasattr(value, 'lists') and hasattr(value, 'dict'):
+        # QueryDict: keep every value of multi-valued keys.
+        value = dict(value.lists())
+    if isinstance(value, dict):
+        return {key: REDACTED if str(key).lower() in SENSITIVE_KEYS else redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(redact(item) for item in value)
+    return value
+
+
+class RedactingFilter(logging.Filter):
+    """Scrub credentials from a record's arguments and message.
+
+    Attach it to the handlers behind the queue so that it runs on the
+    listener thread.
+    """
+
+    def filter(self, record):
+        if isinstance(record.args, dict):
+            record.args = redact(record.args)
+        elif record.args:
+            record.args = tuple(redact(arg) for arg in record.args)
+        message = record.getMessage()
+        scrubbed = SENSITIVE_PAIR.sub(lambda m: m['key'] + REDACTED, message)
+        if scrubbed != message:
+            record.msg, record.args = scrubbed, None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    FIELDS = ('endpoint', 'method', 'path')
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in self.FIELDS:
+            if getattr(record, field, None) is not None:
+                entry[field] = getattr(record, field)
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class QueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room: the queue may be full when the process stops.
+        self.queue.put(self._sentinel)
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """Hand records to a listener thread that feeds ``handlers`` (names of configured handlers).
+
+    The listener starts with the first record, and again in each forked
+    worker, since threads do not survive ``fork()``. The handlers are looked
+    up by name only then, so ``dictConfig`` may configure them after this
+    one.
+    """
+
+    def __init__(self, handlers=(), maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.handler_names = list(handlers)
+        self.dropped = 0
+        self._listener = None
+        self._lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._forget_listener)
+        atexit.register(self.stop)
+
+    def prepare(self, record):
+        # Formatting is the listener's job; the record is passed on as is.
+        return record
+
+    def enqueue(self, record):
+        if self._listener is None:
+            self.start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self):
+        with self._lock:
+            if self._listener is None:
+                handlers = [handler_by_name(name) for name in self.handler_names]
+                self._listener = QueueListener(self.queue, *handlers, respect_handler_level=True)
+                self._listener.start()
+
+    def stop(self):
+        with self._lock:
+            if self._listener is not None:
+                # Drains what is already queued before returning.
+                self._listener.stop()
+                self._listener = None
+
+    def _forget_listener(self):
+        self._lock = threading.Lock()
+        self._listener = None
+
+
+def handler_by_name(name):
+    getter = getattr(logging, 'getHandlerByName', None)  # Python 3.12+
+    handler = getter(name) if getter is not None else logging._handlers.get(name)
+    if handler is None:
+        raise ValueError(f'Unknown handler {name!r}')
+    return handler
@@ -0,0 +1,115 @@
+import json
+import random
+import sys
+from contextlib import ExitStack
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from accounts import api_bench, bench
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway SQLite database and benchmark every URL in accounts/urls.py, through the test '
+        'client or a local server. The JSON report is stable across runs of the same options, so it can be '
+        'committed and compared with --baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=200)
+        parser.add_argument('--patients', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--appointments', type=int, default=10_000)
+        parser.add_argument('--seed', type=int, default=1, help='Random seed for the synthetic data.')
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint.')
+        parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests before each endpoint.')
+        parser.add_argument('--workers', type=int, default=8,
+                            help='Concurrent clients for endpoints that only read; writes use one.')
+        parser.add_argument('--server', action='store_true',
+                            help='Serve the project on a local port and send the requests over HTTP.')
+        parser.add_argument('--endpoint', action='append', choices=sorted(api_bench.SCENARIOS),
+                            help='Limit the run to these URL names; repeatable.')
+        parser.add_argument('--configured-database', action='store_true',
+                            help='Benchmark on a test database of the configured engine instead of SQLite.')
+        parser.add_argument('--baseline', help='Earlier report to compare with; regressions fail the command.')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed relative slowdown of p95 latency and throughput against --baseline.')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        if options['patients'] < 2 or options['doctors'] < 2:
+            raise CommandError('Seed at least two patients and two doctors.')
+        names = options['endpoint'] or [name for name in api_bench.url_names() if name in api_bench.SCENARIOS]
+        with ExitStack() as stack:
+            if not options['configured_database']:
+                stack.enter_context(bench.sqlite_database())
+            stack.enter_context(override_settings(
+                # The test client's host and the local server's.
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver', '127.0.0.1'],
+                # Keep benchmark responses out of the shared cache.
+                CACHES={
+                    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'bench-{alias}'}
+                    for alias in settings.CACHES
+                },
+            ))
+            database = stack.enter_context(bench.benchmark_database())
+            self.stderr.write('Seeding...')
+            self.seed(options)
+            fixtures = api_bench.Fixtures()
+            if options['server']:
+                base_url = stack.enter_context(api_bench.local_server())
+                run = lambda requests, workers: api_bench.run_server(base_url, requests, workers)
+            else:
+                run = api_bench.run_client
+            results = {}
+            for name in names:
+                self.stderr.write(f'{name}...')
+                workers = 1 if api_bench.SCENARIOS[name].writes else options['workers']
+                run(api_bench.build_requests(name, fixtures, options['warmup']), workers)
+                requests = api_bench.build_requests(name, fixtures, options['requests'])
+                results[name] = api_bench.measure(name, lambda: run(requests, workers))
+                results[name]['workers'] = workers
+                failed = {code: count for code, count in results[name]['statuses'].items() if int(code) >= 400}
+                if failed or results[name]['errors']:
+                    self.stderr.write(f'  {name}: {failed or results[name]["errors"]}')
+            vendor = database.vendor
+
+        report = {
+            'config': {
+                key: options[key] for key in
+                ('doctors', 'patients', 'posts', 'appointments', 'seed', 'requests', 'warmup', 'workers')
+            },
+            'environment': {
+                'database': vendor,
+                'mode': 'server' if options['server'] else 'client',
+                'python': '.'.join(map(str, sys.version_info[:3])),
+                'django': django.get_version(),
+            },
+            'endpoints': results,
+            'unbenchmarked': api_bench.uncovered(),
+        }
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+        if options['baseline']:
+            with open(options['baseline']) as fh:
+                found = api_bench.regressions(json.load(fh), report, options['tolerance'])
+            for line in found:
+                self.stderr.write(line)
+            if found:
+                raise CommandError(f'{len(found)} regressions against {options["baseline"]}.')
+
+    def seed(self, options):
+        rng = random.Random(options['seed'])
+        doctor_ids = bench.seed_users('doctor', options['doctors'], rng=rng)
+        patient_ids = bench.seed_users('patient', options['patients'], rng=rng)
+        bench.seed_posts(options['posts'], doctor_ids, rng=rng)
+        bench.seed_appointments(options['appointments'], doctor_ids, patient_ids, rng=rng)
+        bench.analyze()
@@ -0,0 +1,79 @@
+import json
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+from accounts import bench
+
+BEFORE_MIGRATION = '0004_alter_customuser_profile_picture'
+AFTER_MIGRATION = '0005_appointment_blogpost_indexes'
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database and report query plans and latency for the hot '
+        'Appointment/BlogPost/CustomUser queries before and after the composite indexes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--appointments', type=int, default=1_000_000)
+        parser.add_argument('--posts', type=int, default=100_000)
+        parser.add_argument('--doctors', type=int, default=2_000)
+        parser.add_argument('--patients', type=int, default=50_000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        with bench.benchmark_database():
+            call_command('migrate', 'accounts', BEFORE_MIGRATION, verbosity=0)
+            # Later migrations add columns, so seed and query through the
+            # models as they were at BEFORE_MIGRATION.
+            apps = MigrationExecutor(connection).loader.project_state(('accounts', BEFORE_MIGRATION)).apps
+            models = {name: apps.get_model('accounts', name) for name in ('CustomUser', 'BlogPost', 'Appointment')}
+            self.stderr.write('Seeding...')
+            doctor_ids = bench.seed_users('doctor', options['doctors'], model=models['CustomUser'])
+            patient_ids = bench.seed_users('patient', options['patients'], model=models['CustomUser'])
+            bench.seed_appointments(options['appointments'], doctor_ids, patient_ids, model=models['Appointment'])
+            bench.seed_posts(options['posts'], doctor_ids, model=models['BlogPost'])
+            queries = self.queries(models, doctor_ids[len(doctor_ids) // 2], patient_ids[len(patient_ids) // 2])
+
+            bench.analyze()
+            before = self.measure(queries, options['repeat'])
+            self.stderr.write('Applying indexes...')
+            call_command('migrate', 'accounts', AFTER_MIGRATION, verbosity=0)
+            bench.analyze()
+            after = self.measure(queries, options['repeat'])
+
+        report = {
+            'scale': {key: options[key] for key in ('appointments', 'posts', 'doctors', 'patients')},
+            'queries': {name: {'before': before[name], 'after': after[name]} for name in queries},
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output)
+        else:
+            self.stdout.write(output)
+
+    @staticmethod
+    def queries(models, doctor_id, patient_id):
+        CustomUser, BlogPost, Appointment = models['CustomUser'], models['BlogPost'], models['Appointment']
+        return {
+            'doctor_appointments': Appointment.objects.filter(doctor_id=doctor_id).order_by('date', 'start_time', 'id')[:50],
+            'patient_appointments': Appointment.objects.filter(patient_id=patient_id).order_by('date', 'start_time', 'id')[:50],
+            'published_posts': BlogPost.objects.filter(is_draft=False).order_by('-created_at')[:50],
+            'author_posts': BlogPost.objects.filter(author_id=doctor_id).order_by('-created_at')[:50],
+            'doctors': CustomUser.objects.filter(user_type='doctor')[:50],
+        }
+
+    @staticmethod
+    def measure(queries, repeat):
+        results = {}
+        for name, queryset in queries.items():
+            results[name] = {
+                'plan': queryset.explain(),
+                'latency': bench.time_call(lambda qs=queryset: list(qs.all()), repeat=repeat),
+            }
+        return results
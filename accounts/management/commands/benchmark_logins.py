@@ -0,0 +1,84 @@
+import json
+import os
+import threading
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory
+
+from accounts import bench
+from accounts.models import CustomUser
+from accounts.views import api_user_login
+
+HASHERS = {
+    'pbkdf2_sha256': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'argon2': 'accounts.passwords.TunedArgon2PasswordHasher',
+}
+PASSWORD = 'correct horse battery staple'
+
+
+class Command(BaseCommand):
+    help = 'Measure api_user_login throughput per hasher on a throwaway database, in logins per second per core.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50, help='Sequential logins per hasher.')
+        parser.add_argument('--seconds', type=float, default=5.0, help='Duration of the concurrent run.')
+        parser.add_argument('--threads', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        cores = os.cpu_count() or 1
+        factory = APIRequestFactory()
+        results = {}
+        with bench.benchmark_database():
+            for name, path in HASHERS.items():
+                # The measured hasher must also be the preferred one, or the
+                # first login would rehash the password with another.
+                with override_settings(PASSWORD_HASHERS=[path]):
+                    bench.seed_users('patient', 1, prefix=f'login_{name}_')
+                    user = CustomUser.objects.get(username__startswith=f'login_{name}_')
+                    CustomUser.objects.filter(id=user.id).update(password=make_password(PASSWORD))
+
+                    def login():
+                        request = factory.post('/api/login/', {'username': user.username, 'password': PASSWORD})
+                        response = api_user_login(request)
+                        assert response.status_code == 200, response.data
+
+                    sequential = bench.time_call(login, repeat=options['repeat'])
+                    concurrent = self.run_concurrently(login, options['threads'], options['seconds'])
+                results[name] = {
+                    'sequential': sequential,
+                    'logins_per_second_single_thread': round(1000 / sequential['mean_ms'], 1),
+                    'concurrent_logins_per_second': concurrent,
+                    'logins_per_second_per_core': round(concurrent / cores, 1),
+                }
+        report = {'cores': cores, 'threads': options['threads'], 'hashers': results}
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output)
+        else:
+            self.stdout.write(output)
+
+    def run_concurrently(self, func, threads, seconds):
+        counts = [0] * threads
+        deadline = time.perf_counter() + seconds
+
+        def worker(index):
+            try:
+                while time.perf_counter() < deadline:
+                    func()
+                    counts[index] += 1
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        return round(sum(counts) / (time.perf_counter() - started), 1)
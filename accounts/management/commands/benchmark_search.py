@@ -0,0 +1,48 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from accounts import bench, search
+from accounts.models import BlogPost
+
+QUERIES = ['vaccine', 'heart pressure', 'anx', 'sleep stress diet']
+
+
+def icontains_ids(query, limit=20):
+    """The admin-style ``LIKE '%term%'`` scan the search index replaces."""
+    posts = BlogPost.objects.filter(is_draft=False)
+    for word in search.terms(query):
+        posts = posts.filter(Q(title__icontains=word) | Q(summary__icontains=word) | Q(content__icontains=word))
+    return list(posts.order_by('-created_at').values_list('id', flat=True)[:limit])
+
+
+class Command(BaseCommand):
+    help = 'Compare full-text search latency with icontains scans on a seeded throwaway database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100_000)
+        parser.add_argument('--doctors', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        with bench.benchmark_database():
+            self.stderr.write('Seeding...')
+            doctor_ids = bench.seed_users('doctor', options['doctors'])
+            bench.seed_posts(options['posts'], doctor_ids)
+            bench.analyze()
+            results = {}
+            for query in QUERIES:
+                results[query] = {
+                    'matches': len(search.search_ids(query, limit=1000)),
+                    'fulltext': bench.time_call(lambda q=query: search.search_ids(q), repeat=options['repeat']),
+                    'icontains': bench.time_call(lambda q=query: icontains_ids(q), repeat=options['repeat']),
+                }
+        report = {'posts': options['posts'], 'queries': results}
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output)
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,75 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from accounts import bench
+from accounts.models import CustomUser, BlogPost, Appointment
+from accounts.row_serializers import RowSerializer
+from accounts.serializers import AppointmentSerializer, BlogPostListSerializer, BlogPostSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare DRF serializers with RowSerializer on list payloads from a seeded throwaway database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000)
+        parser.add_argument('--doctors', type=int, default=200)
+        parser.add_argument('--patients', type=int, default=2_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        request = Request(RequestFactory().get('/api/'))
+        allowed_hosts = override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'])
+        with allowed_hosts, bench.benchmark_database():
+            self.stderr.write('Seeding...')
+            doctor_ids = bench.seed_users('doctor', options['doctors'])
+            patient_ids = bench.seed_users('patient', options['patients'])
+            bench.seed_appointments(rows, doctor_ids, patient_ids)
+            bench.seed_posts(rows, doctor_ids, words=50)
+            # Media URLs are part of the cost being measured.
+            CustomUser.objects.update(profile_picture='profile_pics/ab/face.png',
+                                      profile_thumbnail='profile_pics/thumbs/ab/face.webp')
+            BlogPost.objects.update(image='blog_images/cd/cover.jpg', image_thumbnail='blog_images/thumbs/cd/cover.webp',
+                                    image_webp='blog_images/webp/cd/cover.webp')
+            bench.analyze()
+            cases = {
+                'appointments': (AppointmentSerializer, Appointment.objects.order_by('id'), None),
+                'blog_list': (BlogPostListSerializer, BlogPost.objects.order_by('id'), request),
+                'blog_detail': (BlogPostSerializer, BlogPost.objects.order_by('id'), request),
+            }
+            results = {name: self.measure(*case, repeat=options['repeat']) for name, case in cases.items()}
+        report = {'rows': rows, 'serializers': results}
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output)
+        else:
+            self.stdout.write(output)
+
+    @staticmethod
+    def measure(serializer_class, queryset, request, repeat):
+        """Time the query and serialization of every row both ways; the payloads must match."""
+        context = {'request': request}
+
+        def drf():
+            return serializer_class(serializer_class.optimize(queryset), many=True, context=context).data
+
+        def rows():
+            serializer = RowSerializer(serializer_class, request=request)
+            return serializer.many(serializer.values(queryset))
+
+        if JSONRenderer().render(drf()) != JSONRenderer().render(rows()):
+            raise CommandError(f'{serializer_class.__name__} and RowSerializer disagree.')
+        drf_stats = bench.time_call(drf, repeat=repeat)
+        rows_stats = bench.time_call(rows, repeat=repeat)
+        return {
+            'drf': drf_stats,
+            'rows': rows_stats,
+            'speedup': round(drf_stats['mean_ms'] / rows_stats['mean_ms'], 2),
+        }
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from accounts import appointment_io
+from accounts.models import Appointment
+
+
+class Command(BaseCommand):
+    help = 'Stream appointments as CSV or JSON Lines in the format import_appointments reads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file-format', choices=sorted(appointment_io.FORMATS), default='csv')
+        parser.add_argument('--doctor', help='Only the appointments of this doctor (username).')
+        parser.add_argument('--from', dest='date_from', help='First date, YYYY-MM-DD.')
+        parser.add_argument('--to', dest='date_to', help='Last date, YYYY-MM-DD.')
+        parser.add_argument('--output', help='Write to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        appointments = Appointment.objects.all()
+        if options['doctor']:
+            appointments = appointments.filter(doctor__username=options['doctor'])
+        if options['date_from']:
+            appointments = appointments.filter(date__gte=options['date_from'])
+        if options['date_to']:
+            appointments = appointments.filter(date__lte=options['date_to'])
+        lines = appointment_io.export_appointments(appointments, options['file_format'])
+        if options['output']:
+            with open(options['output'], 'w', newline='') as fh:
+                fh.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
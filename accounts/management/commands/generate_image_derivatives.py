@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from accounts.api_cache import invalidate_instance
+from accounts.images import DERIVATIVES, build_derivatives
+
+
+class Command(BaseCommand):
+    help = 'Generate missing thumbnails and WebP variants for images uploaded before the derivative pipeline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate derivatives that already exist.')
+
+    def handle(self, *args, **options):
+        total = 0
+        for model, sources in DERIVATIVES.items():
+            for source_field, derivatives in sources.items():
+                rows = model.objects.exclude(**{source_field: ''}).exclude(**{f'{source_field}__isnull': True})
+                if not options['force']:
+                    missing = Q()
+                    for derivative in derivatives:
+                        missing |= Q(**{derivative.field: ''}) | Q(**{f'{derivative.field}__isnull': True})
+                    rows = rows.filter(missing)
+                fields = [derivative.field for derivative in derivatives]
+                for instance in rows.only('pk', source_field, *fields).iterator():
+                    try:
+                        updated = build_derivatives(instance, source_field)
+                    except OSError as e:
+                        self.stderr.write(f'{model.__name__} {instance.pk}: {e}')
+                        continue
+                    if updated:
+                        # update() rather than save(): the original is
+                        # unchanged and there is nothing else to write.
+                        model.objects.filter(pk=instance.pk).update(
+                            **{field: getattr(instance, field).name for field in updated})
+                        invalidate_instance(instance)
+                        total += 1
+        self.stdout.write(f'Generated derivatives for {total} image(s)')
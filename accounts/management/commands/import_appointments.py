@@ -0,0 +1,47 @@
+import codecs
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts import appointment_io
+
+
+class Command(BaseCommand):
+    help = (
+        'Import appointments from a CSV or JSON Lines file with the columns '
+        f'{", ".join(appointment_io.FIELDS)}; patient and doctor are usernames and end_time is optional.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import; '-' reads standard input.")
+        parser.add_argument('--file-format', choices=sorted(appointment_io.FORMATS),
+                            help='Defaults to the extension of the file.')
+        parser.add_argument('--chunk-size', type=int, default=appointment_io.CHUNK_SIZE,
+                            help='Rows validated and inserted together.')
+        parser.add_argument('--dry-run', action='store_true', help='Validate without writing anything.')
+        parser.add_argument('--sync-calendar', action='store_true',
+                            help='Queue the imported appointments for Google Calendar.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            file_format = appointment_io.format_of(path, options['file_format'])
+        except ValueError as e:
+            raise CommandError(e)
+        import_options = {
+            'dry_run': options['dry_run'],
+            'sync_calendar': options['sync_calendar'],
+            'chunk_size': options['chunk_size'],
+        }
+        if path == '-':
+            report = appointment_io.import_appointments(self.stdin, file_format, **import_options)
+        else:
+            # Decoded line by line, so that a bad byte is reported on its own line.
+            with open(path, 'rb') as fh:
+                report = appointment_io.import_appointments(codecs.iterdecode(fh, 'utf-8-sig'), file_format,
+                                                            **import_options)
+        self.stdout.write(json.dumps(report.as_dict(), indent=2))
+        if report.unreadable:
+            raise CommandError(f'{report.unreadable}; {report.created} appointments were imported before it.')
+        if report.rejected:
+            self.stderr.write(f'{report.rejected} of {report.rows} rows rejected.')
@@ -0,0 +1,96 @@
+import asyncio
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from accounts import loadtest
+from accounts.authentication import ClaimsRefreshToken
+from accounts.models import BlogPost, CustomUser
+
+# URL name -> the object its path needs; the async twin is named async_<name>.
+ENDPOINTS = {
+    'api_patient_appointments': None,
+    'api_patient_blog_list': None,
+    'api_patient_blog_detail': 'post',
+    'api_doctor_list': None,
+    'api_doctor_detail': 'doctor',
+    'api_doctor_slots': 'doctor',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare requests per second and latency of the sync API under WSGI with the async API '
+        'under ASGI, on servers started on the same host, e.g.\n'
+        '  gunicorn healthcare_project.wsgi -w 4 -b 127.0.0.1:8000\n'
+        '  gunicorn healthcare_project.asgi -k uvicorn.workers.UvicornWorker -w 4 -b 127.0.0.1:8001\n'
+        'The token is minted here, so the servers must share this SECRET_KEY and database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi', metavar='URL', help='Base URL of the WSGI server, driven through the sync views.')
+        parser.add_argument('--asgi', metavar='URL', help='Base URL of the ASGI server, driven through api/async/.')
+        parser.add_argument('--username', required=True, help='Patient to send the requests as.')
+        parser.add_argument('--endpoint', action='append', choices=sorted(ENDPOINTS),
+                            help='Limit the run to these URL names; repeatable.')
+        parser.add_argument('--concurrency', type=int, default=64, help='Simultaneous connections.')
+        parser.add_argument('--seconds', type=float, default=10.0, help='Measured duration per endpoint.')
+        parser.add_argument('--warmup', type=float, default=2.0, help='Unmeasured seconds before each run.')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        targets = {label: options[label] for label in ('wsgi', 'asgi') if options[label]}
+        if not targets:
+            raise CommandError('Pass --wsgi, --asgi or both.')
+        try:
+            user = CustomUser.objects.get(username=options['username'], user_type='patient')
+        except CustomUser.DoesNotExist:
+            raise CommandError(f'No patient named {options["username"]}.')
+        headers = {'Authorization': f'Bearer {ClaimsRefreshToken.for_user(user).access_token}'}
+        objects = {
+            'doctor': CustomUser.objects.filter(user_type='doctor').order_by('id').first(),
+            'post': BlogPost.objects.filter(is_draft=False).order_by('id').first(),
+        }
+
+        results = {label: {} for label in targets}
+        for name in options['endpoint'] or ENDPOINTS:
+            needs = ENDPOINTS[name]
+            if needs and objects[needs] is None:
+                self.stderr.write(f'Skipping {name}: no {needs} in the database.')
+                continue
+            args = [objects[needs].id] if needs else []
+            for label, base_url in targets.items():
+                path = reverse(name if label == 'wsgi' else f'async_{name}', args=args)
+                self.stderr.write(f'{label} {path}...')
+                results[label][name] = asyncio.run(loadtest.run(
+                    base_url, [('GET', path, b'')], options['concurrency'], options['seconds'],
+                    warmup=options['warmup'], headers=headers,
+                ))
+
+        report = {
+            'concurrency': options['concurrency'],
+            'seconds': options['seconds'],
+            'targets': targets,
+            'results': results,
+        }
+        if len(targets) == 2:
+            report['asgi_vs_wsgi'] = {
+                name: self.compare(results['wsgi'][name], results['asgi'][name]) for name in results['wsgi']
+            }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output)
+        else:
+            self.stdout.write(output)
+
+    @staticmethod
+    def compare(wsgi, asgi):
+        """Ratios of ASGI to WSGI: above 1 is more throughput, below 1 is lower latency."""
+        if not wsgi['latency'] or not asgi['latency']:
+            return None
+        return {
+            'requests_per_second': round(asgi['requests_per_second'] / wsgi['requests_per_second'], 2),
+            'p99_latency': round(asgi['latency']['p99_ms'] / wsgi['latency']['p99_ms'], 2),
+        }
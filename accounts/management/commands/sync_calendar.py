@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.google_calendar import get_client, process_due_jobs
+
+
+class Command(BaseCommand):
+    help = 'Drain queued Google Calendar events, retrying failures with exponential backoff.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process the due jobs once and exit.')
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Jobs claimed per round; sent as batch requests of 50.')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds to sleep when the queue is empty.')
+
+    def handle(self, *args, **options):
+        client = get_client()
+        while True:
+            synced, failed = process_due_jobs(client, limit=options['batch_size'])
+            if synced or failed:
+                self.stdout.write(f'Synced {synced} event(s), {failed} failed')
+            if options['once']:
+                break
+            if not synced and not failed:
+                time.sleep(options['interval'])
@@ -0,0 +1,56 @@
+import json
+import os
+
+from argon2 import PasswordHasher, Type
+from django.core.management.base import BaseCommand
+
+from accounts import bench
+
+MEMORY_COSTS_KIB = [19456, 32768, 47104, 65536, 131072]
+
+
+class Command(BaseCommand):
+    help = (
+        'Time Argon2id on this host and suggest the strongest ARGON2_* settings '
+        'whose hashing time stays under the target.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target-ms', type=float, default=50.0,
+                            help='Upper bound for the p50 time of one hash.')
+        parser.add_argument('--max-memory-mib', type=int, default=64,
+                            help='Memory per hash; concurrent logins multiply it.')
+        parser.add_argument('--max-time-cost', type=int, default=6)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        candidates = []
+        for memory_cost in MEMORY_COSTS_KIB:
+            if memory_cost > options['max_memory_mib'] * 1024:
+                break
+            for time_cost in range(1, options['max_time_cost'] + 1):
+                hasher = PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=1, type=Type.ID)
+                timing = bench.time_call(lambda: hasher.hash('correct horse battery staple'), repeat=options['repeat'])
+                candidates.append({'time_cost': time_cost, 'memory_cost': memory_cost, **timing})
+                self.stderr.write(f'm={memory_cost} KiB t={time_cost}: p50 {timing["p50_ms"]} ms')
+                if timing['p50_ms'] > options['target_ms']:
+                    # Larger time costs at this memory size only get slower.
+                    break
+        fitting = [c for c in candidates if c['p50_ms'] <= options['target_ms']]
+        # Memory hardness is what resists GPU cracking, so prefer memory over passes.
+        best = max(fitting, key=lambda c: (c['memory_cost'], c['time_cost'])) if fitting else None
+        report = {'cores': os.cpu_count(), 'target_ms': options['target_ms'], 'candidates': candidates}
+        if best is not None:
+            report['settings'] = {
+                'ARGON2_TIME_COST': best['time_cost'],
+                'ARGON2_MEMORY_COST': best['memory_cost'],
+                'ARGON2_PARALLELISM': 1,
+            }
+            report['logins_per_second_per_core'] = round(1000 / best['p50_ms'], 1)
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output)
+        else:
+            self.stdout.write(output)
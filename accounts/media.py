@@ -0,0 +1,139 @@
+"""Serve uploaded media with validators, byte ranges and long-lived caching.
+
+Files stored by ``ContentHashStorage`` are named after the SHA-256 of
+their content, so the name doubles as a strong ETag and the response can
+be cached as immutable. Older uploads get an ETag built from their
+modification time and size and are revalidated instead.
+
+With ``MEDIA_ACCEL_REDIRECT`` set to an nginx ``internal`` location the
+view only answers the conditional request and hands the body to nginx.
+Otherwise the body is sent by ``FileResponse``, which lets the WSGI
+server use ``sendfile()``.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+HASHED_NAME_RE = re.compile(r'(?:^|/)([0-9a-f]{2})/(\1[0-9a-f]{62})\.\w+$')
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, max-age=3600'
+
+mimetypes.add_type('image/webp', '.webp')
+
+
+def file_etag(path, stat):
+    match = HASHED_NAME_RE.search(path)
+    if match:
+        return f'"{match.group(2)}"'
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def byte_range(header, size):
+    """Parse a single-range ``Range`` header into ``(start, end)`` inclusive.
+
+    Returns ``None`` to serve the whole file (no header, or several ranges,
+    which we are allowed to ignore) and raises ValueError when the range
+    cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.replace(' ', '')) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    elif last:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        return None
+    if start > end or start >= size:
+        raise ValueError('unsatisfiable range')
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+    """An ``If-Range`` validator that no longer matches turns a range request into a full one."""
+    validator = request.headers.get('If-Range')
+    if not validator:
+        return True
+    if validator.startswith('"'):
+        return validator == etag
+    return parse_http_date_safe(validator) == last_modified
+
+
+def read_range(path, start, length):
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        while length > 0:
+            chunk = fh.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Not found')
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404('Not found')
+    if not os.path.isfile(full_path):
+        raise Http404('Not found')
+
+    etag = file_etag(path, stat)
+    last_modified = int(stat.st_mtime)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': IMMUTABLE if HASHED_NAME_RE.search(path) else REVALIDATE,
+        'Accept-Ranges': 'bytes',
+    }
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        for header, value in headers.items():
+            not_modified[header] = value
+        return not_modified
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    accel_prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT', None)
+    if accel_prefix:
+        # nginx serves the body, including any Range, from its internal location.
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + quote(path)
+    else:
+        try:
+            span = byte_range(request.headers.get('Range'), stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+        if span is not None and if_range_matches(request, etag, last_modified):
+            start, end = span
+            response = StreamingHttpResponse(read_range(full_path, start, end - start + 1),
+                                             status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = end - start + 1
+        elif request.method == 'HEAD':
+            response = HttpResponse(content_type=content_type)
+            response['Content-Length'] = stat.st_size
+        else:
+            response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    for header, value in headers.items():
+        response[header] = value
+    return response
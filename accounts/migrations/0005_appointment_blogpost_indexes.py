@@ -0,0 +1,55 @@
+# Generated by Django 5.2 on 2026-10-18 19:27
+
+from django.db import migrations, models
+
+
+def published_posts_index():
+    return models.Index(
+        fields=['-created_at'],
+        condition=models.Q(is_draft=False),
+        name='blog_published_created_idx',
+    )
+
+
+def add_published_posts_index(apps, schema_editor):
+    # Partial indexes are only available on SQLite and PostgreSQL; MySQL
+    # falls back to blog_draft_created_idx.
+    if schema_editor.connection.features.supports_partial_indexes:
+        schema_editor.add_index(apps.get_model('accounts', 'BlogPost'), published_posts_index())
+
+
+def remove_published_posts_index(apps, schema_editor):
+    if schema_editor.connection.features.supports_partial_indexes:
+        schema_editor.remove_index(apps.get_model('accounts', 'BlogPost'), published_posts_index())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_alter_customuser_profile_picture'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='user_type',
+            field=models.CharField(choices=[('patient', 'Patient'), ('doctor', 'Doctor')], db_index=True, max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['doctor', 'date', 'start_time'], name='appt_doctor_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'date', 'start_time'], name='appt_patient_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['is_draft', '-created_at'], name='blog_draft_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['author', '-created_at'], name='blog_author_created_idx'),
+        ),
+        migrations.RunPython(add_published_posts_index, remove_published_posts_index),
+    ]
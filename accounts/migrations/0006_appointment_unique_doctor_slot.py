@@ -0,0 +1,51 @@
+# Generated by Django 5.2 on 2026-10-18 19:28
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_duplicate_slots(apps, schema_editor):
+    """Refuse to add appt_unique_doctor_slot over existing double bookings.
+
+    Which of two appointments in the same slot to keep is for the clinic to
+    decide, so the clashes are listed for them to resolve before migrating.
+    """
+    Appointment = apps.get_model('accounts', 'Appointment')
+    clashes = (
+        Appointment.objects.values('doctor_id', 'date', 'start_time')
+        .annotate(bookings=Count('id'))
+        .filter(bookings__gt=1)
+        .order_by('doctor_id', 'date', 'start_time')
+    )
+    lines = [
+        f"doctor {row['doctor_id']} on {row['date']} at {row['start_time']:%H:%M}: ids "
+        + ', '.join(str(pk) for pk in Appointment.objects.filter(
+            doctor_id=row['doctor_id'], date=row['date'], start_time=row['start_time'],
+        ).order_by('id').values_list('id', flat=True))
+        for row in clashes
+    ]
+    if lines:
+        raise RuntimeError(
+            'Cannot add appt_unique_doctor_slot: these doctors have more than one appointment '
+            'starting at the same time. Cancel or move all but one of each and migrate again.\n'
+            + '\n'.join(lines)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_appointment_blogpost_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_slots, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(fields=('doctor', 'date', 'start_time'), name='appt_unique_doctor_slot'),
+        ),
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appt_doctor_date_idx',
+        ),
+    ]
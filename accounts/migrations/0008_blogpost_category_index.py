@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 19:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_calendarsyncjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['category', 'is_draft', '-created_at'], name='blog_category_created_idx'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+from django.db import migrations
+
+FTS_TABLE = 'accounts_blogpost_fts'
+FULLTEXT_INDEX = 'blog_fulltext_idx'
+
+SQLITE_CREATE = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, summary, content,
+        content='accounts_blogpost', content_rowid='id', tokenize='unicode61'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON accounts_blogpost BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, summary, content)
+        VALUES (new.id, new.title, new.summary, new.content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON accounts_blogpost BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, summary, content)
+        VALUES ('delete', old.id, old.title, old.summary, old.content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON accounts_blogpost BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, summary, content)
+        VALUES ('delete', old.id, old.title, old.summary, old.content);
+        INSERT INTO {FTS_TABLE}(rowid, title, summary, content)
+        VALUES (new.id, new.title, new.summary, new.content);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+SQLITE_DROP = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+MYSQL_CREATE = [f'CREATE FULLTEXT INDEX {FULLTEXT_INDEX} ON accounts_blogpost (title, summary, content)']
+MYSQL_DROP = [f'DROP INDEX {FULLTEXT_INDEX} ON accounts_blogpost']
+
+
+def index_sql(connection, create):
+    if connection.vendor == 'sqlite':
+        return SQLITE_CREATE if create else SQLITE_DROP
+    if connection.vendor == 'mysql':
+        return MYSQL_CREATE if create else MYSQL_DROP
+    return []
+
+
+def create_search_index(apps, schema_editor):
+    for sql in index_sql(schema_editor.connection, create=True):
+        schema_editor.execute(sql, params=None)
+
+
+def drop_search_index(apps, schema_editor):
+    for sql in index_sql(schema_editor.connection, create=False):
+        schema_editor.execute(sql, params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_blogpost_category_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2 on 2026-10-18 19:38
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_speciality(apps, schema_editor):
+    """Give each doctor the speciality they have been booked for most often."""
+    Appointment = apps.get_model('accounts', 'Appointment')
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    counts = (
+        Appointment.objects.exclude(speciality='')
+        .values('doctor_id', 'speciality')
+        .annotate(bookings=Count('id'))
+        .order_by('doctor_id', '-bookings', 'speciality')
+    )
+    best = {}
+    for row in counts.iterator():
+        best.setdefault(row['doctor_id'], row['speciality'])
+    doctors = list(CustomUser.objects.filter(id__in=best, user_type='doctor').only('id'))
+    for doctor in doctors:
+        doctor.speciality = best[doctor.id][:100]
+    CustomUser.objects.bulk_update(doctors, ['speciality'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_blogpost_search_index'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='speciality',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='user_type',
+            field=models.CharField(choices=[('patient', 'Patient'), ('doctor', 'Doctor')], max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['user_type', 'first_name', 'last_name'], name='user_type_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['user_type', 'city'], name='user_type_city_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['user_type', 'state'], name='user_type_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['user_type', 'pincode'], name='user_type_pincode_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['user_type', 'speciality'], name='user_type_speciality_idx'),
+        ),
+        migrations.RunPython(backfill_speciality, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 19:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_doctor_directory'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='image_thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='blog_images/thumbs/'),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='image_webp',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='blog_images/webp/'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='profile_thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='profile_pics/thumbs/'),
+        ),
+    ]
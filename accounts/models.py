@@ -4,6 +4,8 @@ from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 
+APPOINTMENT_DURATION = timedelta(minutes=45)
+
 
 class CustomUser(AbstractUser):
     USER_TYPE_CHOICES = (
@@ -14,11 +16,26 @@ class CustomUser(AbstractUser):
     first_name = models.CharField(max_length=50)
     last_name = models.CharField(max_length=50)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    # Square WebP avatar generated from profile_picture; see accounts.images.
+    profile_thumbnail = models.ImageField(upload_to='profile_pics/thumbs/', blank=True, null=True, editable=False)
     email = models.EmailField(unique=True)
     address_line1 = models.CharField(max_length=100)
     city = models.CharField(max_length=50)
     state = models.CharField(max_length=50)
     pincode = models.CharField(max_length=10)
+    # Doctors only; shown and filtered on in the doctor directory.
+    speciality = models.CharField(max_length=100, blank=True)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Doctor directory: user_type='doctor' plus one optional filter,
+            # ordered by name.
+            models.Index(fields=['user_type', 'first_name', 'last_name'], name='user_type_name_idx'),
+            models.Index(fields=['user_type', 'city'], name='user_type_city_idx'),
+            models.Index(fields=['user_type', 'state'], name='user_type_state_idx'),
+            models.Index(fields=['user_type', 'pincode'], name='user_type_pincode_idx'),
+            models.Index(fields=['user_type', 'speciality'], name='user_type_speciality_idx'),
+        ]
 
     def __str__(self):
         return self.username
@@ -33,6 +50,10 @@ class BlogPost(models.Model):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     title = models.CharField(max_length=200)
     image = models.ImageField(upload_to='blog_images/', blank=True, null=True)
+    # WebP derivatives of image: a cropped card for lists and a bounded
+    # full-width variant for the detail page; see accounts.images.
+    image_thumbnail = models.ImageField(upload_to='blog_images/thumbs/', blank=True, null=True, editable=False)
+    image_webp = models.ImageField(upload_to='blog_images/webp/', blank=True, null=True, editable=False)
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
     summary = models.TextField()
     content = models.TextField()
@@ -40,9 +61,26 @@ class BlogPost(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Published feed: filter(is_draft=False).order_by('-created_at')
+            models.Index(fields=['is_draft', '-created_at'], name='blog_draft_created_idx'),
+            # Doctor's own posts: filter(author=...).order_by('-created_at')
+            models.Index(fields=['author', '-created_at'], name='blog_author_created_idx'),
+            # Per-category feed pages: filter(category=..., is_draft=False).order_by('-created_at', '-id')
+            models.Index(fields=['category', 'is_draft', '-created_at'], name='blog_category_created_idx'),
+        ]
+
     def __str__(self):
         return self.title
     
+class AppointmentQuerySet(models.QuerySet):
+    def with_users(self):
+        # Join patient and doctor in the same query so serializing a list
+        # does not issue two extra user lookups per row.
+        return self.select_related('patient', 'doctor')
+
+
 class Appointment(models.Model):
     patient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='appointments_as_patient')
     doctor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='appointments_as_doctor')
@@ -52,13 +90,54 @@ class Appointment(models.Model):
     end_time = models.TimeField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = AppointmentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Dashboards and the appointment APIs filter on one side of the
+            # booking and order by (date, start_time, id). The doctor side is
+            # covered by the index backing appt_unique_doctor_slot.
+            models.Index(fields=['patient', 'date', 'start_time'], name='appt_patient_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['doctor', 'date', 'start_time'], name='appt_unique_doctor_slot'),
+        ]
+
     def save(self, *args, **kwargs):
         # Calculate end time as start_time + 45 minutes
         if not self.end_time:
             start_datetime = timezone.datetime.combine(self.date, self.start_time)
-            end_datetime = start_datetime + timedelta(minutes=45)
+            end_datetime = start_datetime + APPOINTMENT_DURATION
             self.end_time = end_datetime.time()
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"Appointment with Dr.{self.doctor.get_full_name()} on {self.date} at {self.start_time}"
\ No newline at end of file
+        return f"Appointment with Dr.{self.doctor.get_full_name()} on {self.date} at {self.start_time}"
+
+class CalendarSyncJob(models.Model):
+    """Outbox row for pushing an appointment to Google Calendar.
+
+    Written in the same transaction as the appointment and drained by the
+    ``sync_calendar`` management command, so booking never waits on Google.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='calendar_jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    event_id = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='calendar_job_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"Calendar sync for appointment {self.appointment_id} ({self.status})"
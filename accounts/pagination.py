@@ -0,0 +1,133 @@
+import base64
+import json
+
+from django.db.models import Q
+
+
+class KeysetPaginator:
+    """Cursor pagination over a fixed, unique ordering.
+
+    Instead of OFFSET, each page filters on the ordering values of the last
+    row of the previous page, so fetching page N costs the same as page 1
+    as long as an index covers the ordering columns. ``ordering`` must end
+    in a unique column (normally ``id``) so every row has a distinct key.
+    """
+
+    def __init__(self, ordering, page_size=50, max_page_size=200):
+        self.ordering = ordering
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+
+    @property
+    def columns(self):
+        """The ordering's column names, which ``values()`` rows must include."""
+        return self._names()
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get('page_size', self.page_size))
+        except (TypeError, ValueError):
+            raise ValueError('page_size must be an integer')
+        if size < 1:
+            raise ValueError('page_size must be positive')
+        return min(size, self.max_page_size)
+
+    def encode_cursor(self, instance):
+        values = [self._field_value(instance, name) for name in self._names()]
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, queryset, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (ValueError, TypeError):
+            raise ValueError('Invalid cursor')
+        names = self._names()
+        if not isinstance(values, list) or len(values) != len(names):
+            raise ValueError('Invalid cursor')
+        opts = queryset.model._meta
+        try:
+            return [opts.get_field(name).to_python(value) for name, value in zip(names, values)]
+        except Exception:
+            raise ValueError('Invalid cursor')
+
+    def page_queryset(self, queryset, request):
+        """``(queryset, page_size)``: the requested page plus one row that tells if another follows."""
+        page_size = self.get_page_size(request)
+        return self.remaining(queryset, request)[:page_size + 1], page_size
+
+    def remaining(self, queryset, request):
+        """Every row after the request's cursor, in order; for streaming instead of paging."""
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            queryset = queryset.filter(self._after(self.decode_cursor(queryset, cursor)))
+        return queryset
+
+    def split_page(self, rows, page_size):
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = self.encode_cursor(rows[-1])
+        return rows, next_cursor
+
+    def paginate(self, queryset, request):
+        """Return ``(rows, next_cursor)`` for the page requested by ``request``."""
+        queryset, page_size = self.page_queryset(queryset, request)
+        return self.split_page(list(queryset), page_size)
+
+    async def apaginate(self, queryset, request):
+        """``paginate()`` with the page fetched through the async ORM."""
+        queryset, page_size = self.page_queryset(queryset, request)
+        return self.split_page([row async for row in queryset], page_size)
+
+    def iterate(self, queryset, batch_size):
+        """Every row of ``queryset`` in order, read with one keyset query per ``batch_size`` rows.
+
+        No query outlives its batch, so memory stays bounded even where the
+        driver buffers a whole result set (MySQL), unlike ``iterator()``.
+        """
+        queryset = queryset.order_by(*self.ordering)
+        batch = list(queryset[:batch_size])
+        while batch:
+            yield from batch
+            if len(batch) < batch_size:
+                return
+            batch = list(queryset.filter(self._after(self._key(batch[-1])))[:batch_size])
+
+    async def aiterate(self, queryset, batch_size):
+        """``iterate()`` through the async ORM."""
+        queryset = queryset.order_by(*self.ordering)
+        batch = [row async for row in queryset[:batch_size]]
+        while batch:
+            for row in batch:
+                yield row
+            if len(batch) < batch_size:
+                return
+            batch = [row async for row in queryset.filter(self._after(self._key(batch[-1])))[:batch_size]]
+
+    def _names(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def _key(self, row):
+        return [row[name] if isinstance(row, dict) else getattr(row, name) for name in self._names()]
+
+    def _after(self, values):
+        # (a, b, c) > (x, y, z) expanded into an OR of prefix-equal terms,
+        # honouring the direction of each column.
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    @staticmethod
+    def _field_value(instance, name):
+        value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return value
@@ -0,0 +1,94 @@
+"""Password hashing tuned for login throughput.
+
+Argon2id is the preferred hasher, with its cost read from settings so
+that it can be sized per host with ``tune_password_hasher``. Django
+rehashes a password with the preferred hasher and parameters on the
+next successful login, so PBKDF2 hashes and hashes made with older
+parameters are upgraded transparently.
+
+Async views should use ``aauthenticate()``. Django's own
+``aauthenticate`` runs the backend on the single thread shared by all
+``sync_to_async`` calls, which serializes every login. Here hashing runs
+on a dedicated pool instead, and argon2-cffi releases the GIL while it
+hashes.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher, check_password, get_hasher, identify_hasher, make_password,
+)
+
+from .models import CustomUser
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id with ``ARGON2_TIME_COST``, ``ARGON2_MEMORY_COST`` (KiB) and ``ARGON2_PARALLELISM``."""
+
+    @property
+    def time_cost(self):
+        return getattr(settings, 'ARGON2_TIME_COST', Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return getattr(settings, 'ARGON2_MEMORY_COST', Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'ARGON2_PARALLELISM', Argon2PasswordHasher.parallelism)
+
+
+def get_executor():
+    """Return the process-wide hashing pool, creating it on first use."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = getattr(settings, 'PASSWORD_HASH_WORKERS', None) or os.cpu_count() or 1
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+    return _executor
+
+
+async def run_hasher(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), func, *args)
+
+
+def must_update(encoded):
+    preferred = get_hasher('default')
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+async def acheck_password(user, raw_password):
+    """Verify ``raw_password`` for ``user`` on the hashing pool, upgrading an outdated hash."""
+    encoded = user.password
+    if not await run_hasher(check_password, raw_password, encoded):
+        return False
+    if must_update(encoded):
+        user.password = await run_hasher(make_password, raw_password)
+        # update() rather than save(): the password itself has not changed,
+        # so this must not revoke the user's tokens.
+        await CustomUser.objects.filter(pk=user.pk, password=encoded).aupdate(password=user.password)
+    return True
+
+
+async def aauthenticate(username, password):
+    """Return the active user with these credentials, or ``None``."""
+    try:
+        user = await CustomUser._default_manager.aget_by_natural_key(username)
+    except CustomUser.DoesNotExist:
+        # Hash anyway so response time does not reveal whether the user exists.
+        await run_hasher(make_password, password)
+        return None
+    if await acheck_password(user, password) and user.is_active:
+        return user
+    return None
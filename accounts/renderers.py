@@ -0,0 +1,84 @@
+"""JSON renderer and parser on orjson, with the stdlib ``json`` as fallback.
+
+``FastJSONRenderer`` writes the same bytes as DRF's ``JSONRenderer`` with
+its default settings: compact separators, UTF-8 rather than ``\\u``
+escapes, ``\\u2028``/``\\u2029`` escaped, datetimes in ISO 8601 with ``Z``
+for UTC. orjson encodes dates, times and datetimes itself, so list
+payloads never call back into Python for them. Anything orjson refuses
+(integers beyond 64 bits, non-string keys, aware times, lone surrogates)
+is rendered by ``JSONRenderer`` instead, which also handles indented
+output and non-default ``UNICODE_JSON``/``COMPACT_JSON``.
+
+Two differences remain, both in values the API does not produce: floats
+below 1e-4 or from 1e16 up are written ``1e-5`` rather than ``1e-05``,
+and NaN and infinities become ``null`` instead of an error.
+
+``FastJSONParser`` reads request bodies with orjson and leaves anything
+it rejects to ``JSONParser``, so errors and edge cases read the same.
+
+Without orjson installed both classes behave exactly like DRF's. Enable
+them in ``REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES']`` and
+``['DEFAULT_PARSER_CLASSES']``.
+"""
+import codecs
+import io
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=orjson.OPT_UTC_Z)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        for raw, escaped in LINE_SEPARATORS:
+            if raw in ret:
+                ret = ret.replace(raw, escaped)
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        body = stream.read()
+        try:
+            if codecs.lookup(encoding).name != 'utf-8':
+                body = body.decode(encoding)
+            return orjson.loads(body)
+        except (orjson.JSONDecodeError, UnicodeDecodeError):
+            raw = body if isinstance(body, bytes) else body.encode(encoding)
+            return super().parse(io.BytesIO(raw), media_type, parser_context)
+
+
+def json_renderer():
+    """The first configured renderer for ``application/json``, for views that bypass negotiation."""
+    for renderer_class in api_settings.DEFAULT_RENDERER_CLASSES:
+        if renderer_class.media_type == 'application/json':
+            return renderer_class()
+    return JSONRenderer()
+
+
+def json_parser():
+    for parser_class in api_settings.DEFAULT_PARSER_CLASSES:
+        if parser_class.media_type == 'application/json':
+            return parser_class()
+    return JSONParser()
@@ -0,0 +1,162 @@
+"""Read-only list serialization straight from ``QuerySet.values()`` rows.
+
+Most of a large list response goes on DRF's per-field machinery:
+``get_attribute()`` and ``to_representation()`` for every field, an
+``OrderedDict`` per row and per nested user, and a
+``request.build_absolute_uri()`` per image. A ``RowSerializer`` walks a
+serializer's fields once and compiles each into the ``values()`` columns
+it reads and a plain function of the row. Media URLs are the storage's
+base URL, made absolute once per request, plus the quoted file name.
+
+The output is identical to the serializer's ``data``. Only the field
+types used by the list serializers are compiled; any other field raises
+``TypeError`` when the ``RowSerializer`` is built.
+"""
+from operator import itemgetter
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.encoding import filepath_to_uri
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from .metrics import serializer_timer
+from .serializers import LOCAL_MEDIA_HOST, BlogPostSerializer, ImageVariantField, SparseFieldsetMixin
+
+PLAIN_FIELDS = (
+    serializers.BooleanField, serializers.CharField, serializers.ChoiceField, serializers.IntegerField,
+)
+
+
+class RowSerializer:
+    """``serializer_class(fields=fields, context={'request': request})`` compiled for ``values()`` rows.
+
+    ``values(queryset)`` selects the columns the fields read;
+    ``to_representation(row)`` and ``many(rows)`` turn rows into data.
+    """
+
+    def __init__(self, serializer_class, fields=None, request=None):
+        self.request = request
+        self.columns = {}
+        self.to_representation = self.compile(serializer_class(fields=fields, context={'request': request}), '')
+
+    def values(self, queryset, extra=()):
+        """``queryset.values()`` with every column the fields read, plus ``extra``."""
+        return queryset.values(*self.columns, *(column for column in extra if column not in self.columns))
+
+    def many(self, rows):
+        with serializer_timer():
+            return [self.to_representation(row) for row in rows]
+
+    def column(self, name):
+        self.columns[name] = None
+        return name
+
+    def compile(self, serializer, prefix):
+        model = serializer.Meta.model
+        getters = [
+            (name, self.getter(serializer, field, model, prefix))
+            for name, field in serializer.fields.items() if not field.write_only
+        ]
+
+        def to_representation(row):
+            return {name: get(row) for name, get in getters}
+        return to_representation
+
+    def getter(self, serializer, field, model, prefix):
+        if field.source == '*' or '.' in field.source:
+            raise TypeError(f'{type(serializer).__name__}.{field.field_name} has no single column')
+        column = prefix + field.source
+        if isinstance(field, SparseFieldsetMixin):
+            return self.nested(field, column)
+        if isinstance(field, serializers.ImageField):
+            return self.image(serializer, field, model, prefix)
+        if isinstance(field, serializers.DateTimeField):
+            return self.datetime(field, self.column(column))
+        if isinstance(field, (serializers.DateField, serializers.TimeField)):
+            return self.date_or_time(field, self.column(column))
+        if isinstance(field, PLAIN_FIELDS):
+            # Strings, integers and booleans come out of the database as they are rendered.
+            return itemgetter(self.column(column))
+        raise TypeError(f'{type(field).__name__} {type(serializer).__name__}.{field.field_name} is not supported')
+
+    def nested(self, serializer, column):
+        pk = self.column(f'{column}__{serializer.Meta.model._meta.pk.attname}')
+        to_representation = self.compile(serializer, f'{column}__')
+
+        def get(row):
+            return None if row[pk] is None else to_representation(row)
+        return get
+
+    def image(self, serializer, field, model, prefix):
+        source = self.column(prefix + field.source)
+        variant = self.column(prefix + field.variant) if isinstance(field, ImageVariantField) else None
+        storage = model._meta.get_field(field.variant if variant else field.source).storage
+        host = None
+        if isinstance(serializer, BlogPostSerializer) and field.field_name == 'image':
+            # BlogPostSerializer.to_representation() always makes ``image`` absolute.
+            host = LOCAL_MEDIA_HOST
+        url = self.media_url(storage, host)
+
+        def get(row):
+            name = variant and row[variant] or row[source]
+            return url(name) if name else None
+        return get
+
+    def media_url(self, storage, host=None):
+        """Function from a stored file name to the URL ``ImageField`` renders for it."""
+        if getattr(storage.url, '__func__', None) is FileSystemStorage.url:
+            base = storage.base_url
+            if self.request is not None:
+                base = self.request.build_absolute_uri(base)
+            elif host is not None:
+                base = host + base
+
+            def url(name):
+                path = filepath_to_uri(name).lstrip('/')
+                # urljoin() would resolve dot segments; let the storage handle those.
+                return base + path if '/.' not in '/' + path else absolute(storage.url(name))
+        else:
+            def url(name):
+                return absolute(storage.url(name))
+
+        def absolute(path):
+            if self.request is not None:
+                return self.request.build_absolute_uri(path)
+            return path if host is None else host + path
+        return url
+
+    @staticmethod
+    def datetime(field, column):
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        zone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if output_format is None or zone is None:
+            return lambda row: field.to_representation(row[column])
+        iso = output_format.lower() == ISO_8601
+
+        def get(row):
+            value = row[column]
+            if not value:
+                return None
+            if value.tzinfo is None:
+                return field.to_representation(value)
+            value = value.astimezone(zone)
+            if iso:
+                value = value.isoformat()
+                return value[:-6] + 'Z' if value.endswith('+00:00') else value
+            return value.strftime(output_format)
+        return get
+
+    @staticmethod
+    def date_or_time(field, column):
+        default = api_settings.DATE_FORMAT if isinstance(field, serializers.DateField) else api_settings.TIME_FORMAT
+        output_format = getattr(field, 'format', default)
+        if output_format is None:
+            return lambda row: field.to_representation(row[column])
+        iso = output_format.lower() == ISO_8601
+
+        def get(row):
+            value = row[column]
+            if not value:
+                return None
+            return value.isoformat() if iso else value.strftime(output_format)
+        return get
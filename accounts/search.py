@@ -0,0 +1,97 @@
+"""Ranked full-text search over published blog posts.
+
+MySQL uses a FULLTEXT index and SQLite an FTS5 table kept in sync by
+triggers, both created by migration 0009. Other backends fall back to
+``icontains`` matching ordered by recency.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import BlogPost
+
+FTS_TABLE = 'accounts_blogpost_fts'
+MAX_TERMS = 8
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def terms(query):
+    return WORD_RE.findall(query.lower())[:MAX_TERMS]
+
+
+def search_ids(query, category=None, limit=20, offset=0):
+    """Return ``[(post_id, score), ...]`` for published posts, best match first.
+
+    Every term must match; the last term also matches as a prefix so that
+    results can be shown while the user is still typing.
+    """
+    words = terms(query)
+    if not words:
+        return []
+    if connection.vendor == 'sqlite':
+        return _sqlite_search(words, category, limit, offset)
+    if connection.vendor == 'mysql':
+        return _mysql_search(words, category, limit, offset)
+    return _fallback_search(words, category, limit, offset)
+
+
+def search(query, category=None, limit=20, offset=0, queryset=None):
+    """Published posts matching ``query`` in rank order, each with a ``score``."""
+    ranked = search_ids(query, category, limit, offset)
+    if queryset is None:
+        queryset = BlogPost.objects.all()
+    posts = queryset.in_bulk([post_id for post_id, _ in ranked])
+    results = []
+    for post_id, score in ranked:
+        post = posts.get(post_id)
+        if post is not None:
+            post.score = score
+            results.append(post)
+    return results
+
+
+def _sqlite_search(words, category, limit, offset):
+    match = ' '.join(f'"{word}"' for word in words[:-1])
+    match = f'{match} "{words[-1]}"*'.strip()
+    sql = (
+        f'SELECT b.id, bm25({FTS_TABLE}, 10.0, 4.0, 1.0) AS score '
+        f'FROM {FTS_TABLE} JOIN accounts_blogpost b ON b.id = {FTS_TABLE}.rowid '
+        f'WHERE {FTS_TABLE} MATCH %s AND b.is_draft = 0'
+    )
+    params = [match]
+    if category:
+        sql += ' AND b.category = %s'
+        params.append(category)
+    sql += ' ORDER BY score, b.id DESC LIMIT %s OFFSET %s'
+    params += [limit, offset]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        # bm25() is lower-is-better; flip it so every backend ranks high-to-low.
+        return [(post_id, round(-score, 4)) for post_id, score in cursor.fetchall()]
+
+
+def _mysql_search(words, category, limit, offset):
+    against = ' '.join(f'+{word}' for word in words[:-1])
+    against = f'{against} +{words[-1]}*'.strip()
+    match = 'MATCH(title, summary, content) AGAINST (%s IN BOOLEAN MODE)'
+    sql = f'SELECT id, {match} AS score FROM accounts_blogpost WHERE {match} AND is_draft = 0'
+    params = [against, against]
+    if category:
+        sql += ' AND category = %s'
+        params.append(category)
+    sql += ' ORDER BY score DESC, id DESC LIMIT %s OFFSET %s'
+    params += [limit, offset]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(post_id, round(float(score), 4)) for post_id, score in cursor.fetchall()]
+
+
+def _fallback_search(words, category, limit, offset):
+    posts = BlogPost.objects.filter(is_draft=False)
+    for word in words:
+        posts = posts.filter(Q(title__icontains=word) | Q(summary__icontains=word) | Q(content__icontains=word))
+    if category:
+        posts = posts.filter(category=category)
+    ids = posts.order_by('-created_at', '-id').values_list('id', flat=True)[offset:offset + limit]
+    return [(post_id, 0.0) for post_id in ids]
@@ -3,12 +3,117 @@ from rest_framework import serializers
 from .models import CustomUser, BlogPost, Appointment
 from django.conf import settings
 
-class CustomUserSerializer(serializers.ModelSerializer):
+from .metrics import serializer_timer
+
+# Host BlogPostSerializer puts in front of image URLs when there is no request.
+LOCAL_MEDIA_HOST = 'http://localhost:8000'
+
+
+def requested_fields(request):
+    """Parse a ``?fields=a,b`` sparse-fieldset parameter; ``None`` means all fields."""
+    raw = request.query_params.get('fields') if request is not None else None
+    if not raw:
+        return None
+    return [name.strip() for name in raw.split(',') if name.strip()]
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    """``many=True`` serializer whose ``data`` counts towards the request's serializer time."""
+
+    @property
+    def data(self):
+        with serializer_timer():
+            return super().data
+
+
+class SparseFieldsetMixin:
+    """Serializer that can be trimmed to a subset of its fields.
+
+    Pass ``fields=[...]`` to keep only those fields (unknown names are
+    ignored). ``only_fields()`` maps the kept fields, including nested
+    serializers, to the model columns to load with ``QuerySet.only()``.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        meta = getattr(cls, 'Meta', None)
+        if meta is not None and not hasattr(meta, 'list_serializer_class'):
+            meta.list_serializer_class = TimedListSerializer
+
+    def __init__(self, *args, **kwargs):
+        self.requested = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+
+    @property
+    def data(self):
+        with serializer_timer():
+            return super().data
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.requested is not None:
+            fields = {name: field for name, field in fields.items() if name in self.requested}
+        return fields
+
+    @classmethod
+    def only_fields(cls, fields=None):
+        columns = []
+        for field in cls(fields=fields).fields.values():
+            if field.write_only or field.source == '*':
+                continue
+            source = field.source.replace('.', '__')
+            columns.append(source)
+            columns += getattr(field, 'extra_columns', [])
+            if isinstance(field, SparseFieldsetMixin):
+                columns += [f'{source}__{column}' for column in type(field).only_fields()]
+        return columns
+
+    @classmethod
+    def related_fields(cls, fields=None):
+        return [
+            field.source.replace('.', '__')
+            for field in cls(fields=fields).fields.values()
+            if isinstance(field, SparseFieldsetMixin)
+        ]
+
+    @classmethod
+    def optimize(cls, queryset, fields=None, extra=()):
+        """Join the nested relations and load only the columns ``fields`` needs."""
+        queryset = queryset.select_related(None)
+        related = cls.related_fields(fields)
+        if related:
+            # select_related() with no arguments would follow every FK.
+            queryset = queryset.select_related(*related)
+        return queryset.only(*cls.only_fields(fields), *extra)
+
+
+class ImageVariantField(serializers.ImageField):
+    """Read-only URL of a generated image derivative.
+
+    ``variant`` names the model field holding the derivative; until it has
+    been generated the original upload in ``source`` is served instead.
+    """
+
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    @property
+    def extra_columns(self):
+        return [self.variant]
+
+    def get_attribute(self, instance):
+        return getattr(instance, self.variant) or super().get_attribute(instance)
+
+
+class CustomUserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     profile_picture = serializers.ImageField(required=False, allow_null=True)
+    profile_thumbnail = ImageVariantField('profile_thumbnail', source='profile_picture')
 
     class Meta:
         model = CustomUser
-        fields = ['id', 'username', 'first_name', 'last_name', 'email', 'user_type', 'profile_picture', 'address_line1', 'city', 'state', 'pincode', 'password']
+        fields = ['id', 'username', 'first_name', 'last_name', 'email', 'user_type', 'profile_picture', 'profile_thumbnail', 'address_line1', 'city', 'state', 'pincode', 'speciality', 'password']
         extra_kwargs = {
             'password': {'write_only': True},
         }
@@ -32,11 +137,29 @@ class CustomUserSerializer(serializers.ModelSerializer):
         user.save()
         return user
 
-class BlogPostSerializer(serializers.ModelSerializer):
-    author = CustomUserSerializer(read_only=True)
+class UserSummarySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Slim, read-only user representation for nesting inside list payloads."""
+    profile_picture = ImageVariantField('profile_thumbnail')
+
+    class Meta:
+        model = CustomUser
+        fields = ['id', 'username', 'first_name', 'last_name', 'profile_picture']
+        read_only_fields = fields
+
+class DoctorListSerializer(UserSummarySerializer):
+    """Doctor directory entry: the summary plus where the doctor practises."""
+
+    class Meta(UserSummarySerializer.Meta):
+        fields = UserSummarySerializer.Meta.fields + ['speciality', 'city', 'state']
+        read_only_fields = fields
+
+class BlogPostSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    author = UserSummarySerializer(read_only=True)
     created_at = serializers.DateTimeField(read_only=True, format="%Y-%m-%d %H:%M:%S")
 
     image = serializers.ImageField(required=False, allow_null=True)
+    image_thumbnail = ImageVariantField('image_thumbnail', source='image')
+    image_webp = ImageVariantField('image_webp', source='image')
 
     class Meta:
         model = BlogPost
@@ -47,13 +170,16 @@ class BlogPostSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        if instance.image and hasattr(instance.image, 'url'):
+        if 'image' not in representation:
+            return representation
+        image = self.fields['image'].get_attribute(instance)
+        if image and hasattr(image, 'url'):
             request = self.context.get('request')
-            image_url = instance.image.url
+            image_url = image.url
             if request:
                 representation['image'] = request.build_absolute_uri(image_url)
             else:
-                representation['image'] = f"http://localhost:8000{image_url}"
+                representation['image'] = f"{LOCAL_MEDIA_HOST}{image_url}"
         else:
             representation['image'] = None
         return representation
@@ -67,9 +193,19 @@ class BlogPostSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({'content': 'Content is required.'})
         return data
    
-class AppointmentSerializer(serializers.ModelSerializer):
-    patient = CustomUserSerializer(read_only=True)
-    doctor = CustomUserSerializer(read_only=True)
+class BlogPostListSerializer(BlogPostSerializer):
+    """List representation: everything but the ``content`` body.
+
+    ``image`` is the card-sized thumbnail rather than the original upload.
+    """
+    image = ImageVariantField('image_thumbnail')
+
+    class Meta(BlogPostSerializer.Meta):
+        fields = ['id', 'author', 'title', 'image', 'category', 'summary', 'is_draft', 'created_at', 'updated_at']
+
+class AppointmentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    patient = UserSummarySerializer(read_only=True)
+    doctor = UserSummarySerializer(read_only=True)
     date = serializers.DateField(format="%Y-%m-%d")
     start_time = serializers.TimeField(format="%H:%M")
     end_time = serializers.TimeField(format="%H:%M", required=False)
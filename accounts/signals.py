@@ -0,0 +1,64 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .api_cache import invalidate_instance
+from .authentication import REVOKE_FIELDS, forget_user, revoke_user
+from .images import changed_sources, schedule
+from .models import CustomUser, BlogPost, Appointment
+
+
+@receiver(pre_save, sender=BlogPost)
+@receiver(pre_save, sender=CustomUser)
+def image_changing(sender, instance, **kwargs):
+    instance._changed_images = changed_sources(instance)
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_save, sender=CustomUser)
+def image_changed(sender, instance, **kwargs):
+    schedule(instance, getattr(instance, '_changed_images', ()))
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def cached_object_changed(sender, instance, **kwargs):
+    invalidate_instance(instance)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login, which no cached response includes.
+    if update_fields != frozenset(['last_login']):
+        invalidate_instance(instance)
+
+
+@receiver(pre_save, sender=CustomUser)
+def credentials_changing(sender, instance, update_fields=None, **kwargs):
+    instance._revoke_tokens = False
+    if instance.pk is None or update_fields == frozenset(['last_login']):
+        return
+    previous = CustomUser.objects.filter(pk=instance.pk).values(*REVOKE_FIELDS).first()
+    if previous is None:
+        return
+    changed = {field for field in REVOKE_FIELDS if previous[field] != getattr(instance, field)}
+    if instance._password is None:
+        # A new hash without set_password() is the login-time rehash of the
+        # same password, not a password change.
+        changed.discard('password')
+    instance._revoke_tokens = bool(changed)
+
+
+@receiver(post_save, sender=CustomUser)
+def credentials_changed(sender, instance, **kwargs):
+    if getattr(instance, '_revoke_tokens', False):
+        revoke_user(instance.pk)
+    else:
+        forget_user(instance.pk)
+
+
+@receiver(post_delete, sender=CustomUser)
+def user_deleted(sender, instance, **kwargs):
+    revoke_user(instance.pk)
@@ -0,0 +1,60 @@
+"""Content-addressed media storage.
+
+Uploads are hashed while they stream to a temporary file, and stored as
+``<upload_to>/<hh>/<sha256><ext>``. Saving bytes that are already stored
+returns the existing name instead of writing a suffixed copy. Django never
+deletes a model's files when the row goes away, so shared files are safe.
+"""
+import hashlib
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """Stream every upload to disk, hashing the chunks as they arrive."""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.content_hash = self.sha256.hexdigest()
+        return file
+
+
+def content_hash(content):
+    """SHA-256 of ``content``, reusing the digest taken during upload."""
+    digest = getattr(content, 'content_hash', None)
+    if digest is None:
+        sha256 = hashlib.sha256()
+        for chunk in content.chunks():
+            sha256.update(chunk)
+        content.seek(0)
+        digest = sha256.hexdigest()
+    return digest
+
+
+class ContentHashStorage(FileSystemStorage):
+    def hashed_name(self, name, content):
+        directory, basename = posixpath.split(name)
+        extension = posixpath.splitext(basename)[1].lower()
+        digest = content_hash(content)
+        return posixpath.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
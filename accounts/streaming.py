@@ -0,0 +1,114 @@
+"""Streamed JSON list responses for clients that pull a whole result set.
+
+With ``?stream=1`` the list APIs skip pagination and the response cache
+and send every matching row as a ``StreamingHttpResponse``: the queryset
+is read through the view's ``KeysetPaginator`` in keyset batches of
+``STREAM_CHUNK_SIZE`` rows, each row is serialized and rendered on its
+own, and the fragments are sent in pieces of about ``STREAM_BUFFER_SIZE``
+bytes. Every batch is its own query, so memory stays flat however many
+rows match, including on MySQL, whose driver buffers the whole result of
+a query. The body is byte for byte what the paginated view would render
+for a single page holding every row (``next_cursor`` is ``null``).
+"""
+from django.http import StreamingHttpResponse
+
+from .metrics import serializer_timer
+from .renderers import json_renderer
+
+STREAM_CHUNK_SIZE = 500
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+def requested(request):
+    return request.query_params.get('stream') in ('1', 'true')
+
+
+def renderer_for(request):
+    """The request's JSON renderer; the browsable API cannot render fragments."""
+    renderer = getattr(request, 'accepted_renderer', None)
+    if renderer is None or renderer.media_type != 'application/json':
+        return json_renderer()
+    return renderer
+
+
+def envelope(renderer, key, extra):
+    """``(head, tail)`` around the list: ``{"key":[`` and ``],...extra}``."""
+    head = renderer.render({key: []})[:-2]
+    tail = b']' + (b',' + renderer.render(extra)[1:] if extra else b'}')
+    return head, tail
+
+
+def buffered(pieces, size):
+    """Join ``pieces`` (bytes or text) into chunks of at least ``size`` before yielding them.
+
+    A WSGI server writes every chunk to the socket on its own, so single
+    rows would cost a system call each.
+    """
+    buffer = []
+    length = 0
+    for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield piece[:0].join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield buffer[0][:0].join(buffer)
+
+
+async def abuffered(pieces, size):
+    buffer = []
+    length = 0
+    async for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield piece[:0].join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield buffer[0][:0].join(buffer)
+
+
+def json_fragments(renderer, key, rows, serializer, extra):
+    head, tail = envelope(renderer, key, extra)
+    yield head
+    separator = b''
+    for instance in rows:
+        with serializer_timer():
+            row = serializer.to_representation(instance)
+        yield separator + renderer.render(row)
+        separator = b','
+    yield tail
+
+
+async def ajson_fragments(renderer, key, rows, serializer, extra):
+    head, tail = envelope(renderer, key, extra)
+    yield head
+    separator = b''
+    async for instance in rows:
+        with serializer_timer():
+            row = serializer.to_representation(instance)
+        yield separator + renderer.render(row)
+        separator = b','
+    yield tail
+
+
+def stream_list(request, key, queryset, serializer, paginator, extra=None):
+    """Stream ``{key: [serializer(row) for row in queryset], **extra}``.
+
+    ``serializer`` is an unbound serializer instance (no ``instance`` or
+    ``many``) whose ``to_representation`` is applied to each row. Rows come
+    in ``paginator``'s ordering, so the queryset must select its columns.
+    """
+    rows = paginator.iterate(queryset, STREAM_CHUNK_SIZE)
+    fragments = json_fragments(renderer_for(request), key, rows, serializer, extra)
+    return StreamingHttpResponse(buffered(fragments, STREAM_BUFFER_SIZE), content_type='application/json')
+
+
+def astream_list(request, key, queryset, serializer, paginator, extra=None):
+    """``stream_list()`` reading through the async ORM, for async views under ASGI."""
+    rows = paginator.aiterate(queryset, STREAM_CHUNK_SIZE)
+    fragments = ajson_fragments(renderer_for(request), key, rows, serializer, extra)
+    return StreamingHttpResponse(abuffered(fragments, STREAM_BUFFER_SIZE), content_type='application/json')
@@ -1,3 +1,1548 @@
-from django.test import TestCase
+import hashlib
+import json
+import logging
+import logging.config
+import os
+import re
+import shutil
+import tempfile
+import threading
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from contextlib import redirect_stdout
+from io import BytesIO, StringIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from uuid import UUID
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from google.auth.credentials import AnonymousCredentials
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from PIL import ExifTags, Image
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from . import (
+    api_bench, api_cache, appointment_io, bench, google_calendar, log, metrics, passwords, renderers,
+    streaming,
+)
+from .authentication import ClaimsRefreshToken, revocations
+from .cache_backends import LRUFileBasedCache, PersistentFileBasedCache
+from .models import CustomUser, BlogPost, Appointment, CalendarSyncJob
+from .row_serializers import RowSerializer
+from .serializers import AppointmentSerializer, BlogPostListSerializer, BlogPostSerializer, DoctorListSerializer
+
+# The suite clears caches between tests; keep it away from the response
+# cache and the JWT denylist on disk, which belong to the checkout running it.
+TEST_CACHES = override_settings(CACHES={
+    **settings.CACHES,
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-default',
+                'OPTIONS': {'MAX_ENTRIES': 20000}},
+    'revocations': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-revocations'},
+})
+
+
+def setUpModule():
+    TEST_CACHES.enable()
+
+
+def tearDownModule():
+    TEST_CACHES.disable()
+
+
+def make_user(username, user_type, **extra):
+    return CustomUser.objects.create_user(
+        username=username,
+        email=f'{username}@example.com',
+        password='pass12345',
+        user_type=user_type,
+        first_name=username.title(),
+        last_name='Test',
+        address_line1='1 Main Street',
+        city='Pune',
+        state='Maharashtra',
+        pincode='411001',
+        **extra,
+    )
+
+
+def make_appointments(patient, doctor, count, start=date(2025, 1, 1)):
+    Appointment.objects.bulk_create([
+        Appointment(
+            patient=patient,
+            doctor=doctor,
+            speciality='General',
+            date=start + timedelta(days=i),
+            start_time=time(10, 0),
+            end_time=time(10, 45),
+        )
+        for i in range(count)
+    ])
+
+
+class AppointmentListQueryCountTests(TestCase):
+    def setUp(self):
+        self.doctor = make_user('doctor', 'doctor')
+        self.client = APIClient()
+
+    def count_queries(self, url, user):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_doctor_appointments_constant_queries(self):
+        url = reverse('api_doctor_appointments')
+        patients = [make_user(f'patient{i}', 'patient') for i in range(3)]
+        make_appointments(patients[0], self.doctor, 1)
+        baseline, _ = self.count_queries(url, self.doctor)
+        for i, patient in enumerate(patients):
+            make_appointments(patient, self.doctor, 10, start=date(2025, 2, 1) + timedelta(days=10 * i))
+        queries, response = self.count_queries(url, self.doctor)
+        self.assertEqual(queries, baseline)
+        self.assertEqual(len(response.data['appointments']), 31)
+
+    def test_patient_appointments_constant_queries(self):
+        url = reverse('api_patient_appointments')
+        patient = make_user('patient', 'patient')
+        make_appointments(patient, self.doctor, 1)
+        baseline, _ = self.count_queries(url, patient)
+        make_appointments(patient, make_user('doctor2', 'doctor'), 20)
+        queries, _ = self.count_queries(url, patient)
+        self.assertEqual(queries, baseline)
+
+    def test_nested_users_are_slim(self):
+        patient = make_user('patient', 'patient')
+        make_appointments(patient, self.doctor, 1)
+        _, response = self.count_queries(reverse('api_patient_appointments'), patient)
+        doctor = response.data['appointments'][0]['doctor']
+        self.assertEqual(set(doctor), {'id', 'username', 'first_name', 'last_name', 'profile_picture'})
+
+
+class AppointmentPaginationTests(TestCase):
+    def setUp(self):
+        self.doctor = make_user('doctor', 'doctor')
+        self.patient = make_user('patient', 'patient')
+        make_appointments(self.patient, self.doctor, 12)
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+        self.url = reverse('api_doctor_appointments')
+
+    def test_cursor_walks_every_row_in_order(self):
+        seen = []
+        params = {'page_size': 5}
+        while True:
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row['date'] for row in response.data['appointments'])
+            if not response.data['next_cursor']:
+                break
+            params['cursor'] = response.data['next_cursor']
+        self.assertEqual(len(seen), 12)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_ties_on_date_and_time_are_broken_by_id(self):
+        make_appointments(self.patient, make_user('doctor2', 'doctor'), 12)
+        self.client.force_authenticate(self.patient)
+        ids = []
+        params = {'page_size': 7}
+        while True:
+            response = self.client.get(reverse('api_patient_appointments'), params)
+            ids.extend(row['id'] for row in response.data['appointments'])
+            if not response.data['next_cursor']:
+                break
+            params['cursor'] = response.data['next_cursor']
+        self.assertEqual(len(ids), 24)
+        self.assertEqual(len(set(ids)), 24)
+
+    def test_date_window(self):
+        response = self.client.get(self.url, {'from': '2025-01-03', 'to': '2025-01-05'})
+        dates = [row['date'] for row in response.data['appointments']]
+        self.assertEqual(dates, ['2025-01-03', '2025-01-04', '2025-01-05'])
+
+    def test_bad_parameters_are_rejected(self):
+        for params in ({'from': 'soon'}, {'cursor': 'garbage'}, {'page_size': 'x'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400)
+
+
+class StreamingListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = make_user('doctor', 'doctor', speciality='General')
+        self.patient = make_user('patient', 'patient')
+        make_appointments(self.patient, self.doctor, 30)
+        for i in range(5):
+            make_user(f'doctor{i}', 'doctor', speciality='General')
+        make_posts(self.doctor, 'covid19', 3)
+        self.client = APIClient()
+
+    def streamed(self, name, user, params):
+        self.client.force_authenticate(user)
+        response = self.client.get(reverse(name), {**params, 'stream': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_stream_matches_a_single_page(self):
+        cases = [
+            ('api_doctor_appointments', self.doctor, {'fields': 'id,patient,date', 'page_size': 200}),
+            ('api_patient_appointments', self.patient, {'from': '2025-01-05', 'page_size': 200}),
+            ('api_doctor_list', self.patient, {'city': 'pune', 'page_size': 100}),
+            ('api_doctor_blog_list', self.doctor, {}),
+        ]
+        for name, user, params in cases:
+            with self.subTest(name):
+                streamed = self.streamed(name, user, params)
+                self.assertEqual(streamed, self.client.get(reverse(name), params).content)
+
+    def test_stream_starts_after_the_cursor(self):
+        self.client.force_authenticate(self.doctor)
+        first = self.client.get(reverse('api_doctor_appointments'), {'page_size': 10}).json()
+        rest = json.loads(self.streamed('api_doctor_appointments', self.doctor, {'cursor': first['next_cursor']}))
+        self.assertEqual(len(rest['appointments']), 20)
+        self.assertEqual(rest['appointments'][0]['date'], '2025-01-11')
+        self.assertIsNone(rest['next_cursor'])
+        self.client.force_authenticate(self.patient)
+        response = self.client.get(reverse('api_doctor_list'), {'stream': '1', 'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rows_are_read_in_keyset_batches(self):
+        self.client.force_authenticate(self.doctor)
+        page = self.client.get(reverse('api_doctor_appointments'), {'page_size': 200}).json()
+        with mock.patch.object(streaming, 'STREAM_BUFFER_SIZE', 256), \
+                mock.patch.object(streaming, 'STREAM_CHUNK_SIZE', 8), \
+                CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('api_doctor_appointments'), {'stream': '1'})
+            chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual(json.loads(b''.join(chunks)), page)
+        self.assertEqual(len(ctx.captured_queries), 4)
+        self.assertTrue(all('LIMIT 8' in query['sql'] for query in ctx.captured_queries))
+
+    @mock.patch.object(streaming, 'STREAM_CHUNK_SIZE', 7)
+    def test_async_stream_matches_the_sync_stream(self):
+        headers = {'authorization': f'Bearer {ClaimsRefreshToken.for_user(self.patient).access_token}'}
+        for name, params in (('api_patient_appointments', {'fields': 'id,doctor'}), ('api_doctor_list', {})):
+            with self.subTest(name):
+                response = async_to_sync(self.async_client.get)(reverse(f'async_{name}'), {**params, 'stream': '1'},
+                                                                headers=headers)
+                self.assertTrue(response.streaming)
+                body = async_to_sync(self.collect)(response)
+                self.assertEqual(body, self.streamed(name, self.patient, params))
+
+    @staticmethod
+    async def collect(response):
+        return b''.join([chunk async for chunk in response.streaming_content])
+
+
+class BookingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = make_user('doctor', 'doctor')
+        self.patient = make_user('patient', 'patient')
+        self.client = APIClient()
+        self.client.force_authenticate(self.patient)
+        self.url = reverse('api_book_appointment', args=[self.doctor.id])
+
+    def book(self, start_time, day='2025-03-03'):
+        return self.client.post(self.url, {'speciality': 'General', 'date': day, 'start_time': start_time})
+
+    def test_overlapping_slot_is_rejected(self):
+        self.assertEqual(self.book('10:00').status_code, 201)
+        self.assertEqual(self.book('10:30').status_code, 409)
+        self.assertEqual(self.book('09:30').status_code, 409)
+        self.assertEqual(self.book('10:45').status_code, 201)
+        self.assertEqual(Appointment.objects.filter(doctor=self.doctor).count(), 2)
+
+    def test_end_time_is_computed_server_side(self):
+        response = self.client.post(self.url, {'speciality': 'General', 'date': '2025-03-03',
+                                               'start_time': '10:00', 'end_time': '17:00'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(self.url, {'speciality': 'General', 'date': '2025-03-03',
+                                               'start_time': '10:00', 'end_time': '10:45'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Appointment.objects.get(doctor=self.doctor).end_time, time(10, 45))
+
+    def test_slots_outside_working_hours_are_rejected(self):
+        self.assertEqual(self.book('08:30').status_code, 400)
+        self.assertEqual(self.book('17:30').status_code, 400)
+        self.assertEqual(self.book('17:15').status_code, 201)
+        with override_settings(APPOINTMENT_WORKING_HOURS=('00:00', '23:59')):
+            response = self.book('23:30')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': 'Appointments must end on the day they start.'})
+
+    def test_same_time_with_another_doctor_is_allowed(self):
+        other = make_user('doctor2', 'doctor')
+        self.assertEqual(self.book('10:00').status_code, 201)
+        response = self.client.post(reverse('api_book_appointment', args=[other.id]),
+                                    {'speciality': 'General', 'date': '2025-03-03', 'start_time': '10:00'})
+        self.assertEqual(response.status_code, 201)
+
+    def test_free_slots_skip_bookings(self):
+        self.book('09:00')
+        self.book('11:00')
+        response = self.client.get(reverse('api_doctor_slots', args=[self.doctor.id]),
+                                   {'from': '2025-03-03', 'to': '2025-03-04'})
+        self.assertEqual(response.status_code, 200)
+        day = response.data['slots']['2025-03-03']
+        self.assertNotIn('09:00', day)
+        self.assertNotIn('10:30', day)
+        self.assertEqual(day[:3], ['09:45', '11:45', '12:30'])
+        self.assertEqual(len(response.data['slots']['2025-03-04']), 12)
+
+    def test_free_slots_use_one_query(self):
+        make_appointments(self.patient, self.doctor, 20, start=date(2025, 3, 1))
+        url = reverse('api_doctor_slots', args=[self.doctor.id])
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url, {'from': '2025-03-01', 'to': '2025-03-07'})
+        slot_queries = [q for q in ctx.captured_queries if 'accounts_appointment' in q['sql']]
+        self.assertEqual(len(slot_queries), 1)
+
+
+
+class AppointmentImportExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = make_user('doctor', 'doctor')
+        self.patient = make_user('patient', 'patient')
+        self.admin = make_user('admin', 'patient', is_staff=True)
+        make_appointments(self.patient, self.doctor, 1, start=date(2025, 3, 3))  # 10:00-10:45
+
+    def run_import(self, text, file_format='csv', **options):
+        return appointment_io.import_appointments(StringIO(text), file_format, **options)
+
+    def test_csv_import_validates_and_rejects_overlaps(self):
+        report = self.run_import(
+            'patient,doctor,speciality,date,start_time,end_time\n'
+            'patient,doctor,General,2025-03-03,09:00,\n'       # created
+            'patient,doctor,General,2025-03-03,10:30,\n'       # overlaps the existing booking
+            'patient,doctor,General,2025-03-03,09:30,\n'       # overlaps row 2
+            'patient,patient,General,2025-03-03,12:00,\n'      # not a doctor
+            'patient,doctor,General,2025-02-30,12:00,\n'       # invalid date
+            'patient,doctor,General,2025-03-04,12:00,11:00\n'  # ends before it starts
+            'patient,doctor,General,2025-03-04,12:00,13:00\n',  # created
+            chunk_size=4,
+        )
+        self.assertEqual((report.rows, report.created, report.rejected), (7, 2, 5))
+        errors = {error['line']: error['errors'] for error in report.errors}
+        self.assertEqual(sorted(errors), [3, 4, 5, 6, 7])
+        self.assertEqual(list(errors[5]), ['doctor'])
+        self.assertEqual(errors[4], {'start_time': ['This slot is already booked.']})
+        self.assertEqual(Appointment.objects.filter(doctor=self.doctor).count(), 3)
+        self.assertEqual(Appointment.objects.get(date=date(2025, 3, 4)).end_time, time(13, 0))
+        self.assertFalse(CalendarSyncJob.objects.exists())
+
+    def test_import_queries_per_chunk(self):
+        rows = [json.dumps({'patient': 'patient', 'doctor': 'doctor', 'speciality': 'General',
+                            'date': f'2025-04-{day:02d}', 'start_time': '09:00'}) for day in range(1, 21)]
+        with CaptureQueriesContext(connection) as ctx:
+            report = self.run_import('\n'.join(rows) + '\nnot json\n', 'jsonl', chunk_size=10, sync_calendar=True)
+        self.assertEqual((report.created, report.rejected), (20, 1))
+        # Per chunk: users, lock, overlaps, insert, calendar jobs, plus savepoint bookkeeping.
+        self.assertLessEqual(len(ctx.captured_queries), 2 * 8)
+        self.assertEqual(CalendarSyncJob.objects.count(), 20)
+
+    def test_unreadable_row_keeps_the_earlier_chunks(self):
+        report = self.run_import(
+            'patient,doctor,speciality,date,start_time\n'
+            'patient,doctor,General,2025-03-05,09:00\n'
+            'patient,doctor,General,2025-03-06,09:00\n'
+            'patient,doctor,General,2025-03-07,09:00\n'
+            'patient,doctor,' + 'x' * 200_000 + ',2025-03-08,09:00\n'
+            'patient,doctor,General,2025-03-09,09:00\n',
+            chunk_size=2,
+        )
+        self.assertEqual((report.rows, report.created), (3, 3))
+        self.assertEqual(report.as_dict()['unreadable']['line'], 5)
+        self.assertEqual(Appointment.objects.filter(date__gte=date(2025, 3, 5)).count(), 3)
+
+    def test_dry_run_writes_nothing(self):
+        report = self.run_import('patient,doctor,speciality,date,start_time\npatient,doctor,General,2025-03-05,09:00\n',
+                                 dry_run=True)
+        self.assertEqual((report.rows, report.created, report.rejected), (1, 0, 0))
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_api_import_and_streaming_export_round_trip(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        upload = SimpleUploadedFile('clinic.csv', b'patient,doctor,speciality,date,start_time\n'
+                                                  b'patient,doctor,General,2025-03-05,09:00\n')
+        response = client.post(reverse('api_appointment_import'), {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 1)
+
+        response = client.get(reverse('api_appointment_export'), {'file_format': 'jsonl', 'from': '2025-03-04'})
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([(row['patient'], row['doctor'], row['date'], row['start_time'], row['end_time'])
+                          for row in rows], [('patient', 'doctor', '2025-03-05', '09:00', '09:45')])
+
+        exported = b''.join(client.get(reverse('api_appointment_export')).streaming_content).decode()
+        Appointment.objects.all().delete()
+        report = self.run_import(exported)
+        self.assertEqual((report.created, report.rejected), (2, 0))
+
+    def test_api_reports_what_was_imported_before_an_unreadable_line(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        upload = SimpleUploadedFile('clinic.jsonl', b'{"patient": "patient", "doctor": "doctor", "speciality": "General", '
+                                                    b'"date": "2025-03-05", "start_time": "09:00"}\n' + b'\n' * 9000
+                                                    + b'{"patient": "\xff"}\n')
+        response = client.post(reverse('api_appointment_import'), {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['unreadable']['line'], 9002)
+        self.assertIn('line 9002', response.data['error'])
+
+    def test_api_requires_staff(self):
+        client = APIClient()
+        client.force_authenticate(self.patient)
+        self.assertEqual(client.get(reverse('api_appointment_export')).status_code, 403)
+
+    def test_export_reads_keyset_batches(self):
+        other = make_user('doctor2', 'doctor')
+        make_appointments(self.patient, other, 4, start=date(2025, 3, 3))  # ties on (date, start_time)
+        expected = list(Appointment.objects.order_by('date', 'start_time', 'id').values_list('id', flat=True))
+        with mock.patch.object(appointment_io, 'EXPORT_CHUNK_SIZE', 2), \
+                CaptureQueriesContext(connection) as ctx:
+            rows = list(appointment_io.export_rows(Appointment.objects.all()))
+        self.assertEqual([row['id'] for row in rows], expected)
+        self.assertEqual(len(ctx.captured_queries), 3)
+        self.assertTrue(all('LIMIT 2' in query['sql'] for query in ctx.captured_queries))
+
+
+class FakeCalendarClient:
+    def __init__(self, fail_times=0):
+        self.events = []
+        self.fail_times = fail_times
+
+    def insert_events(self, events):
+        results = []
+        for event in events:
+            if self.fail_times:
+                self.fail_times -= 1
+                results.append(ConnectionError('calendar unavailable'))
+                continue
+            self.events.append(event)
+            results.append(f'event-{len(self.events)}')
+        return results
+
+
+class CalendarSyncTests(TestCase):
+    def setUp(self):
+        self.doctor = make_user('doctor', 'doctor')
+        self.patient = make_user('patient', 'patient')
+        self.client = APIClient()
+        self.client.force_authenticate(self.patient)
+
+    def book(self):
+        response = self.client.post(reverse('api_book_appointment', args=[self.doctor.id]),
+                                    {'speciality': 'General', 'date': '2025-03-03', 'start_time': '10:00'})
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def test_booking_queues_instead_of_calling_google(self):
+        appointment_id = self.book()
+        job = CalendarSyncJob.objects.get(appointment_id=appointment_id)
+        self.assertEqual(job.status, 'pending')
+
+        fake = FakeCalendarClient()
+        self.assertEqual(google_calendar.process_due_jobs(fake), (1, 0))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.event_id, job.attempts), ('done', 'event-1', 1))
+        self.assertEqual(fake.events[0]['start']['dateTime'], '2025-03-03T10:00:00')
+        self.assertEqual(fake.events[0]['end']['dateTime'], '2025-03-03T10:45:00')
+
+    def test_failures_back_off_then_succeed(self):
+        self.book()
+        fake = FakeCalendarClient(fail_times=1)
+        now = timezone.now()
+        self.assertEqual(google_calendar.process_due_jobs(fake, now=now), (0, 1))
+        job = CalendarSyncJob.objects.get()
+        self.assertEqual(job.status, 'pending')
+        self.assertGreater(job.next_attempt_at, now)
+
+        # Not due yet: nothing is retried.
+        self.assertEqual(google_calendar.process_due_jobs(fake, now=now), (0, 0))
+        later = now + timedelta(hours=1)
+        self.assertEqual(google_calendar.process_due_jobs(fake, now=later), (1, 0))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('done', 2))
+
+    @override_settings(CALENDAR_SYNC_MAX_ATTEMPTS=2)
+    def test_gives_up_after_max_attempts(self):
+        self.book()
+        fake = FakeCalendarClient(fail_times=5)
+        now = timezone.now()
+        google_calendar.process_due_jobs(fake, now=now)
+        google_calendar.process_due_jobs(fake, now=now + timedelta(hours=1))
+        job = CalendarSyncJob.objects.get()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertIn('calendar unavailable', job.last_error)
+
+
+class StubBatchHandler(BaseHTTPRequestHandler):
+    """Answers Calendar batch requests; events titled 'FAIL' get a 400."""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length'])).decode()
+        boundary = self.headers['Content-Type'].split('boundary=')[1].strip('"')
+        self.server.batches.append(self.path)
+        parts = []
+        for part in body.split('--' + boundary)[1:-1]:
+            content_id = re.search(r'Content-ID: <(.+?) \+ (.+?)>', part)
+            event = json.loads(re.split(r'\r?\n\r?\n', part.strip())[-1])
+            self.server.events.append(event)
+            if event['summary'] == 'FAIL':
+                status_line, payload = 'HTTP/1.1 400 Bad Request', {'error': {'code': 400, 'message': 'bad event'}}
+            else:
+                status_line, payload = 'HTTP/1.1 200 OK', {'id': f'evt-{len(self.server.events)}'}
+            parts.append(
+                '--resp\r\nContent-Type: application/http\r\n'
+                f'Content-ID: <response-{content_id.group(1)} + {content_id.group(2)}>\r\n\r\n'
+                f'{status_line}\r\nContent-Type: application/json\r\n\r\n{json.dumps(payload)}\r\n'
+            )
+        response = (''.join(parts) + '--resp--\r\n').encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'multipart/mixed; boundary=resp')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, *args):
+        pass
+
+
+class GoogleCalendarClientTests(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubBatchHandler)
+        self.server.batches = []
+        self.server.events = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.client = google_calendar.GoogleCalendarClient(
+            credentials=AnonymousCredentials(),
+            root_url=f'http://127.0.0.1:{self.server.server_port}/',
+        )
+
+    def event(self, summary):
+        return {'summary': summary, 'start': {'dateTime': '2025-03-03T10:00:00'},
+                'end': {'dateTime': '2025-03-03T10:45:00'}}
+
+    def test_events_are_sent_in_batches(self):
+        events = [self.event(f'Appointment {i}') for i in range(google_calendar.BATCH_LIMIT + 5)]
+        results = self.client.insert_events(events)
+        self.assertEqual(len(self.server.batches), 2)
+        self.assertTrue(all(path == '/batch/calendar/v3' for path in self.server.batches))
+        self.assertEqual(len(results), len(events))
+        self.assertTrue(all(isinstance(r, str) and r.startswith('evt-') for r in results))
+
+    def test_per_event_errors_are_reported_in_place(self):
+        results = self.client.insert_events([self.event('ok'), self.event('FAIL'), self.event('ok')])
+        self.assertIsInstance(results[0], str)
+        self.assertIsInstance(results[1], Exception)
+        self.assertIsInstance(results[2], str)
+
+    def test_service_is_reused_within_a_thread(self):
+        self.assertIs(self.client.service, self.client.service)
+        other = []
+        thread = threading.Thread(target=lambda: other.append(self.client.service))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], self.client.service)
+
+    def test_process_wide_client_is_shared(self):
+        self.assertIs(google_calendar.get_client(), google_calendar.get_client())
+
+
+def make_posts(author, category, count, is_draft=False):
+    return [
+        BlogPost.objects.create(author=author, title=f'{category} {i}', category=category,
+                                summary='Summary', content='Long body ' * 50, is_draft=is_draft)
+        for i in range(count)
+    ]
+
+
+class PatientBlogFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = make_user('doctor', 'doctor')
+        self.patient = make_user('patient', 'patient')
+        self.client = APIClient()
+        self.client.force_authenticate(self.patient)
+        self.url = reverse('api_patient_blog_list')
+
+    def test_top_posts_per_category_without_content(self):
+        heart = make_posts(self.doctor, 'heart_disease', 4)
+        make_posts(self.doctor, 'covid19', 1)
+        make_posts(self.doctor, 'covid19', 2, is_draft=True)
+        response = self.client.get(self.url, {'per_category': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'Heart Disease', 'Covid19'})
+        self.assertEqual([b['id'] for b in response.data['Heart Disease']], [p.id for p in heart[::-1][:3]])
+        self.assertEqual(len(response.data['Covid19']), 1)
+        self.assertNotIn('content', response.data['Covid19'][0])
+
+    def test_feed_is_cached_until_a_post_changes(self):
+        make_posts(self.doctor, 'covid19', 2)
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        make_posts(self.doctor, 'immunization', 1)
+        response = self.client.get(self.url)
+        self.assertIn('Immunization', response.data)
+
+        BlogPost.objects.filter(category='immunization').get().delete()
+        response = self.client.get(self.url)
+        self.assertNotIn('Immunization', response.data)
+
+    def test_category_pages(self):
+        posts = make_posts(self.doctor, 'mental_health', 5)
+        url = reverse('api_patient_blog_category', args=['mental_health'])
+        first = self.client.get(url, {'page_size': 3})
+        self.assertEqual(first.data['label'], 'Mental Health')
+        second = self.client.get(url, {'page_size': 3, 'cursor': first.data['next_cursor']})
+        ids = [b['id'] for b in first.data['blogs'] + second.data['blogs']]
+        self.assertEqual(ids, [p.id for p in reversed(posts)])
+        self.assertIsNone(second.data['next_cursor'])
+        self.assertEqual(self.client.get(reverse('api_patient_blog_category', args=['nope'])).status_code, 404)
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = make_user('doctor', 'doctor')
+        self.patient = make_user('patient', 'patient')
+        self.client = APIClient()
+        self.client.force_authenticate(self.patient)
+
+    def test_fields_parameter_trims_payload_and_columns(self):
+        make_appointments(self.patient, self.doctor, 3)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('api_patient_appointments'), {'fields': 'id,date'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([set(row) for row in response.data['appointments']], [{'id', 'date'}] * 3)
+        select = [q['sql'] for q in ctx.captured_queries if 'accounts_appointment' in q['sql']][0]
+        self.assertNotIn('speciality', select)
+        self.assertNotIn('accounts_customuser', select)
+
+    def test_nested_fields_stay_joined(self):
+        make_appointments(self.patient, self.doctor, 3)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('api_patient_appointments'), {'fields': 'id,doctor'})
+        self.assertEqual(response.data['appointments'][0]['doctor']['username'], 'doctor')
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_list_and_detail_representations(self):
+        post = make_posts(self.doctor, 'covid19', 1)[0]
+        detail = self.client.get(reverse('api_patient_blog_detail', args=[post.id])).data
+        self.assertIn('content', detail)
+        self.assertNotIn('email', detail['author'])
+        self.client.force_authenticate(self.doctor)
+        listing = self.client.get(reverse('api_doctor_blog_list')).data['blogs']
+        self.assertNotIn('content', listing[0])
+
+    def test_doctor_list_is_slim(self):
+        response = self.client.get(reverse('api_doctor_list'), {'fields': 'id,first_name'})
+        self.assertEqual(response.data['doctors'], [{'id': self.doctor.id, 'first_name': 'Doctor'}])
+        full = self.client.get(reverse('api_doctor_list')).data['doctors'][0]
+        self.assertNotIn('address_line1', full)
+        self.assertIn('city', full)
+
+
+class RowSerializerTests(TestCase):
+    def setUp(self):
+        self.doctor = make_user('doctor', 'doctor', profile_picture='profile_pics/ab/dr face.png')
+        self.patient = make_user('patient', 'patient', profile_picture='profile_pics/cd/pätient.png',
+                                 profile_thumbnail='profile_pics/thumbs/cd/pätient.webp')
+        make_appointments(self.patient, self.doctor, 3)
+        posts = make_posts(self.doctor, 'covid19', 3) + make_posts(self.patient, 'immunization', 1, is_draft=True)
+        BlogPost.objects.filter(id=posts[0].id).update(image='blog_images/ef/cover.jpg')
+        BlogPost.objects.filter(id=posts[1].id).update(image='blog_images/ef/cover.jpg',
+                                                       image_thumbnail='blog_images/thumbs/ef/cover.webp',
+                                                       image_webp='blog_images/webp/ef/cover.webp')
+        self.request = Request(RequestFactory().get('/api/', secure=True))
+
+    def assertSameData(self, serializer_class, queryset, fields=None, request=None):
+        rows = RowSerializer(serializer_class, fields, request)
+        with CaptureQueriesContext(connection) as ctx:
+            data = rows.many(rows.values(queryset.order_by('id')))
+        self.assertEqual(len(ctx.captured_queries), 1)
+        expected = serializer_class(queryset.order_by('id'), many=True, fields=fields,
+                                    context={'request': request}).data
+        self.assertEqual(JSONRenderer().render(data), JSONRenderer().render(expected))
+
+    def test_output_matches_the_serializers(self):
+        cases = [
+            (AppointmentSerializer, Appointment.objects.all()),
+            (BlogPostListSerializer, BlogPost.objects.all()),
+            (BlogPostSerializer, BlogPost.objects.all()),
+            (DoctorListSerializer, CustomUser.objects.all()),
+        ]
+        for serializer_class, queryset in cases:
+            for request in (None, self.request):
+                with self.subTest(serializer_class.__name__, request=request):
+                    self.assertSameData(serializer_class, queryset, request=request)
+
+    def test_sparse_fields_and_time_zones(self):
+        self.assertSameData(AppointmentSerializer, Appointment.objects.all(), fields=['id', 'doctor', 'created_at'])
+        with timezone.override('Asia/Kolkata'):
+            self.assertSameData(BlogPostListSerializer, BlogPost.objects.all(), fields=['id', 'image', 'created_at'])
+
+    def test_unsupported_fields_are_rejected(self):
+        class ScoredPostSerializer(BlogPostListSerializer):
+            score = serializers.SerializerMethodField()
+
+            class Meta(BlogPostListSerializer.Meta):
+                fields = BlogPostListSerializer.Meta.fields + ['score']
+
+        with self.assertRaises(TypeError):
+            RowSerializer(ScoredPostSerializer)
+
+
+class BlogSearchTests(TestCase):
+    def setUp(self):
+        self.doctor = make_user('doctor', 'doctor')
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('patient', 'patient'))
+        self.url = reverse('api_blog_search')
+        self.vaccine = BlogPost.objects.create(
+            author=self.doctor, title='Vaccine schedule for infants', category='immunization',
+            summary='When to vaccinate', content='Immunisation protects children.', is_draft=False)
+        self.heart = BlogPost.objects.create(
+            author=self.doctor, title='Healthy heart', category='heart_disease',
+            summary='Exercise and diet', content='A vaccine will not fix cholesterol.', is_draft=False)
+        BlogPost.objects.create(
+            author=self.doctor, title='Vaccine draft', category='immunization',
+            summary='Unpublished', content='vaccine', is_draft=True)
+
+    def ids(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_ranked_and_published_only(self):
+        # The title match outranks the body-only match; the draft is hidden.
+        self.assertEqual(self.ids(q='vaccine'), [self.vaccine.id, self.heart.id])
+
+    def test_prefix_and_category(self):
+        self.assertEqual(self.ids(q='vacc'), [self.vaccine.id, self.heart.id])
+        self.assertEqual(self.ids(q='vacc', category='heart_disease'), [self.heart.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.heart.content = 'Nothing about shots here.'
+        self.heart.save()
+        self.assertEqual(self.ids(q='vaccine'), [self.vaccine.id])
+        self.vaccine.delete()
+        self.assertEqual(self.ids(q='vaccine'), [])
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.ids(q='heart exercise'), [self.heart.id])
+        self.assertEqual(self.ids(q='heart infants'), [])
+
+
+class DoctorDirectoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('patient', 'patient'))
+        self.url = reverse('api_doctor_list')
+        self.pune = make_user('asha', 'doctor', speciality='Cardiology')
+        self.mumbai = make_user('bela', 'doctor', speciality='Psychiatry')
+        self.mumbai.city, self.mumbai.pincode = 'Mumbai', '400001'
+        self.mumbai.save()
+
+    def usernames(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [row['username'] for row in response.data['doctors']]
+
+    def test_filters(self):
+        self.assertEqual(self.usernames(city='mumbai'), ['bela'])
+        self.assertEqual(self.usernames(state='Maharashtra'), ['asha', 'bela'])
+        self.assertEqual(self.usernames(pincode='4110'), ['asha'])
+        self.assertEqual(self.usernames(speciality='cardiology'), ['asha'])
+        self.assertEqual(self.usernames(city='Pune', speciality='Psychiatry'), [])
+
+    def test_paginated_by_name(self):
+        for name in ('chitra', 'dev', 'esha'):
+            make_user(name, 'doctor')
+        first = self.client.get(self.url, {'page_size': 3}).data
+        second = self.client.get(self.url, {'page_size': 3, 'cursor': first['next_cursor']}).data
+        names = [row['username'] for row in first['doctors'] + second['doctors']]
+        self.assertEqual(names, ['asha', 'bela', 'chitra', 'dev', 'esha'])
+        self.assertIsNone(second['next_cursor'])
+
+
+def make_image(name='photo.jpg', size=(2400, 1600), fmt='JPEG'):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, fmt, quality=95)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=f'image/{fmt.lower()}')
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.media_root = media_root
+        settings_override = override_settings(MEDIA_ROOT=media_root, IMAGE_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.doctor = make_user('doctor', 'doctor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+
+    def make_post(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = BlogPost.objects.create(author=self.doctor, title='Post', category='covid19',
+                                           summary='Summary', content='Body', is_draft=False, image=image)
+        post.refresh_from_db()
+        return post
+
+    def test_upload_generates_webp_derivatives(self):
+        post = self.make_post(make_image())
+        with Image.open(post.image_thumbnail) as thumbnail:
+            self.assertEqual((thumbnail.format, thumbnail.size), ('WEBP', (800, 400)))
+        with Image.open(post.image_webp) as large:
+            self.assertEqual((large.format, large.size), ('WEBP', (1600, 1067)))
+        self.assertLess(post.image_thumbnail.size * 10, post.image.size)
+
+        self.doctor.profile_picture = make_image('me.png', (500, 300), 'PNG')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctor.save()
+        self.doctor.refresh_from_db()
+        with Image.open(self.doctor.profile_thumbnail) as avatar:
+            self.assertEqual(avatar.size, (240, 240))
+
+    def test_original_is_stored_without_metadata(self):
+        exif = Image.Exif()
+        exif[ExifTags.Base.Orientation] = 6
+        exif.get_ifd(ExifTags.IFD.GPSInfo)[ExifTags.GPS.GPSLatitude] = (18.0, 31.0, 12.0)
+        buffer = BytesIO()
+        Image.new('RGB', (600, 400), (200, 30, 30)).save(buffer, 'JPEG', exif=exif, comment=b'Pune clinic')
+        upload = SimpleUploadedFile('gps.jpg', buffer.getvalue(), content_type='image/jpeg')
+        digest = hashlib.sha256(buffer.getvalue()).hexdigest()
+        post = self.make_post(upload)
+        self.assertNotEqual(post.image.name, f'blog_images/{digest[:2]}/{digest}.jpg')
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'blog_images', digest[:2], f'{digest}.jpg')))
+        with Image.open(post.image) as original:
+            self.assertEqual((original.format, original.size), ('JPEG', (400, 600)))
+            self.assertFalse(original.getexif())
+            self.assertNotIn('comment', original.info)
+        self.assertTrue(post.image_thumbnail)
+
+    def test_serializers_expose_sized_urls(self):
+        post = self.make_post(make_image())
+        listing = self.client.get(reverse('api_doctor_blog_list')).data['blogs'][0]
+        self.assertTrue(listing['image'].endswith(post.image_thumbnail.url))
+        self.client.force_authenticate(make_user('patient', 'patient'))
+        detail = self.client.get(reverse('api_patient_blog_detail', args=[post.id])).data
+        self.assertTrue(detail['image'].endswith(post.image.url))
+        self.assertTrue(detail['image_webp'].endswith(post.image_webp.url))
+
+    def test_unreadable_image_falls_back_to_original(self):
+        post = self.make_post(SimpleUploadedFile('broken.jpg', b'not an image'))
+        self.assertFalse(post.image_thumbnail)
+        listing = self.client.get(reverse('api_doctor_blog_list')).data['blogs'][0]
+        self.assertTrue(listing['image'].endswith(post.image.url))
+
+    def test_clearing_and_keeping_the_original(self):
+        post = self.make_post(make_image())
+        thumbnail = post.image_thumbnail.name
+        post.title = 'Renamed'
+        post.save()
+        self.assertEqual(post.image_thumbnail.name, thumbnail)
+        post.image = None
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        post.refresh_from_db()
+        self.assertFalse(post.image_thumbnail)
+        self.assertFalse(post.image_webp)
+
+    def test_rendering_waits_for_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            post = BlogPost.objects.create(author=self.doctor, title='Post', category='covid19',
+                                           summary='Summary', content='Body', image=make_image())
+        post.refresh_from_db()
+        self.assertFalse(post.image_thumbnail)
+        for callback in callbacks:
+            callback()
+        post.refresh_from_db()
+        self.assertTrue(post.image_thumbnail)
+
+    def test_identical_uploads_are_stored_once(self):
+        content = make_image().read()
+        names = []
+        for _ in range(2):
+            upload = SimpleUploadedFile('same.jpg', content, content_type='image/jpeg')
+            response = self.client.post(reverse('api_doctor_blog_create'), {
+                'title': 'Post', 'category': 'covid19', 'summary': 'Summary', 'content': 'Body',
+                'is_draft': 'false', 'image': upload,
+            }, format='multipart')
+            self.assertEqual(response.status_code, 201)
+            names.append(BlogPost.objects.get(id=response.data['id']).image.name)
+        self.assertEqual(names[0], names[1])
+        self.assertEqual(names[0], f'blog_images/{hashlib.sha256(content).hexdigest()[:2]}/'
+                                   f'{hashlib.sha256(content).hexdigest()}.jpg')
+        stored = os.listdir(os.path.join(self.media_root, os.path.dirname(names[0])))
+        self.assertEqual(len(stored), 1)
+
+    def test_backfill_command(self):
+        post = self.make_post(make_image())
+        BlogPost.objects.filter(pk=post.pk).update(image_thumbnail=None, image_webp=None)
+        call_command('generate_image_derivatives', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertTrue(post.image_thumbnail.name.endswith('.webp'))
+        self.assertTrue(post.image_webp)
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.body = bytes(range(256)) * 40
+        self.digest = hashlib.sha256(self.body).hexdigest()
+        self.hashed = f'blog_images/{self.digest[:2]}/{self.digest}.jpg'
+        for name in (self.hashed, 'blog_images/legacy.jpg'):
+            os.makedirs(os.path.join(media_root, os.path.dirname(name)), exist_ok=True)
+            with open(os.path.join(media_root, name), 'wb') as fh:
+                fh.write(self.body)
+
+    def get(self, name, **headers):
+        return self.client.get(f'/media/{name}', headers=headers)
+
+    def test_hashed_files_are_immutable_and_revalidate(self):
+        response = self.get(self.hashed)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.body)
+        self.assertEqual(response['ETag'], f'"{self.digest}"')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+
+        response = self.get(self.hashed, if_none_match=f'"{self.digest}"')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], f'"{self.digest}"')
+
+    def test_legacy_files_get_a_stat_etag(self):
+        response = self.get('blog_images/legacy.jpg')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.get('blog_images/legacy.jpg', if_none_match=response['ETag']).status_code, 304)
+
+    def test_byte_ranges(self):
+        response = self.get(self.hashed, range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.body[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.body)}')
+
+        response = self.get(self.hashed, range='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), self.body[-5:])
+
+        response = self.get(self.hashed, range='bytes=10-19', if_range='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.get(self.hashed, range=f'bytes={len(self.body)}-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_missing_and_traversal(self):
+        self.assertEqual(self.get('blog_images/nope.jpg').status_code, 404)
+        self.assertEqual(self.get('../settings.py').status_code, 404)
+        self.assertEqual(self.client.post(f'/media/{self.hashed}').status_code, 405)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT='/protected-media/')
+    def test_accel_redirect(self):
+        response = self.get(self.hashed)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.hashed}')
+        self.assertEqual(response.content, b'')
+
+
+class ApiCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        api_cache.stats.reset()
+        self.doctor = make_user('doctor', 'doctor', speciality='Cardiology')
+        self.patient = make_user('patient', 'patient')
+        self.client = APIClient()
+        self.client.force_authenticate(self.patient)
+
+    def test_doctor_list_is_served_from_cache_until_a_doctor_changes(self):
+        url = reverse('api_doctor_list')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(response.data['doctors'][0]['first_name'], 'Doctor')
+        self.assertEqual(api_cache.stats.snapshot()['doctor_list']['hits'], 1)
+
+        self.doctor.first_name = 'Asha'
+        self.doctor.save()
+        self.assertEqual(self.client.get(url).data['doctors'][0]['first_name'], 'Asha')
+        # Other filter and fieldset variants are cached separately.
+        self.assertEqual(self.client.get(url, {'fields': 'id'}).data['doctors'], [{'id': self.doctor.id}])
+
+    def test_invalidation_is_scoped(self):
+        first, second = make_posts(self.doctor, 'covid19', 2)
+        for post in (first, second):
+            self.client.get(reverse('api_patient_blog_detail', args=[post.id]))
+        first.title = 'Updated'
+        first.save()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('api_patient_blog_detail', args=[second.id]))
+        self.assertEqual(len(ctx.captured_queries), 0)
+        response = self.client.get(reverse('api_patient_blog_detail', args=[first.id]))
+        self.assertEqual(response.data['title'], 'Updated')
+
+    def test_author_change_reaches_blog_detail(self):
+        post = make_posts(self.doctor, 'covid19', 1)[0]
+        url = reverse('api_patient_blog_detail', args=[post.id])
+        self.client.get(url)
+        self.doctor.last_name = 'Rao'
+        self.doctor.save()
+        self.assertEqual(self.client.get(url).data['author']['last_name'], 'Rao')
+
+    def test_booking_refreshes_free_slots(self):
+        url = reverse('api_doctor_slots', args=[self.doctor.id])
+        params = {'from': '2030-03-04', 'to': '2030-03-04'}
+        self.assertIn('10:30', self.client.get(url, params).data['slots']['2030-03-04'])
+        self.client.post(reverse('api_book_appointment', args=[self.doctor.id]),
+                         {'speciality': 'General', 'date': '2030-03-04', 'start_time': '10:30'})
+        self.assertNotIn('10:30', self.client.get(url, params).data['slots']['2030-03-04'])
+
+    def test_stats_endpoint_is_admin_only(self):
+        url = reverse('api_cache_stats')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.get(reverse('api_doctor_list'))
+        self.client.force_authenticate(make_user('admin', 'patient', is_staff=True))
+        response = self.client.get(url)
+        self.assertEqual(response.data['namespaces']['doctor_list']['misses'], 1)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = make_user('doctor', 'doctor')
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('patient', 'patient'))
+        self.post = make_posts(self.doctor, 'covid19', 1)[0]
+
+    def test_unchanged_detail_answers_304_without_queries(self):
+        url = reverse('api_patient_blog_detail', args=[self.post.id])
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        self.post.title = 'Changed'
+        self.post.save()
+        response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_varies_with_the_representation(self):
+        url = reverse('api_patient_blog_detail', args=[self.post.id])
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, {'fields': 'id'}, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_feed_and_doctor_detail(self):
+        for url in (reverse('api_patient_blog_list'), reverse('api_doctor_detail', args=[self.doctor.id])):
+            first = self.client.get(url)
+            self.assertEqual(first['Cache-Control'], 'private, no-cache')
+            self.assertEqual(self.client.get(url, headers={'if-none-match': first['ETag']}).status_code, 304)
+        etag = self.client.get(reverse('api_doctor_detail', args=[self.doctor.id]))['ETag']
+        self.doctor.city = 'Nashik'
+        self.doctor.save()
+        response = self.client.get(reverse('api_doctor_detail', args=[self.doctor.id]), headers={'if-none-match': etag})
+        self.assertEqual(response.data['city'], 'Nashik')
+
+
+class LRUFileBasedCacheTests(TestCase):
+    def test_culls_least_recently_used(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        lru = LRUFileBasedCache(location, {'OPTIONS': {'MAX_ENTRIES': 3, 'CULL_FREQUENCY': 3}})
+        for age, key in enumerate(['a', 'b', 'c']):
+            lru.set(key, key)
+            os.utime(lru._key_to_file(key), (1000 + age, 1000 + age))
+        self.assertEqual(lru.get('a'), 'a')
+        lru.set('d', 'd')
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual([lru.get(key) for key in 'acd'], ['a', 'c', 'd'])
+
+    def test_persistent_cache_only_culls_expired_entries(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        persistent = PersistentFileBasedCache(location, {'OPTIONS': {'MAX_ENTRIES': 3}})
+        persistent.set('expired', 1, 0)
+        for key in 'abcde':
+            persistent.set(key, key, 60)
+        self.assertEqual([persistent.get(key) for key in 'abcde'], list('abcde'))
+        self.assertEqual(len(persistent._list_cache_files()), 5)
+
+
+class ClaimsJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        revocations().clear()
+        self.patient = make_user('patient', 'patient')
+        self.client = APIClient()
+        response = self.client.post(reverse('api_login'), {'username': 'patient', 'password': 'pass12345'})
+        self.access, self.refresh = response.data['access'], response.data['refresh']
+        self.url = reverse('api_patient_appointments')
+
+    def get(self, token=None):
+        return self.client.get(self.url, headers={'authorization': f'Bearer {token or self.access}'})
+
+    def test_user_comes_from_claims_without_a_query(self):
+        make_appointments(self.patient, make_user('doctor', 'doctor'), 2)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['appointments']), 2)
+        # Only the appointment page itself; no user lookup.
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_tokens_without_claims_still_work(self):
+        token = ClaimsRefreshToken()
+        token['user_id'] = self.patient.id
+        self.assertEqual(self.get(str(token.access_token)).status_code, 200)
+
+    def test_logout_revokes_the_token(self):
+        response = self.client.post(reverse('api_logout'), {'refresh': self.refresh},
+                                    headers={'authorization': f'Bearer {self.access}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get().status_code, 401)
+        response = self.client.post(reverse('token_refresh'), {'refresh': self.refresh})
+        self.assertEqual(response.status_code, 401)
+
+    def issued_a_second_ago(self):
+        refresh = ClaimsRefreshToken.for_user(self.patient)
+        refresh['iat'] -= 1
+        access = refresh.access_token
+        access['iat'] -= 1
+        return str(access), str(refresh)
+
+    def test_password_change_revokes_every_token(self):
+        access, refresh = self.issued_a_second_ago()
+        self.patient.set_password('changed12345')
+        self.patient.save()
+        self.assertEqual(self.get(access).status_code, 401)
+        self.assertEqual(self.client.post(reverse('token_refresh'), {'refresh': refresh}).status_code, 401)
+        # Logging in again within the same second is fine.
+        response = self.client.post(reverse('api_login'), {'username': 'patient', 'password': 'changed12345'})
+        self.assertEqual(self.get(response.data['access']).status_code, 200)
+
+    def test_revocations_survive_a_full_response_cache(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        caches = {
+            'default': {'BACKEND': 'accounts.cache_backends.LRUFileBasedCache',
+                        'LOCATION': os.path.join(location, 'default'),
+                        'OPTIONS': {'MAX_ENTRIES': 20, 'CULL_FREQUENCY': 4}},
+            'revocations': {'BACKEND': 'accounts.cache_backends.PersistentFileBasedCache',
+                            'LOCATION': os.path.join(location, 'revocations'), 'OPTIONS': {'MAX_ENTRIES': 20}},
+        }
+        access, _ = self.issued_a_second_ago()
+        with override_settings(CACHES=caches):
+            self.client.post(reverse('api_logout'), {'refresh': self.refresh},
+                             headers={'authorization': f'Bearer {self.access}'})
+            self.patient.set_password('changed12345')
+            self.patient.save()
+            for i in range(100):
+                cache.set(f'response:{i}', i)
+                cache.get(f'response:{i}')
+            self.assertLessEqual(len(cache._list_cache_files()), 20)
+            self.assertEqual(self.get().status_code, 401)
+            self.assertEqual(self.get(access).status_code, 401)
+
+    def test_unrelated_changes_keep_tokens(self):
+        self.patient.city = 'Nashik'
+        self.patient.save()
+        self.assertEqual(self.get().status_code, 200)
+        refreshed = self.client.post(reverse('token_refresh'), {'refresh': self.refresh})
+        self.assertEqual(self.get(refreshed.data['access']).status_code, 200)
+
+    @override_settings(JWT_USER_CACHE_TIMEOUT=60)
+    def test_full_user_cache(self):
+        self.get()
+        with CaptureQueriesContext(connection) as ctx:
+            self.get()
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.patient.first_name = 'Renamed'
+        self.patient.save()
+        with CaptureQueriesContext(connection) as ctx:
+            self.get()
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['accounts.passwords.TunedArgon2PasswordHasher', 'django.contrib.auth.hashers.MD5PasswordHasher'],
+    ARGON2_TIME_COST=1, ARGON2_MEMORY_COST=1024, ARGON2_PARALLELISM=1,
+)
+class PasswordHashingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_hasher_uses_configured_cost(self):
+        encoded = make_password('pass12345')
+        self.assertTrue(encoded.startswith('argon2$argon2id$v=19$m=1024,t=1,p=1$'))
+        with override_settings(ARGON2_TIME_COST=2):
+            self.assertTrue(passwords.must_update(encoded))
+
+    def test_login_upgrades_legacy_hash_without_revoking_tokens(self):
+        user = make_user('patient', 'patient')
+        CustomUser.objects.filter(id=user.id).update(password=make_password('pass12345', hasher='md5'))
+        client = APIClient()
+        response = client.post(reverse('api_login'), {'username': 'patient', 'password': 'pass12345'})
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('argon2$'))
+        response = client.get(reverse('api_patient_appointments'),
+                              headers={'authorization': f'Bearer {response.data["access"]}'})
+        self.assertEqual(response.status_code, 200)
+
+    async def test_aauthenticate(self):
+        user = await CustomUser.objects.acreate(
+            username='patient', user_type='patient', password=make_password('pass12345', hasher='md5'),
+        )
+        self.assertIsNone(await passwords.aauthenticate('patient', 'wrong'))
+        self.assertIsNone(await passwords.aauthenticate('nobody', 'pass12345'))
+        self.assertEqual(await passwords.aauthenticate('patient', 'pass12345'), user)
+        await user.arefresh_from_db()
+        self.assertTrue(user.password.startswith('argon2$'))
+
+
+class AsyncApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = make_user('doctor', 'doctor', speciality='General')
+        self.patient = make_user('patient', 'patient')
+        self.headers = self.auth(self.patient)
+        make_appointments(self.patient, self.doctor, 3, start=date(2025, 3, 3))
+        self.post = make_posts(self.doctor, 'covid19', 2)[0]
+
+    def auth(self, user):
+        return {'authorization': f'Bearer {ClaimsRefreshToken.for_user(user).access_token}'}
+
+    def get(self, name, args=(), data=None, headers=None):
+        return async_to_sync(self.async_client.get)(reverse(name, args=args), data, headers=headers or self.headers)
+
+    def test_payloads_match_the_sync_views(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=self.headers['authorization'])
+        cases = [
+            ('api_patient_appointments', [], {'fields': 'id,doctor,date'}),
+            ('api_appointment_confirmed', [Appointment.objects.first().id], None),
+            ('api_patient_blog_list', [], None),
+            ('api_patient_blog_category', ['covid19'], {'page_size': 1}),
+            ('api_patient_blog_detail', [self.post.id], None),
+            ('api_doctor_list', [], {'city': 'pune'}),
+            ('api_doctor_detail', [self.doctor.id], None),
+            ('api_doctor_slots', [self.doctor.id], {'from': '2025-03-03', 'to': '2025-03-05'}),
+        ]
+        for name, args, data in cases:
+            with self.subTest(name):
+                expected = client.get(reverse(name, args=args), data)
+                response = self.get(f'async_{name}', args, data)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, expected.content)
+                self.assertEqual(response.get('ETag'), expected.get('ETag'))
+
+    def test_cached_response_needs_no_query(self):
+        url_args = ('async_api_doctor_list', [], {'city': 'pune'})
+        first = self.get(*url_args)
+        with CaptureQueriesContext(connection) as ctx:
+            hit = self.get(*url_args)
+            revalidated = self.get(*url_args, headers={**self.headers, 'if-none-match': first['ETag']})
+        self.assertEqual(hit.content, first.content)
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_booking(self):
+        url = reverse('async_api_book_appointment', args=[self.doctor.id])
+        post = async_to_sync(self.async_client.post)
+        body = {'speciality': 'General', 'date': '2025-04-01', 'start_time': '10:00'}
+        response = post(url, body, content_type='application/json', headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(CalendarSyncJob.objects.filter(appointment_id=response.json()['id']).exists())
+        self.assertEqual(post(url, body, content_type='application/json', headers=self.headers).status_code, 409)
+        response = post(url, {'date': 'soon'}, content_type='application/json', headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('start_time', response.json())
+
+    def test_authentication_and_permissions(self):
+        self.assertEqual(self.get('async_api_doctor_list', headers={'x': 'y'}).status_code, 401)
+        self.assertEqual(self.get('async_api_doctor_list', headers={'authorization': 'Bearer nope'}).status_code, 401)
+        self.assertEqual(self.get('async_api_doctor_list', headers=self.auth(self.doctor)).status_code, 403)
+        self.assertEqual(self.get('async_api_doctor_appointments', headers=self.auth(self.doctor)).status_code, 200)
+        self.assertEqual(self.get('async_api_doctor_detail', [self.patient.id]).status_code, 404)
+
+
+class FastJSONTests(TestCase):
+    PAYLOAD = {
+        'text': 'Dr. "Rao" <b>é</b> 😀\u2028\u2029\x00\t',
+        'numbers': [0, -1, 2 ** 63 - 1, 1.5, -0.0, 0.1, 123456.789],
+        'flags': [True, False, None],
+        'date': date(2025, 3, 3),
+        'time': time(9, 45),
+        'precise_time': time(9, 45, 0, 120),
+        'utc': datetime(2025, 3, 3, 9, 45, tzinfo=dt_timezone.utc),
+        'ist': datetime(2025, 3, 3, 9, 45, 1, 5, tzinfo=dt_timezone(timedelta(hours=5, minutes=30))),
+        'naive': datetime(2025, 3, 3, 9, 45),
+        'decimal': Decimal('12.50'),
+        'uuid': UUID('12345678-1234-5678-1234-567812345678'),
+        'lazy': gettext_lazy('Not found.'),
+        'nested': {'list': ({'a': []}, [{}]), 'empty': ''},
+    }
+    GOLDEN = (
+        '{"text":"Dr. \\"Rao\\" <b>é</b> 😀\\u2028\\u2029\\u0000\\t",'
+        '"numbers":[0,-1,9223372036854775807,1.5,-0.0,0.1,123456.789],'
+        '"flags":[true,false,null],'
+        '"date":"2025-03-03","time":"09:45:00","precise_time":"09:45:00.000120",'
+        '"utc":"2025-03-03T09:45:00Z","ist":"2025-03-03T09:45:01.000005+05:30","naive":"2025-03-03T09:45:00",'
+        '"decimal":12.5,"uuid":"12345678-1234-5678-1234-567812345678","lazy":"Not found.",'
+        '"nested":{"list":[{"a":[]},[{}]],"empty":""}}'
+    ).encode()
+
+    def assertRendersLikeDRF(self, data, media_type=None):
+        expected = JSONRenderer().render(data, media_type)
+        self.assertEqual(renderers.FastJSONRenderer().render(data, media_type), expected)
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(renderers.FastJSONRenderer().render(data, media_type), expected)
+
+    def test_golden_output(self):
+        self.assertEqual(renderers.FastJSONRenderer().render(self.PAYLOAD), self.GOLDEN)
+        self.assertRendersLikeDRF(self.PAYLOAD)
+
+    def test_what_orjson_refuses_is_left_to_drf(self):
+        for data in ({'big': 2 ** 64}, {1: 'one'}):
+            with self.subTest(data=data):
+                self.assertRendersLikeDRF(data)
+        self.assertRendersLikeDRF(self.PAYLOAD, 'application/json; indent=2')
+        with self.assertRaises(ValueError):
+            renderers.FastJSONRenderer().render({'time': time(9, 45, tzinfo=dt_timezone.utc)})
+
+    def test_serializer_payloads(self):
+        doctor = make_user('doctor', 'doctor', profile_picture='profile_pics/ab/dr face.png')
+        make_appointments(make_user('patient', 'patient'), doctor, 3)
+        make_posts(doctor, 'covid19', 2)
+        request = Request(RequestFactory().get('/api/'))
+        self.assertRendersLikeDRF(AppointmentSerializer(Appointment.objects.all(), many=True).data)
+        self.assertRendersLikeDRF(BlogPostSerializer(BlogPost.objects.all(), many=True,
+                                                     context={'request': request}).data)
+
+    def test_parser_reads_like_drf(self):
+        for body, encoding in ((self.GOLDEN, 'utf-8'), (b'{"big": 18446744073709551616}', 'utf-8'),
+                               ('{"name": "Zoë"}'.encode('latin-1'), 'latin-1')):
+            with self.subTest(body=body):
+                context = {'encoding': encoding}
+                self.assertEqual(renderers.FastJSONParser().parse(BytesIO(body), parser_context=context),
+                                 JSONParser().parse(BytesIO(body), parser_context=context))
+        for body in (b'{"a": NaN}', b'{"a": ', b''):
+            with self.subTest(body=body):
+                self.assertEqual(self.parse_error(renderers.FastJSONParser(), body),
+                                 self.parse_error(JSONParser(), body))
+
+    def parse_error(self, parser, body):
+        with self.assertRaises(ParseError) as ctx:
+            parser.parse(BytesIO(body))
+        return str(ctx.exception)
+
+    def test_enabled_through_settings(self):
+        client = APIClient()
+        client.force_authenticate(make_user('patient', 'patient'))
+        response = client.get(reverse('api_patient_appointments'))
+        self.assertIsInstance(response.accepted_renderer, renderers.FastJSONRenderer)
+        self.assertIsInstance(renderers.json_renderer(), renderers.FastJSONRenderer)
+        self.assertIsInstance(renderers.json_parser(), renderers.FastJSONParser)
+
+
+class LoggingTests(TestCase):
+    def record(self, msg, *args, level=logging.INFO):
+        return logging.LogRecord('accounts.views', level, __file__, 1, msg, args or None, None)
+
+    def test_login_logs_no_credentials(self):
+        make_user('patient', 'patient')
+        stdout = StringIO()
+        with self.assertLogs('accounts', 'INFO') as logs, redirect_stdout(stdout):
+            self.client.post(reverse('api_login'), {'username': 'patient', 'password': 'pass12345'})
+            self.client.post(reverse('api_login'), {'username': 'patient', 'password': 'wrong-secret'})
+        self.assertEqual(stdout.getvalue(), '')
+        output = '\n'.join(logs.output)
+        self.assertIn('logged in', output)
+        self.assertIn('Login failed', output)
+        self.assertNotIn('pass12345', output)
+        self.assertNotIn('wrong-secret', output)
+
+    def test_redaction(self):
+        record = self.record('data %s', {'username': 'ann', 'password': 'hunter2', 'nested': {'refresh': 'abc'}})
+        log.RedactingFilter().filter(record)
+        self.assertNotIn('hunter2', record.getMessage())
+        self.assertNotIn('abc', record.getMessage())
+        self.assertIn('ann', record.getMessage())
+        record = self.record('Login attempt with username: ann, password: hunter2')
+        log.RedactingFilter().filter(record)
+        self.assertEqual(record.getMessage(), 'Login attempt with username: ann, password: [redacted]')
+
+    @override_settings(LOG_SAMPLE_RATES={'api_user_login': 0}, LOG_SAMPLE_DEFAULT=1.0)
+    def test_sampling_per_endpoint(self):
+        request_filter = log.RequestContextFilter()
+
+        def passes(url_name, level):
+            request = RequestFactory().post('/api/login/')
+            request.resolver_match = type('Match', (), {'url_name': url_name})()
+            middleware = log.LogContextMiddleware(lambda request: request_filter.filter(self.record('x', level=level)))
+            return middleware(request)
+
+        self.assertFalse(passes('api_user_login', logging.INFO))
+        self.assertTrue(passes('api_user_login', logging.WARNING))
+        self.assertTrue(passes('api_signup', logging.INFO))
+        record = self.record('outside a request')
+        self.assertTrue(request_filter.filter(record))
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        release = threading.Event()
+
+        class SlowHandler(logging.Handler):
+            def emit(self, record):
+                release.wait(5)
+
+        target = SlowHandler()
+        target.set_name('test-slow')
+        handler = log.QueueHandler(handlers=['test-slow'], maxsize=1)
+        try:
+            for i in range(3):
+                handler.handle(self.record('message %s', i))
+            self.assertGreaterEqual(handler.dropped, 1)
+        finally:
+            release.set()
+            handler.stop()
+
+    def test_queue_handler_target_may_sort_after_it(self):
+        self.addCleanup(logging.config.dictConfig, settings.LOGGING)
+        logging.config.dictConfig({
+            'version': 1,
+            'disable_existing_loggers': False,
+            'handlers': {
+                'queue': {'()': 'accounts.log.QueueHandler', 'handlers': ['zconsole']},
+                'zconsole': {'class': 'logging.NullHandler'},
+            },
+        })
+        handler = logging._handlers['queue']
+        self.addCleanup(handler.stop)
+        handler.start()
+        self.assertEqual([target.name for target in handler._listener.handlers], ['zconsole'])
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = make_user('doctor', 'doctor')
+        self.patient = make_user('patient', 'patient')
+        make_appointments(self.patient, self.doctor, 3)
+        self.headers = {'authorization': f'Bearer {ClaimsRefreshToken.for_user(self.patient).access_token}'}
+
+    def sample(self, name, view):
+        return metrics.REGISTRY.get_sample_value(name, {'view': view}) or 0
+
+    def deltas(self, view, request):
+        names = ['api_db_queries_count', 'api_db_queries_sum', 'api_serializer_seconds_sum', 'api_response_bytes_sum']
+        before = {name: self.sample(name, view) for name in names}
+        response = request()
+        return response, {name: self.sample(name, view) - before[name] for name in names}
+
+    def test_request_is_observed_under_its_url_name(self):
+        response, delta = self.deltas('api_patient_appointments', lambda: self.client.get(
+            reverse('api_patient_appointments'), headers=self.headers))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(delta['api_db_queries_count'], 1)
+        self.assertEqual(delta['api_db_queries_sum'], 1)
+        self.assertGreater(delta['api_serializer_seconds_sum'], 0)
+        self.assertEqual(delta['api_response_bytes_sum'], len(response.content))
+
+    def test_async_view_queries_are_counted(self):
+        response, delta = self.deltas('async_api_patient_appointments', lambda: async_to_sync(self.async_client.get)(
+            reverse('async_api_patient_appointments'), headers=self.headers))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(delta['api_db_queries_sum'], 1)
+
+    def test_streaming_response_is_observed_once_sent(self):
+        staff = make_user('staff', 'patient', is_staff=True)
+        headers = {'authorization': f'Bearer {ClaimsRefreshToken.for_user(staff).access_token}'}
+        view = 'api_appointment_export'
+        response, delta = self.deltas(view, lambda: self.client.get(reverse(view), headers=headers))
+        self.assertEqual(delta['api_db_queries_count'], 0)
+        body, delta = self.deltas(view, lambda: b''.join(response.streaming_content))
+        self.assertEqual(len(body.splitlines()), 4)
+        self.assertEqual(delta['api_db_queries_count'], 1)
+        self.assertEqual(delta['api_db_queries_sum'], 1)
+        self.assertEqual(delta['api_response_bytes_sum'], len(body))
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('api_patient_appointments'), headers=self.headers)
+        response = self.client.get(reverse('metrics'), headers={'authorization': 'Bearer scrape-secret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'api_request_seconds_bucket{le="0.001",method="GET",view="api_patient_appointments"}',
+                      response.content)
+        # The proxy in front of the app connects from localhost.
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='127.0.0.1').status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), headers=self.headers).status_code, 403)
+
+    def test_metrics_endpoint_is_off_without_a_token(self):
+        response = self.client.get(reverse('metrics'), headers={'authorization': 'Bearer '})
+        self.assertEqual(response.status_code, 404)
+
+
+class ApiBenchmarkTests(TestCase):
+    def test_every_url_has_a_scenario(self):
+        self.assertEqual(api_bench.uncovered(), [])
+
+    def test_scenarios_succeed(self):
+        cache.clear()
+        doctor_ids = bench.seed_users('doctor', 3)
+        patient_ids = bench.seed_users('patient', 3)
+        bench.seed_posts(10, doctor_ids, draft_ratio=0)
+        bench.seed_appointments(10, doctor_ids, patient_ids)
+        fixtures = api_bench.Fixtures()
+        for name in api_bench.url_names():
+            with self.subTest(name=name):
+                result = api_bench.measure(name, lambda: api_bench.run_client(
+                    api_bench.build_requests(name, fixtures, 2), 1))
+                self.assertEqual([code for code in result['statuses'] if int(code) >= 400], [])
+                self.assertEqual(result['latency']['count'], 2)
+                self.assertIsNotNone(result['queries'])
+
+    def test_regressions(self):
+        def report(p95, rps, queries):
+            return {'endpoints': {'home': {'latency': {'p95_ms': p95}, 'requests_per_second': rps, 'queries': queries}}}
+
+        self.assertEqual(api_bench.regressions(report(10, 100, 2), report(12, 90, 2), 0.25), [])
+        self.assertEqual(len(api_bench.regressions(report(10, 100, 2), report(13, 70, 3), 0.25)), 3)
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     # HTML Views
@@ -26,9 +26,26 @@ urlpatterns = [
     path('api/doctor/blogs/<int:blog_id>/', views.api_doctor_blog_update, name='api_doctor_blog_update'),    path('api/doctor/blogs/<int:blog_id>/delete/', views.api_doctor_blog_delete, name='api_doctor_blog_delete'),
     path('api/patient/blogs/', views.api_patient_blog_list, name='api_patient_blog_list'),
     path('api/patient/blogs/<int:blog_id>/', views.api_patient_blog_detail, name='api_patient_blog_detail'),
+    path('api/patient/blogs/category/<slug:category>/', views.api_patient_blog_category, name='api_patient_blog_category'),
+    path('api/blogs/search/', views.api_blog_search, name='api_blog_search'),
     path('api/patient/doctors/', views.api_doctor_list, name='api_doctor_list'),
     path('api/patient/doctors/<int:doctor_id>/', views.api_doctor_detail, name='api_doctor_detail'),
+    path('api/patient/doctors/<int:doctor_id>/slots/', views.api_doctor_slots, name='api_doctor_slots'),
     path('api/patient/appointment_confirmed/<int:appointment_id>/', views.api_appointment_confirmed, name='api_appointment_confirmed'),
     path('api/patient/book_appointment/<int:doctor_id>/', views.api_book_appointment, name='api_book_appointment'),
     path('api/logout/', views.api_user_logout, name='api_logout'),
+    path('api/cache/stats/', views.api_cache_stats, name='api_cache_stats'),
+    path('api/appointments/import/', views.api_appointment_import, name='api_appointment_import'),
+    path('api/appointments/export/', views.api_appointment_export, name='api_appointment_export'),
+    # Async API Views (same payloads, for ASGI deployments)
+    path('api/async/patient/appointments/', async_views.patient_appointments, name='async_api_patient_appointments'),
+    path('api/async/doctor/appointments/', async_views.doctor_appointments, name='async_api_doctor_appointments'),
+    path('api/async/patient/blogs/', async_views.patient_blog_list, name='async_api_patient_blog_list'),
+    path('api/async/patient/blogs/<int:blog_id>/', async_views.patient_blog_detail, name='async_api_patient_blog_detail'),
+    path('api/async/patient/blogs/category/<slug:category>/', async_views.patient_blog_category, name='async_api_patient_blog_category'),
+    path('api/async/patient/doctors/', async_views.doctor_list, name='async_api_doctor_list'),
+    path('api/async/patient/doctors/<int:doctor_id>/', async_views.doctor_detail, name='async_api_doctor_detail'),
+    path('api/async/patient/doctors/<int:doctor_id>/slots/', async_views.doctor_slots, name='async_api_doctor_slots'),
+    path('api/async/patient/appointment_confirmed/<int:appointment_id>/', async_views.appointment_confirmed, name='async_api_appointment_confirmed'),
+    path('api/async/patient/book_appointment/<int:doctor_id>/', async_views.book_appointment, name='async_api_book_appointment'),
 ]
\ No newline at end of file
@@ -2,14 +2,10 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from .models import CustomUser, BlogPost, Appointment
+from .booking import book_slot, free_slots, InvalidSlot, SlotUnavailable
+from . import blog_feed
 from django import forms
 from django.contrib.auth.decorators import login_required
-from django.conf import settings
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
-from googleapiclient.errors import HttpError
-from datetime import datetime
-import os
 import logging
 
 logger = logging.getLogger(__name__)
@@ -81,7 +77,7 @@ def patient_dashboard(request):
 def doctor_dashboard(request):
     if request.user.user_type != 'doctor':
         return redirect('login')
-    appointments = Appointment.objects.filter(doctor=request.user).order_by('date', 'start_time')
+    appointments = Appointment.objects.filter(doctor=request.user).with_users().order_by('date', 'start_time')
     return render(request, 'doctor_dashboard.html', {
         'user': request.user,
         'appointments': appointments
@@ -136,11 +132,9 @@ def doctor_blog_create(request):
 def patient_blog_list(request):
     if request.user.user_type != 'patient':
         return redirect('login')
-    blogs = BlogPost.objects.filter(is_draft=False).order_by('-created_at')
-    blogs_by_category = defaultdict(list)
-    for blog in blogs:
-        blogs_by_category[blog.get_category_display()].append(blog)
-    return render(request, 'patient_blog_list.html', {'blogs_by_category': dict(blogs_by_category)})
+    blogs = blog_feed.top_posts_per_category(blog_feed.per_category_limit())
+    blogs_by_category = blog_feed.group_by_category(blogs, lambda blog: blog.category)
+    return render(request, 'patient_blog_list.html', {'blogs_by_category': blogs_by_category})
 
 # Patient blog detail
 @login_required
@@ -175,17 +169,12 @@ def book_appointment(request, doctor_id):
     if request.method == 'POST':
         form = AppointmentForm(request.POST)
         if form.is_valid():
-            appointment = form.save(commit=False)
-            appointment.patient = request.user
-            appointment.doctor = doctor
-            appointment.save()
             try:
-                if not os.path.exists(settings.GOOGLE_CALENDAR_CREDENTIALS_PATH):
-                    raise FileNotFoundError(f"Credentials file not found at {settings.GOOGLE_CALENDAR_CREDENTIALS_PATH}")
-                create_google_calendar_event(appointment)
-                messages.success(request, "Appointment booked and synced with Google Calendar.")
-            except Exception as e:
-                messages.error(request, f"Appointment saved but failed to sync with Google Calendar: {str(e)}")
+                appointment = book_slot(request.user, doctor, **form.cleaned_data)
+            except (InvalidSlot, SlotUnavailable) as e:
+                form.add_error('start_time', str(e))
+                return render(request, 'book_appointment.html', {'form': form, 'doctor': doctor})
+            messages.success(request, "Appointment booked. It will appear in Google Calendar shortly.")
             return redirect('appointment_confirmed', appointment_id=appointment.id)
     else:
         form = AppointmentForm()
@@ -197,71 +186,51 @@ def appointment_confirmed(request, appointment_id):
     appointment = get_object_or_404(Appointment, id=appointment_id, patient=request.user)
     return render(request, 'appointment_confirmed.html', {'appointment': appointment})
 
-# Google Calendar event creation
-def create_google_calendar_event(appointment):
-    try:
-        credentials = service_account.Credentials.from_service_account_file(
-            settings.GOOGLE_CALENDAR_CREDENTIALS_PATH,
-            scopes=['https://www.googleapis.com/auth/calendar']
-        )
-        service = build('calendar', 'v3', credentials=credentials)
-        start_datetime = datetime.combine(appointment.date, appointment.start_time)
-        end_datetime = datetime.combine(appointment.date, appointment.end_time)
-        event = {
-            'summary': f'Appointment with {appointment.patient.first_name} {appointment.patient.last_name}',
-            'description': f'Medical appointment for {appointment.speciality}',
-            'start': {
-                'dateTime': start_datetime.isoformat(),
-                'timeZone': 'Asia/Kolkata',
-            },
-            'end': {
-                'dateTime': end_datetime.isoformat(),
-                'timeZone': 'Asia/Kolkata',
-            }
-        }
-        calendar_id = 'primary'
-        service.events().insert(calendarId=calendar_id, body=event).execute()
-        return True
-    except FileNotFoundError:
-        raise Exception(f"Credentials file not found at {settings.GOOGLE_CALENDAR_CREDENTIALS_PATH}")
-    except HttpError as e:
-        raise Exception(f"Failed to create calendar event: {e}")
-    
-    
-    
-    
+
 from rest_framework.decorators import api_view, permission_classes, parser_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
 from .models import CustomUser, BlogPost, Appointment
-from .serializers import CustomUserSerializer, BlogPostSerializer, AppointmentSerializer
+from .serializers import (
+    CustomUserSerializer, DoctorListSerializer, BlogPostSerializer, BlogPostListSerializer,
+    AppointmentSerializer, requested_fields,
+)
+from .pagination import KeysetPaginator
+from .row_serializers import RowSerializer
+from . import api_cache, appointment_io, search, streaming
+from .authentication import ClaimsRefreshToken, revoke_token
+from rest_framework_simplejwt.exceptions import TokenError
+from .directory import DOCTOR_PAGINATOR, filter_doctors
 from rest_framework.parsers import MultiPartParser, FormParser
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
-from googleapiclient.errors import HttpError
 from django.shortcuts import get_object_or_404
-from django.conf import settings
-from collections import defaultdict
-from datetime import datetime
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import timedelta
+import codecs
 import logging
 import os
 
 logger = logging.getLogger(__name__)
 
+APPOINTMENT_PAGINATOR = KeysetPaginator(ordering=('date', 'start_time', 'id'))
+# Only used to stream the unpaginated doctor blog list in bounded batches.
+DOCTOR_BLOG_PAGINATOR = KeysetPaginator(ordering=('-created_at', '-id'))
+MAX_SLOT_RANGE_DAYS = 31
+
 # API Signup
 @api_view(['POST'])
 @parser_classes([MultiPartParser, FormParser])
 def api_signup(request):
-    print("Received data:", request.data)
-    print("Received files:", request.FILES)
     mutable_data = request.data.copy()
     mutable_data['username'] = mutable_data['username'].lower()
     serializer = CustomUserSerializer(data=mutable_data)
     if serializer.is_valid():
         user = serializer.save()
+        logger.info('User %s signed up as %s', user.id, user.user_type)
         return Response({'message': 'User created successfully', 'user': CustomUserSerializer(user).data}, status=status.HTTP_201_CREATED)
-    print("Serializer errors:", serializer.errors)
+    logger.info('Signup rejected: invalid %s', sorted(serializer.errors))
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 # API Login
@@ -269,12 +238,10 @@ def api_signup(request):
 def api_user_login(request):
     username = request.data.get('username')
     password = request.data.get('password')
-    print(f"Login attempt with username: {username}, password: {password}")
     user = authenticate(request, username=username, password=password)
     if user is not None:
-        print(f"Authenticated user: {user.username}, user_type: {user.user_type}")
-        from rest_framework_simplejwt.tokens import RefreshToken
-        refresh = RefreshToken.for_user(user)
+        logger.info('User %s logged in', user.id)
+        refresh = ClaimsRefreshToken.for_user(user)
         user_serializer = CustomUserSerializer(user)
         return Response({
             'access': str(refresh.access_token),
@@ -282,18 +249,49 @@ def api_user_login(request):
             'user_type': user.user_type,
             'user': user_serializer.data
         })
-    print("Authentication failed: User is None")
+    logger.info('Login failed for username %r', username)
     return Response({'error': 'Invalid credentials'}, status=status.HTTP_400_BAD_REQUEST)
 
+# Date window and sparse fieldset shared by the appointment APIs
+def appointment_window(request, appointments):
+    date_from = request.query_params.get('from')
+    date_to = request.query_params.get('to')
+    if date_from:
+        appointments = appointments.filter(date__gte=parse_query_date(date_from))
+    if date_to:
+        appointments = appointments.filter(date__lte=parse_query_date(date_to))
+    fields = requested_fields(request)
+    return AppointmentSerializer.optimize(appointments, fields, extra=APPOINTMENT_PAGINATOR.ordering), fields
+
+# Paginated, date-windowed appointment listing shared by the appointment APIs
+def appointment_page(request, appointments):
+    try:
+        appointments, fields = appointment_window(request, appointments)
+        serializer = RowSerializer(AppointmentSerializer, fields)
+        appointments = serializer.values(appointments, extra=APPOINTMENT_PAGINATOR.columns)
+        if streaming.requested(request):
+            appointments = APPOINTMENT_PAGINATOR.remaining(appointments, request)
+            return streaming.stream_list(request, 'appointments', appointments, serializer, APPOINTMENT_PAGINATOR,
+                                         {'next_cursor': None})
+        rows, next_cursor = APPOINTMENT_PAGINATOR.paginate(appointments, request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'appointments': serializer.many(rows), 'next_cursor': next_cursor})
+
+def parse_query_date(value):
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(f'Invalid date: {value}')
+    return parsed
+
 # API Patient Appointments
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def api_patient_appointments(request):
     if request.user.user_type != 'patient':
         return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
-    appointments = Appointment.objects.filter(patient=request.user)
-    serializer = AppointmentSerializer(appointments, many=True)
-    return Response({'appointments': serializer.data})
+    appointments = Appointment.objects.filter(patient=request.user).with_users()
+    return appointment_page(request, appointments)
 
 # API Doctor Appointments
 @api_view(['GET'])
@@ -301,9 +299,8 @@ def api_patient_appointments(request):
 def api_doctor_appointments(request):
     if request.user.user_type != 'doctor':
         return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
-    appointments = Appointment.objects.filter(doctor=request.user)
-    serializer = AppointmentSerializer(appointments, many=True)
-    return Response({'appointments': serializer.data})
+    appointments = Appointment.objects.filter(doctor=request.user).with_users()
+    return appointment_page(request, appointments)
 
 # API Doctor Blog List
 @api_view(['GET'])
@@ -311,9 +308,13 @@ def api_doctor_appointments(request):
 def api_doctor_blog_list(request):
     if request.user.user_type != 'doctor':
         return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
-    blogs = BlogPost.objects.filter(author=request.user)
-    serializer = BlogPostSerializer(blogs, many=True)
-    return Response({'blogs': serializer.data})
+    fields = requested_fields(request)
+    serializer = RowSerializer(BlogPostListSerializer, fields)
+    blogs = serializer.values(BlogPost.objects.filter(author=request.user), extra=DOCTOR_BLOG_PAGINATOR.columns)
+    blogs = blogs.order_by(*DOCTOR_BLOG_PAGINATOR.ordering)
+    if streaming.requested(request):
+        return streaming.stream_list(request, 'blogs', blogs, serializer, DOCTOR_BLOG_PAGINATOR)
+    return Response({'blogs': serializer.many(blogs)})
 
 # API Doctor Blog Create
 @api_view(['POST'])
@@ -323,20 +324,15 @@ def api_doctor_blog_create(request):
     if request.user.user_type != 'doctor':
         return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
     try:
-        logger.info('Creating blog with data: %s, files: %s', request.data, request.FILES)
-        if 'image' in request.FILES:
-            logger.info('甚至 file received: %s', request.FILES['image'].name)
-        else:
-            logger.warning('No image file received')
         serializer = BlogPostSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             blog = serializer.save(author=request.user)
-            logger.info('Blog created successfully: %s', blog.id)
+            logger.info('Blog %s created', blog.id)
             return Response({'message': 'Blog created', 'id': blog.id}, status=status.HTTP_201_CREATED)
-        logger.error('Serializer errors: %s', serializer.errors)
+        logger.info('Blog rejected: invalid %s', sorted(serializer.errors))
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
-        logger.error('Error creating blog: %s', str(e))
+        logger.exception('Error creating blog')
         return Response({'error': f'Server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 # API Doctor Blog Update
@@ -354,17 +350,12 @@ def api_doctor_blog_update(request, blog_id):
         return Response(serializer.data)
 
     if request.method == 'PATCH':
-        logger.info('Updating blog %s with data: %s, files: %s', blog_id, request.data, request.FILES)
-        if 'image' in request.FILES:
-            logger.info('Image file received for update: %s', request.FILES['image'].name)
-        else:
-            logger.warning('No image file received for update')
         serializer = BlogPostSerializer(blog, data=request.data, partial=True, context={'request': request})
         if serializer.is_valid():
             serializer.save()
-            logger.info('Blog %s updated successfully', blog_id)
+            logger.info('Blog %s updated', blog_id)
             return Response({'message': 'Blog updated'}, status=status.HTTP_200_OK)
-        logger.error('Serializer errors: %s', serializer.errors)
+        logger.info('Blog %s update rejected: invalid %s', blog_id, sorted(serializer.errors))
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 # API Doctor Blog Delete
@@ -377,8 +368,8 @@ def api_doctor_blog_delete(request, blog_id):
     try:
         blog.delete()
         return Response({'message': 'Blog deleted'}, status=status.HTTP_204_NO_CONTENT)
-    except Exception as e:
-        logger.error(f"Error deleting blog: {str(e)}")
+    except Exception:
+        logger.exception('Error deleting blog %s', blog_id)
         return Response({'error': 'Server error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 # API Patient Blog List
@@ -387,11 +378,39 @@ def api_doctor_blog_delete(request, blog_id):
 def api_patient_blog_list(request):
     if request.user.user_type != 'patient':
         return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
-    blogs = BlogPost.objects.filter(is_draft=False)
-    blogs_by_category = defaultdict(list)
-    for blog in blogs:
-        blogs_by_category[blog.get_category_display()].append(BlogPostSerializer(blog).data)
-    return Response(blogs_by_category)
+    try:
+        limit = blog_feed.per_category_limit(request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return blog_feed.feed_response(request, limit)
+
+# API Patient Blog Category
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def api_patient_blog_category(request, category):
+    if request.user.user_type != 'patient':
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    labels = dict(BlogPost.CATEGORY_CHOICES)
+    if category not in labels:
+        return Response({'error': 'Unknown category'}, status=status.HTTP_404_NOT_FOUND)
+    fields = requested_fields(request)
+
+    def build():
+        serializer = RowSerializer(BlogPostListSerializer, fields, request)
+        blogs = serializer.values(blog_feed.published_posts().filter(category=category),
+                                  extra=blog_feed.CATEGORY_PAGINATOR.columns)
+        blogs, next_cursor = blog_feed.CATEGORY_PAGINATOR.paginate(blogs, request)
+        return {
+            'category': category,
+            'label': labels[category],
+            'blogs': serializer.many(blogs),
+            'next_cursor': next_cursor,
+        }
+
+    try:
+        return api_cache.cached_response('blog_feed', request, build, category)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 # API Patient Blog Detail
 @api_view(['GET'])
@@ -399,9 +418,38 @@ def api_patient_blog_list(request):
 def api_patient_blog_detail(request, blog_id):
     if request.user.user_type != 'patient':
         return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
-    blog = get_object_or_404(BlogPost, id=blog_id, is_draft=False)
-    serializer = BlogPostSerializer(blog)
-    return Response(serializer.data)
+    fields = requested_fields(request)
+
+    def build():
+        blogs = BlogPostSerializer.optimize(BlogPost.objects.all(), fields)
+        blog = get_object_or_404(blogs, id=blog_id, is_draft=False)
+        return BlogPostSerializer(blog, fields=fields).data
+
+    return api_cache.cached_response(f'blog_detail:{blog_id}', request, build)
+
+# API Blog Search
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def api_blog_search(request):
+    query = request.query_params.get('q', '').strip()
+    category = request.query_params.get('category') or None
+    if not query:
+        return Response({'error': 'Query parameter q is required'}, status=status.HTTP_400_BAD_REQUEST)
+    if category and category not in dict(BlogPost.CATEGORY_CHOICES):
+        return Response({'error': 'Unknown category'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = min(int(request.query_params.get('limit', 20)), 50)
+        offset = int(request.query_params.get('offset', 0))
+    except ValueError:
+        return Response({'error': 'limit and offset must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    if limit < 1 or offset < 0:
+        return Response({'error': 'limit must be positive and offset non-negative'}, status=status.HTTP_400_BAD_REQUEST)
+    posts = search.search(query, category=category, limit=limit, offset=offset,
+                          queryset=BlogPostListSerializer.optimize(BlogPost.objects.all()))
+    results = BlogPostListSerializer(posts, many=True, context={'request': request}).data
+    for row, post in zip(results, posts):
+        row['score'] = post.score
+    return Response({'query': query, 'results': results})
 
 # API Doctor List
 @api_view(['GET'])
@@ -409,50 +457,101 @@ def api_patient_blog_detail(request, blog_id):
 def api_doctor_list(request):
     if request.user.user_type != 'patient':
         return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
-    doctors = CustomUser.objects.filter(user_type='doctor')
-    serializer = CustomUserSerializer(doctors, many=True)
-    return Response({'doctors': serializer.data})
+    fields = requested_fields(request)
+    if streaming.requested(request):
+        # Everything from the cursor on, uncached.
+        doctors = DoctorListSerializer.optimize(filter_doctors(request.query_params), fields,
+                                                extra=DOCTOR_PAGINATOR.ordering)
+        try:
+            doctors = DOCTOR_PAGINATOR.remaining(doctors, request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return streaming.stream_list(request, 'doctors', doctors, DoctorListSerializer(fields=fields),
+                                     DOCTOR_PAGINATOR, {'next_cursor': None})
+
+    def build():
+        doctors = DoctorListSerializer.optimize(filter_doctors(request.query_params), fields,
+                                                extra=DOCTOR_PAGINATOR.ordering)
+        doctors, next_cursor = DOCTOR_PAGINATOR.paginate(doctors, request)
+        serializer = DoctorListSerializer(doctors, many=True, fields=fields)
+        return {'doctors': serializer.data, 'next_cursor': next_cursor}
+
+    try:
+        return api_cache.cached_response('doctor_list', request, build)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 # API Book Appointment
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def api_book_appointment(request, doctor_id):
-    print(f"Booking appointment for doctor_id: {doctor_id}, user: {request.user.username}")
-    print(f"Request data: {request.data}")
     if request.user.user_type != 'patient':
-        print("User is not a patient")
         return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
     doctor = get_object_or_404(CustomUser, id=doctor_id, user_type='doctor')
-    print(f"Doctor found: {doctor.username}")
     serializer = AppointmentSerializer(data=request.data)
     if serializer.is_valid():
-        print("Serializer is valid, saving appointment")
-        appointment = serializer.save(patient=request.user, doctor=doctor)
         try:
-            if not os.path.exists(settings.GOOGLE_CALENDAR_CREDENTIALS_PATH):
-                raise FileNotFoundError(f"Credentials file not found at {settings.GOOGLE_CALENDAR_CREDENTIALS_PATH}")
-            create_google_calendar_event(appointment)
-            print("Google Calendar event created")
-        except Exception as e:
-            print(f"Google Calendar error: {str(e)}")
-        return Response({'message': 'Appointment booked', 'id': serializer.data['id']}, status=status.HTTP_201_CREATED)
-    print(f"Serializer errors: {serializer.errors}")
+            appointment = book_slot(request.user, doctor, **serializer.validated_data)
+        except InvalidSlot as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except SlotUnavailable as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        logger.info('Appointment %s booked with doctor %s', appointment.id, doctor.id)
+        return Response({'message': 'Appointment booked', 'id': appointment.id}, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+# Requested slot range: a week from today unless ``from``/``to`` say otherwise
+def slot_range(request):
+    date_from = parse_query_date(request.query_params['from']) if 'from' in request.query_params else timezone.localdate()
+    date_to = parse_query_date(request.query_params['to']) if 'to' in request.query_params else date_from + timedelta(days=6)
+    if date_to < date_from or (date_to - date_from).days >= MAX_SLOT_RANGE_DAYS:
+        raise ValueError(f'Date range must be between 1 and {MAX_SLOT_RANGE_DAYS} days')
+    return date_from, date_to
+
+# API Doctor Free Slots
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def api_doctor_slots(request, doctor_id):
+    if request.user.user_type != 'patient':
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    try:
+        date_from, date_to = slot_range(request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    def build():
+        doctor = get_object_or_404(CustomUser, id=doctor_id, user_type='doctor')
+        slots = free_slots(doctor.id, date_from, date_to)
+        return {
+            'doctor': doctor.id,
+            'slots': {day.isoformat(): [start.strftime('%H:%M') for start in starts] for day, starts in slots.items()},
+        }
+
+    return api_cache.cached_response(f'doctor_slots:{doctor_id}', request, build, date_from, date_to)
+
 # API Appointment Confirmed
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def api_appointment_confirmed(request, appointment_id):
     if request.user.user_type != 'patient':
         return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
-    appointment = get_object_or_404(Appointment, id=appointment_id, patient=request.user)
-    serializer = AppointmentSerializer(appointment)
+    fields = requested_fields(request)
+    appointments = AppointmentSerializer.optimize(Appointment.objects.all(), fields)
+    appointment = get_object_or_404(appointments, id=appointment_id, patient=request.user)
+    serializer = AppointmentSerializer(appointment, fields=fields)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 # API Logout
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def api_user_logout(request):
+    if request.auth is not None:
+        revoke_token(request.auth)
+    if request.data.get('refresh'):
+        try:
+            revoke_token(ClaimsRefreshToken(request.data['refresh']))
+        except TokenError:
+            pass
     logout(request)
     return Response({'message': 'Logged out'})
 
@@ -460,48 +559,73 @@ def api_user_logout(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def api_doctor_detail(request, doctor_id):
-    print(f"Fetching doctor with ID: {doctor_id}")
     if request.user.user_type != 'patient':
-        print("User is not a patient")
         return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
     try:
-        doctor = CustomUser.objects.get(id=doctor_id, user_type='doctor')
-        serializer = CustomUserSerializer(doctor)
-        print(f"Doctor found: {doctor.username}")
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        fields = requested_fields(request)
+
+        def build():
+            doctor = CustomUserSerializer.optimize(CustomUser.objects.all(), fields).get(id=doctor_id, user_type='doctor')
+            return CustomUserSerializer(doctor, fields=fields).data
+
+        return api_cache.cached_response(f'doctor_detail:{doctor_id}', request, build)
     except CustomUser.DoesNotExist:
-        print(f"Doctor not found for ID: {doctor_id}")
         return Response({'error': 'Doctor not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
-        print(f"Error fetching doctor: {str(e)}")
+        logger.exception('Error fetching doctor %s', doctor_id)
         return Response({'error': f'Server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-# Google Calendar event creation
-def create_google_calendar_event(appointment):
+# API Cache Stats
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def api_cache_stats(request):
+    # Counters are per process; each gunicorn worker reports its own.
+    return Response({'pid': os.getpid(), 'namespaces': api_cache.stats.snapshot()})
+
+# API Appointment Import (clinic migrations); rows that fail are reported, not fatal
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+@parser_classes([MultiPartParser])
+def api_appointment_import(request):
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'Upload the appointments as file'}, status=status.HTTP_400_BAD_REQUEST)
     try:
-        credentials = service_account.Credentials.from_service_account_file(
-            settings.GOOGLE_CALENDAR_CREDENTIALS_PATH,
-            scopes=['https://www.googleapis.com/auth/calendar']
-        )
-        service = build('calendar', 'v3', credentials=credentials)
-        start_datetime = datetime.combine(appointment.date, appointment.start_time)
-        end_datetime = datetime.combine(appointment.date, appointment.end_time)
-        event = {
-            'summary': f'Appointment with {appointment.patient.first_name} {appointment.patient.last_name}',
-            'description': f'Medical appointment for {appointment.speciality}',
-            'start': {
-                'dateTime': start_datetime.isoformat(),
-                'timeZone': 'Asia/Kolkata',
-            },
-            'end': {
-                'dateTime': end_datetime.isoformat(),
-                'timeZone': 'Asia/Kolkata',
-            }
-        }
-        calendar_id = 'primary'
-        service.events().insert(calendarId=calendar_id, body=event).execute()
-        return True
-    except FileNotFoundError:
-        raise Exception(f"Credentials file not found at {settings.GOOGLE_CALENDAR_CREDENTIALS_PATH}")
-    except HttpError as e:
-        raise Exception(f"Failed to create calendar event: {e}")
\ No newline at end of file
+        file_format = appointment_io.format_of(upload.name, request.data.get('file_format'))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    dry_run = request.data.get('dry_run') in ('1', 'true')
+    sync_calendar = request.data.get('sync_calendar') in ('1', 'true')
+    # Decoded line by line, so that a bad byte is reported on its own line.
+    report = appointment_io.import_appointments(
+        codecs.iterdecode(upload, 'utf-8-sig'), file_format,
+        dry_run=dry_run, sync_calendar=sync_calendar,
+    )
+    if report.unreadable:
+        # Earlier chunks are committed; the report tells the client where to resume.
+        logger.info('Import of %s stopped at line %s after %s appointments', file_format, report.unreadable.line,
+                    report.created)
+        return Response({'error': str(report.unreadable), **report.as_dict()}, status=status.HTTP_400_BAD_REQUEST)
+    logger.info('Imported %s of %s appointments from %s (dry run: %s)', report.created, report.rows, file_format, dry_run)
+    return Response(report.as_dict(), status=status.HTTP_201_CREATED if report.created else status.HTTP_200_OK)
+
+# API Appointment Export, streamed row by row
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def api_appointment_export(request):
+    try:
+        # ``format`` is DRF's renderer override, hence ``file_format``.
+        file_format = appointment_io.format_of('', request.query_params.get('file_format', 'csv'))
+        appointments = Appointment.objects.all()
+        if request.query_params.get('doctor'):
+            appointments = appointments.filter(doctor__username=request.query_params['doctor'])
+        if request.query_params.get('from'):
+            appointments = appointments.filter(date__gte=parse_query_date(request.query_params['from']))
+        if request.query_params.get('to'):
+            appointments = appointments.filter(date__lte=parse_query_date(request.query_params['to']))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    response = StreamingHttpResponse(appointment_io.export_appointments(appointments, file_format),
+                                     content_type=appointment_io.FORMATS[file_format])
+    response['Content-Disposition'] = f'attachment; filename="appointments.{file_format}"'
+    return response
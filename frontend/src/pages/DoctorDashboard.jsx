@@ -17,10 +17,18 @@ const DoctorDashboard = () => {
     } else {
       const fetchAppointments = async () => {
         try {
-          const response = await axios.get('http://localhost:8000/api/doctor/appointments/', {
-            headers: { Authorization: `Bearer ${accessToken}` }
-          });
-          setAppointments(response.data.appointments || []);
+          // The list is paginated; follow next_cursor until every page is in.
+          const collected = [];
+          let cursor = null;
+          do {
+            const response = await axios.get('http://localhost:8000/api/doctor/appointments/', {
+              headers: { Authorization: `Bearer ${accessToken}` },
+              params: cursor ? { page_size: 200, cursor } : { page_size: 200 }
+            });
+            collected.push(...(response.data.appointments || []));
+            cursor = response.data.next_cursor;
+          } while (cursor);
+          setAppointments(collected);
         } catch (err) {
           setError(err.response?.data?.error || 'Failed to fetch appointments');
         }
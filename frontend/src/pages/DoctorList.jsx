@@ -17,10 +17,18 @@ const DoctorList = () => {
     } else {
       const fetchDoctors = async () => {
         try {
-          const response = await axios.get('http://localhost:8000/api/patient/doctors/', {
-            headers: { Authorization: `Bearer ${accessToken}` }
-          });
-          setDoctors(response.data.doctors || []);
+          // The directory is paginated; follow next_cursor until every page is in.
+          const collected = [];
+          let cursor = null;
+          do {
+            const response = await axios.get('http://localhost:8000/api/patient/doctors/', {
+              headers: { Authorization: `Bearer ${accessToken}` },
+              params: cursor ? { page_size: 100, cursor } : { page_size: 100 }
+            });
+            collected.push(...(response.data.doctors || []));
+            cursor = response.data.next_cursor;
+          } while (cursor);
+          setDoctors(collected);
         } catch (err) {
           setError(err.response?.data?.error || 'Failed to fetch doctors');
         }
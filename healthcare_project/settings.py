@@ -14,6 +14,17 @@ from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 GOOGLE_CALENDAR_CREDENTIALS_PATH = os.path.join(BASE_DIR, 'credentials', 'calendar-service-account.json')
+# Daily window in which appointment slots are offered
+APPOINTMENT_WORKING_HOURS = ('09:00', '18:00')
+# Patient blog feed: posts shown per category and seconds a rendered feed is cached
+BLOG_FEED_PER_CATEGORY = 6
+BLOG_FEED_CACHE_TIMEOUT = 300
+# Read-mostly API responses are cached in this CACHES alias for this many
+# seconds, and invalidated on model saves
+API_CACHE_ALIAS = 'default'
+API_CACHE_TIMEOUT = 300
+# Threads rendering image thumbnails after upload; 0 renders inline
+IMAGE_WORKERS = 2
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
@@ -43,6 +54,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'accounts.metrics.MetricsMiddleware',
+    'accounts.log.LogContextMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -106,6 +119,55 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Argon2id first; existing PBKDF2 hashes are upgraded on the next login.
+PASSWORD_HASHERS = [
+    'accounts.passwords.TunedArgon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+# Argon2 cost, sized with `manage.py tune_password_hasher`. One lane per hash:
+# concurrent logins already keep every core busy, so extra lanes only add
+# thread overhead. 19 MiB x 2 passes is the OWASP minimum for Argon2id.
+ARGON2_TIME_COST = 2
+ARGON2_MEMORY_COST = 19456
+ARGON2_PARALLELISM = 1
+# Threads verifying passwords for async views; defaults to the CPU count
+PASSWORD_HASH_WORKERS = None
+
+
+# Logging: request threads only enqueue records; a listener thread redacts,
+# formats and writes them as JSON lines. See accounts/log.py.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'request_context': {'()': 'accounts.log.RequestContextFilter'},
+        'redact': {'()': 'accounts.log.RedactingFilter'},
+    },
+    'formatters': {
+        'json': {'()': 'accounts.log.JsonFormatter'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'json', 'filters': ['redact']},
+        'queue': {'()': 'accounts.log.QueueHandler', 'handlers': ['console'], 'maxsize': 10000,
+                  'filters': ['request_context']},
+    },
+    'loggers': {
+        'accounts': {'handlers': ['queue'], 'level': 'INFO', 'propagate': False},
+        'django': {'handlers': ['queue'], 'level': 'WARNING', 'propagate': False},
+    },
+    'root': {'handlers': ['queue'], 'level': 'WARNING'},
+}
+# Fraction of requests, by URL name, whose DEBUG/INFO records are kept;
+# warnings and errors are always kept
+LOG_SAMPLE_RATES = {
+    'api_user_login': 0.1,
+    'api_book_appointment': 0.1,
+}
+LOG_SAMPLE_DEFAULT = 1.0
+# Bearer token the Prometheus scraper sends to /metrics; unset, /metrics is a 404
+METRICS_TOKEN = None
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -125,6 +187,16 @@ USE_TZ = True
 STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Uploads are streamed to temporary files and stored under a hash of their
+# content, so re-uploading the same image reuses the stored file.
+FILE_UPLOAD_HANDLERS = ['accounts.storage.HashingUploadHandler']
+# nginx internal location aliased to MEDIA_ROOT; when set, media bodies are
+# sent by nginx via X-Accel-Redirect instead of by Django
+MEDIA_ACCEL_REDIRECT = None
+STORAGES = {
+    'default': {'BACKEND': 'accounts.storage.ContentHashStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
 AUTH_USER_MODEL = 'accounts.CustomUser'
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -135,9 +207,47 @@ CORS_ALLOWED_ORIGINS = [
     "https://healthcareapp-frontend.onrender.com"
 ]
 
+# 'default' is shared by every worker on the host so that invalidations
+# reach all of them; 'local' is per process and skips the disk, which is
+# enough when running a single worker.
+CACHES = {
+    'default': {
+        'BACKEND': 'accounts.cache_backends.LRUFileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, '.cache'),
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 20000, 'CULL_FREQUENCY': 4},
+    },
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'healthcare',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    # JWT denylist, apart from the responses so that filling 'default'
+    # never evicts a revocation; entries only go when they expire
+    'revocations': {
+        'BACKEND': 'accounts.cache_backends.PersistentFileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, '.revocations'),
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+JWT_REVOCATION_CACHE_ALIAS = 'revocations'
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.ClaimsJWTAuthentication',
+    ],
+    # JSON through orjson when it is installed, byte for byte what DRF's
+    # own classes produce; they fall back to them when it is not
+    'DEFAULT_RENDERER_CLASSES': [
+        'accounts.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'accounts.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
 }
 
@@ -147,7 +257,12 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'AUTH_HEADER_TYPES': ('Bearer',),
+    'TOKEN_OBTAIN_SERIALIZER': 'accounts.authentication.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.authentication.ClaimsTokenRefreshSerializer',
 }
+# Seconds to cache the full user behind a JWT; 0 builds the user from the
+# token's claims instead, without any lookup
+JWT_USER_CACHE_TIMEOUT = 0
 
 # settings.py
 CORS_ALLOW_ALL_ORIGINS = True  # For development only; restript in production